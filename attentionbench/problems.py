@@ -1,63 +1,24 @@
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+from utils import ProblemSelection, iter_problem_configs
 from attention_utils import AttentionConfig
 
+# Problem files of the attention suite; see `utils/problem_sets.py` for their format.
+PROBLEM_SET_DIR = Path(__file__).parent / "problem_sets"
+# Problem sets benchmarked unless --problems is given.
+DEFAULT_PROBLEM_SETS = ["attention"]
 
-def llm_sweep(dtype: str) -> list[AttentionConfig]:
-    configs = []
-    # Batch sweep (batch * num_heads)
-    for B in [1, 2, 4, 8, 16, 32, 48, 64, 96, 128, 192]:
-        # M, K2 sweep (seq length)
-        for M in [1024, 2048, 4096, 8192, 16384]:
-            K2 = M
-            # K1, N sweep (head dim)
-            for N in [64, 128]:
-                K1 = N
-                configs.append(AttentionConfig(B, M, N, K1, K2, dtype))
-    return configs
 
+def make_attention_config(fields: dict) -> AttentionConfig:
+    return AttentionConfig(fields["B"], fields["M"], fields["N"], fields["K1"], fields["K2"], fields["dtype"])
 
-def sdxl_unet_sweep(dtype: str) -> list[AttentionConfig]:
-    configs = []
-    sdxl_attn_shapes = [
-        (1, 4096, 64, 64, 4096),
-        (1, 4096, 64, 64, 64),
-        (2, 1024, 64, 64, 1024),
-        (2, 1024, 64, 64, 64),
-        (4, 4096, 64, 64, 4096),
-        (4, 4096, 64, 64, 64),
-        (8, 1024, 64, 64, 1024),
-        (8, 1024, 64, 64, 64),
-        (20, 4096, 64, 64, 4096),
-        (20, 4096, 64, 64, 64),
-        (40, 1024, 64, 64, 1024),
-        (40, 1024, 64, 64, 64),
-    ]
-    for B, M, N, K1, K2 in sdxl_attn_shapes:
-        configs.append(AttentionConfig(B, M, N, K1, K2, dtype))
-    return configs
 
-
-def bert_attn_sweep(dtype: str) -> list[AttentionConfig]:
-    configs = []
-    sdxl_attn_shapes = [
-        (12, 384, 64, 64, 384),
-        (768, 4096, 64, 64, 64),
-    ]
-    for B, M, N, K1, K2 in sdxl_attn_shapes:
-        configs.append(AttentionConfig(B, M, N, K1, K2, dtype))
-    return configs
+def iter_attention_configs(
+    problem_sets: Sequence[str] = DEFAULT_PROBLEM_SETS, selection: Optional[ProblemSelection] = None
+) -> Iterator[tuple[str, AttentionConfig]]:
+    """Lazily yield (tag, config) pairs of the problem sets, one problem at a time."""
+    return iter_problem_configs(PROBLEM_SET_DIR, problem_sets, "attention", make_attention_config, selection)
 
 
 def get_attention_configs() -> list[tuple[str, AttentionConfig]]:
-    configs: list[tuple[str, AttentionConfig]] = []
-    llm_configs = llm_sweep("f16")
-    llm_configs += llm_sweep("f8E4M3FNUZ")
-    sdxl_configs = sdxl_unet_sweep("f16")
-    sdxl_configs += sdxl_unet_sweep("f8E4M3FNUZ")
-    bert_configs = bert_attn_sweep("f16")
-    bert_configs += bert_attn_sweep("f8E4M3FNUZ")
-
-    configs += [("llm_sweep", x) for x in llm_configs]
-    configs += [("sdxl_unet_sweep", x) for x in sdxl_configs]
-    configs += [("bert_attn_sweep", x) for x in bert_configs]
-
-    return configs
+    return list(iter_attention_configs())
@@ -0,0 +1,61 @@
+import os
+import csv
+import sys
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+COMMON_TOOLS = REPO_ROOT / "common_tools"
+# Import `utils` from this checkout, like the drivers run below.
+sys.path.insert(0, str(COMMON_TOOLS))
+
+
+def read_rows(filename) -> list[dict]:
+    with open(filename, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+class GemmSuite:
+    """Runs a copy of the gemm driver with `--fake-tools`, keeping its kernels and vmfbs out of the repo."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.script = root / "gemmbench" / "gemm_bench.py"
+        shutil.copytree(REPO_ROOT / "gemmbench", self.script.parent, ignore=shutil.ignore_patterns("__pycache__"))
+        self.env = dict(os.environ)
+        self.env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(COMMON_TOOLS), os.environ.get("PYTHONPATH")]))
+        self.env["FAKE_IREE_SEED"] = "0"
+
+    def command(self, *args) -> list[str]:
+        return [sys.executable, str(self.script), "--fake-tools", "--limit", "8", "--jobs", "2", *map(str, args)]
+
+    def run(self, *args, env=None) -> subprocess.CompletedProcess:
+        proc = subprocess.run(
+            self.command(*args),
+            cwd=self.root,
+            env={**self.env, **(env or {})},
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            timeout=300,
+        )
+        assert proc.returncode == 0, proc.stdout
+        return proc
+
+    def start(self, *args, env=None) -> subprocess.Popen:
+        return subprocess.Popen(
+            self.command(*args),
+            cwd=self.root,
+            env={**self.env, **(env or {})},
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+
+
+@pytest.fixture
+def gemm_suite(tmp_path) -> GemmSuite:
+    return GemmSuite(tmp_path)
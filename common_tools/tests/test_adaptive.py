@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from utils import adaptive
+from utils.adaptive import AdaptiveRepetitions, get_median_ci, get_relative_ci_width, run_adaptive_rounds
+
+
+class _Rounds:
+    """Fake `run_round` drawing repetition times around 1ms with a spread per function."""
+
+    def __init__(self, spreads, failing=()):
+        self.spreads = spreads
+        self.failing = failing
+        self.rng = random.Random(0)
+        self.calls = []
+
+    def __call__(self, names, repetitions):
+        self.calls.append((list(names), repetitions))
+        return {
+            name: [1.0 + self.rng.gauss(0, self.spreads[name]) for _ in range(repetitions)]
+            for name in names
+            if name not in self.failing
+        }
+
+
+def test_median_ci():
+    assert get_median_ci([1.0]) is None
+    assert get_relative_ci_width([1.0]) is None
+    assert get_relative_ci_width([2.0] * 5) == 0.0
+    times = [1.0, 1.1, 0.9, 1.05, 0.95, 1.2]
+    low, high = get_median_ci(times)
+    assert low <= 1.025 <= high
+    # The resamples are drawn with a fixed seed.
+    assert get_median_ci(times) == (low, high)
+
+
+def test_stops_once_the_ci_reaches_the_target():
+    target = AdaptiveRepetitions(target_ci=0.02, max_seconds=600)
+    rounds = _Rounds({"stable": 0.0, "noisy": 0.05})
+    samples = run_adaptive_rounds(rounds, ["stable", "noisy"], target)
+
+    # Identical times converge after the first round, the noisy ones later.
+    assert rounds.calls[0] == (["stable", "noisy"], 3)
+    assert samples["stable"] == [1.0] * 3
+    assert all(names == ["noisy"] for names, _ in rounds.calls[1:])
+    assert len(rounds.calls) > 2
+    # Every round doubles the samples.
+    assert [repetitions for _, repetitions in rounds.calls] == [3] + [3 * 2**i for i in range(len(rounds.calls) - 1)]
+    assert len(samples["noisy"]) == sum(repetitions for _, repetitions in rounds.calls)
+    # The last round was the first one to reach the target.
+    assert target.is_converged(samples["noisy"])
+    assert not target.is_converged(samples["noisy"][: -rounds.calls[-1][1]])
+
+
+def test_failed_functions_are_dropped():
+    rounds = _Rounds({"ok": 0.0, "broken": 0.0}, failing={"broken"})
+    samples = run_adaptive_rounds(rounds, ["ok", "broken"], AdaptiveRepetitions(target_ci=0.02))
+    assert samples == {"ok": [1.0] * 3}
+    assert len(rounds.calls) == 1
+
+
+def test_stops_at_the_time_limit(monkeypatch):
+    # Every round takes 4 seconds of a fake clock.
+    clock = iter(range(0, 10000, 4))
+    monkeypatch.setattr(adaptive.time, "monotonic", lambda: next(clock))
+    rounds = _Rounds({"noisy": 0.5})
+    samples = run_adaptive_rounds(rounds, ["noisy"], AdaptiveRepetitions(target_ci=0.0001, max_seconds=10))
+    # Two rounds of 3 repetitions take 8s, leaving time for 1.5 more.
+    assert [repetitions for _, repetitions in rounds.calls] == [3, 3, 1]
+    assert len(samples["noisy"]) == 7
+
+
+@pytest.mark.parametrize("target_ci", [0.1, 0.02])
+def test_narrower_targets_take_more_samples(target_ci):
+    rounds = _Rounds({"noisy": 0.05})
+    samples = run_adaptive_rounds(rounds, ["noisy"], AdaptiveRepetitions(target_ci=target_ci, max_seconds=600))
+    assert get_relative_ci_width(samples["noisy"]) <= target_ci
+    assert len(samples["noisy"]) >= (3 if target_ci == 0.1 else 12)
@@ -0,0 +1,85 @@
+import pytest
+
+from utils.batching import KernelBatch, build_batched_module
+
+KERNEL_MLIR = """
+#map = affine_map<(d0, d1) -> (d0, d1)>
+module {
+  func.func @main(%a: tensor<4x8xf32>, %b: tensor<4x8xf32>) -> tensor<4x8xf32> {
+    %0 = linalg.generic {indexing_maps = [#map, #map, #map], iterator_types = ["parallel", "parallel"]}
+        ins(%a, %b : tensor<4x8xf32>, tensor<4x8xf32>) outs(%a : tensor<4x8xf32>) {
+    ^bb0(%x: f32, %y: f32, %out: f32):
+      %1 = arith.addf %x, %y : f32
+      linalg.yield %1 : f32
+    } -> tensor<4x8xf32>
+    return %0 : tensor<4x8xf32>
+  }
+}
+"""
+
+UTIL_MLIR = """
+util.func public @main(%a: tensor<16xi8>) -> tensor<16xi8> {
+  util.return %a : tensor<16xi8>
+}
+"""
+
+
+class _Config:
+    def __init__(self, name, flops=1):
+        self.name, self.flops = name, flops
+
+    def get_name(self):
+        return self.name
+
+    def get_flops(self):
+        return self.flops
+
+
+def test_batched_module_wraps_main_in_a_function_without_arguments():
+    module = build_batched_module("k0", KERNEL_MLIR, ["4x8xf32", "4x8xf32"])
+    assert "module {" not in module
+    # The kernel is private and renamed, and its aliases are prefixed.
+    assert "func.func private @k0_main(%a: tensor<4x8xf32>" in module
+    assert "@main" not in module
+    assert "#k0_map = affine_map" in module
+    assert "indexing_maps = [#k0_map, #k0_map, #k0_map]" in module
+    for i in range(2):
+        assert f"util.global private @k0_input{i} = dense<0.0> : tensor<4x8xf32>" in module
+        assert f"%arg{i} = util.optimization_barrier %input{i} : tensor<4x8xf32>" in module
+    assert "func.func public @k0() -> tensor<4x8xf32> {" in module
+    assert (
+        "%result = func.call @k0_main(%arg0, %arg1) : (tensor<4x8xf32>, tensor<4x8xf32>) -> tensor<4x8xf32>" in module
+    )
+    assert module.rstrip().endswith("func.return %result : tensor<4x8xf32>\n}")
+
+
+def test_batched_module_keeps_the_util_dialect():
+    module = build_batched_module("k1", UTIL_MLIR, ["16xi8"])
+    assert "util.func private @k1_main(" in module
+    assert "util.global private @k1_input0 = dense<0> : tensor<16xi8>" in module
+    assert "util.func public @k1() -> tensor<16xi8> {" in module
+    assert "%result = util.call @k1_main(%arg0) : (tensor<16xi8>) -> tensor<16xi8>" in module
+
+
+def test_batched_module_without_main():
+    with pytest.raises(ValueError, match="no @main function"):
+        build_batched_module("k2", UTIL_MLIR.replace("@main", "@kernel"), ["16xi8"])
+
+
+def test_batched_modules_compile_together():
+    iree_compiler = pytest.importorskip("iree.compiler")
+    modules = [
+        build_batched_module("k0", KERNEL_MLIR, ["4x8xf32", "4x8xf32"]),
+        build_batched_module("k1", KERNEL_MLIR, ["4x8xf32", "4x8xf32"]),
+        build_batched_module("k2", UTIL_MLIR, ["16xi8"]),
+    ]
+    vmfb = iree_compiler.compile_str("\n".join(modules), target_backends=["llvm-cpu"])
+    assert vmfb
+
+
+def test_kernel_batch_names():
+    batch = KernelBatch([("tag", _Config("a-1", 2)), ("tag", _Config("b", 3)), ("other", _Config("a-1", 4))])
+    assert batch.get_name() == "a-1_and_2_more"
+    assert batch.get_flops() == 9
+    assert batch.get_function_names() == ["a_1", "b", "a_1_2"]
+    assert KernelBatch([("tag", _Config("b"))]).get_name() == "b"
@@ -0,0 +1,346 @@
+import os
+import sys
+import time
+
+import pytest
+
+from utils.bench_utils import (
+    get_benchmark_stats,
+    get_latency_flags,
+    get_latency_histogram,
+    get_percentile,
+    get_stats_columns,
+    parse_benchmark_json,
+    run_iree_command,
+)
+
+# Output of iree-benchmark-module --benchmark_format=json for the functions
+# `add` and `mul` of one module, after a compiler warning on stderr. `mul` was
+# reported in us; its last repetition and every repetition of `sub` failed.
+BENCHMARK_JSON = b"""\
+warning: Defaulting to targeting a generic CPU for the target architecture will result in poor performance.
+{
+  "context": {
+    "date": "2026-10-17T05:51:31+00:00",
+    "host_name": "vm",
+    "executable": "iree-benchmark-module",
+    "num_cpus": 1,
+    "mhz_per_cpu": 2100,
+    "cpu_scaling_enabled": false,
+    "aslr_enabled": true,
+    "caches": [
+      {"type": "Data", "level": 1, "size": 49152, "num_sharing": 1}
+    ],
+    "load_avg": [0.344238,0.402344,0.373047],
+    "library_version": "v1.9.5",
+    "library_build_type": "release",
+    "json_schema_version": 1
+  },
+  "benchmarks": [
+    {
+      "name": "BM_add/process_time/real_time",
+      "family_index": 0,
+      "per_family_instance_index": 0,
+      "run_name": "BM_add/process_time/real_time",
+      "run_type": "iteration",
+      "repetitions": 3,
+      "repetition_index": 0,
+      "threads": 1,
+      "iterations": 1281,
+      "real_time": 1.4964394219811576e-02,
+      "cpu_time": 1.4192386416861843e-02,
+      "time_unit": "ms",
+      "items_per_second": 6.6825291108415578e+04
+    },
+    {
+      "name": "BM_add/process_time/real_time",
+      "family_index": 0,
+      "per_family_instance_index": 0,
+      "run_name": "BM_add/process_time/real_time",
+      "run_type": "iteration",
+      "repetitions": 3,
+      "repetition_index": 1,
+      "threads": 1,
+      "iterations": 1281,
+      "real_time": 1.4231186569368453e-02,
+      "cpu_time": 1.4260260733801742e-02,
+      "time_unit": "ms",
+      "items_per_second": 7.0268209549892621e+04
+    },
+    {
+      "name": "BM_add/process_time/real_time",
+      "family_index": 0,
+      "per_family_instance_index": 0,
+      "run_name": "BM_add/process_time/real_time",
+      "run_type": "iteration",
+      "repetitions": 3,
+      "repetition_index": 2,
+      "threads": 1,
+      "iterations": 1281,
+      "real_time": 1.4858197518251537e-02,
+      "cpu_time": 1.3680730679156863e-02,
+      "time_unit": "ms",
+      "items_per_second": 6.7302914688784993e+04
+    },
+    {
+      "name": "BM_add/process_time/real_time_mean",
+      "family_index": 0,
+      "per_family_instance_index": 0,
+      "run_name": "BM_add/process_time/real_time",
+      "run_type": "aggregate",
+      "repetitions": 3,
+      "threads": 1,
+      "aggregate_name": "mean",
+      "aggregate_unit": "time",
+      "iterations": 3,
+      "real_time": 1.4684592769143856e-02,
+      "cpu_time": 1.4044459276606816e-02,
+      "time_unit": "ms",
+      "items_per_second": 6.8132138449031059e+04
+    },
+    {
+      "name": "BM_add/process_time/real_time_median",
+      "family_index": 0,
+      "per_family_instance_index": 0,
+      "run_name": "BM_add/process_time/real_time",
+      "run_type": "aggregate",
+      "repetitions": 3,
+      "threads": 1,
+      "aggregate_name": "median",
+      "aggregate_unit": "time",
+      "iterations": 3,
+      "real_time": 1.4858197518251536e-02,
+      "cpu_time": 1.4192386416861845e-02,
+      "time_unit": "ms",
+      "items_per_second": 6.7302914688784993e+04
+    },
+    {
+      "name": "BM_add/process_time/real_time_stddev",
+      "family_index": 0,
+      "per_family_instance_index": 0,
+      "run_name": "BM_add/process_time/real_time",
+      "run_type": "aggregate",
+      "repetitions": 3,
+      "threads": 1,
+      "aggregate_name": "stddev",
+      "aggregate_unit": "time",
+      "iterations": 3,
+      "real_time": 3.9623518439387532e-04,
+      "cpu_time": 3.1682108543650516e-04,
+      "time_unit": "ms",
+      "items_per_second": 1.8652428480182991e+03
+    },
+    {
+      "name": "BM_add/process_time/real_time_cv",
+      "family_index": 0,
+      "per_family_instance_index": 0,
+      "run_name": "BM_add/process_time/real_time",
+      "run_type": "aggregate",
+      "repetitions": 3,
+      "threads": 1,
+      "aggregate_name": "cv",
+      "aggregate_unit": "percentage",
+      "iterations": 3,
+      "real_time": 2.6983055684490508e-02,
+      "cpu_time": 2.2558439538090218e-02,
+      "time_unit": "ms",
+      "items_per_second": 2.7376842859756528e-02
+    },
+    {
+      "name": "BM_mul/process_time/real_time",
+      "family_index": 1,
+      "per_family_instance_index": 0,
+      "run_name": "BM_mul/process_time/real_time",
+      "run_type": "iteration",
+      "repetitions": 3,
+      "repetition_index": 0,
+      "threads": 1,
+      "iterations": 197,
+      "real_time": 6.3747649790291020e+01,
+      "cpu_time": 2.3379720812182740e+01,
+      "time_unit": "us",
+      "items_per_second": 1.5686852821863613e+04
+    },
+    {
+      "name": "BM_mul/process_time/real_time",
+      "family_index": 1,
+      "per_family_instance_index": 0,
+      "run_name": "BM_mul/process_time/real_time",
+      "run_type": "iteration",
+      "repetitions": 3,
+      "repetition_index": 1,
+      "threads": 1,
+      "iterations": 197,
+      "real_time": 3.5785426436706270e+01,
+      "cpu_time": 1.2472690355329906e+01,
+      "time_unit": "us",
+      "items_per_second": 2.7944336551883800e+04
+    },
+    {
+      "name": "BM_mul/process_time/real_time",
+      "family_index": 1,
+      "per_family_instance_index": 0,
+      "run_name": "BM_mul/process_time/real_time",
+      "run_type": "iteration",
+      "repetitions": 3,
+      "repetition_index": 2,
+      "threads": 1,
+      "error_occurred": true,
+      "error_message": "INTERNAL; device lost",
+      "iterations": 0,
+      "real_time": 0.0000000000000000e+00,
+      "cpu_time": 0.0000000000000000e+00,
+      "time_unit": "us"
+    },
+    {
+      "name": "BM_mul/process_time/real_time_mean",
+      "family_index": 1,
+      "per_family_instance_index": 0,
+      "run_name": "BM_mul/process_time/real_time",
+      "run_type": "aggregate",
+      "repetitions": 3,
+      "threads": 1,
+      "aggregate_name": "mean",
+      "aggregate_unit": "time",
+      "iterations": 2,
+      "real_time": 4.9766538113498640e+01,
+      "cpu_time": 1.7926205583756320e+01,
+      "time_unit": "us",
+      "items_per_second": 2.1815594686873710e+04
+    },
+    {
+      "name": "BM_mul/process_time/real_time_cv",
+      "family_index": 1,
+      "per_family_instance_index": 0,
+      "run_name": "BM_mul/process_time/real_time",
+      "run_type": "aggregate",
+      "repetitions": 3,
+      "threads": 1,
+      "aggregate_name": "cv",
+      "aggregate_unit": "percentage",
+      "iterations": 2,
+      "real_time": 3.9730064617473560e-01,
+      "cpu_time": 4.3023244169627295e-01,
+      "time_unit": "us",
+      "items_per_second": 3.9730064617473515e-01
+    },
+    {
+      "name": "BM_sub/process_time/real_time",
+      "family_index": 2,
+      "per_family_instance_index": 0,
+      "run_name": "BM_sub/process_time/real_time",
+      "run_type": "iteration",
+      "repetitions": 1,
+      "repetition_index": 0,
+      "threads": 1,
+      "error_occurred": true,
+      "error_message": "INVALID_ARGUMENT; function expected 2 inputs but 0 were provided",
+      "iterations": 0,
+      "real_time": 0.0000000000000000e+00,
+      "cpu_time": 0.0000000000000000e+00,
+      "time_unit": "ms"
+    }
+  ]
+}
+"""
+
+
+def test_run_iree_command_kills_the_child_on_timeout(tmp_path):
+    pid_file = tmp_path / "pid"
+    script = f"import os, time; open({str(pid_file)!r}, 'w').write(str(os.getpid())); time.sleep(600)"
+    start = time.monotonic()
+    ret_value, output = run_iree_command([sys.executable, "-c", script], timeout=1)
+    assert time.monotonic() - start < 30
+    assert ret_value == 1
+    assert output.startswith(b"Command timed out after 1 seconds")
+    # The child was killed and reaped.
+    try:
+        os.kill(int(pid_file.read_text()), 0)
+    except ProcessLookupError:
+        pass
+    else:
+        raise AssertionError("the timed out child is still running")
+
+
+def test_run_iree_command_failure():
+    ret_value, output = run_iree_command([sys.executable, "-c", "import sys; sys.exit('failed')"])
+    assert ret_value == 1
+    assert b"failed" in output
+    assert run_iree_command([sys.executable, "-c", "print('ok')"]) == (0, b"ok\n")
+
+
+def test_parse_benchmark_json():
+    stats = parse_benchmark_json(BENCHMARK_JSON)
+    # Functions whose repetitions all failed have no result.
+    assert set(stats) == {"add", "mul"}
+
+    add = stats["add"]
+    assert add.repetitions == 3
+    assert add.mean_ms == 1.4684592769143856e-02
+    assert add.median_ms == 1.4858197518251536e-02
+    assert add.stddev_ms == 3.9623518439387532e-04
+    # The CV aggregate is a fraction, not a time.
+    assert add.cv == 2.6983055684490508e-02
+    assert add.min_ms == 1.4231186569368453e-02
+    assert add.max_ms == 1.4964394219811576e-02
+
+    # Repetitions in us are converted to ms, and the failed one is left out.
+    mul = stats["mul"]
+    assert mul.repetitions == 2
+    assert mul.mean_ms == pytest.approx(4.9766538113498640e-02)
+    assert mul.cv == 3.9730064617473560e-01
+    assert mul.min_ms == pytest.approx(3.5785426436706270e-02)
+    assert mul.max_ms == pytest.approx(6.3747649790291020e-02)
+    # Aggregates missing from the report are computed from the repetitions.
+    assert mul.median_ms == pytest.approx(4.9766538113498640e-02)
+    assert mul.stddev_ms == pytest.approx(1.9772277750372616e-02)
+
+
+def test_parse_benchmark_json_without_results():
+    assert parse_benchmark_json(b'{"context": {}, "benchmarks": []}') == {}
+    with pytest.raises(ValueError):
+        parse_benchmark_json(b"iree-benchmark-module: INTERNAL; device lost")
+
+
+def test_get_benchmark_stats():
+    stats = get_benchmark_stats([4.0, 1.0, 2.0, 3.0])
+    assert stats.mean_ms == 2.5
+    assert stats.median_ms == 2.5
+    assert stats.stddev_ms == pytest.approx(1.2909944)
+    assert stats.cv == pytest.approx(1.2909944 / 2.5)
+    assert (stats.min_ms, stats.max_ms, stats.repetitions) == (1.0, 4.0, 4)
+
+    single = get_benchmark_stats([2.0])
+    assert (single.mean_ms, single.stddev_ms, single.cv, single.repetitions) == (2.0, 0.0, 0.0, 1)
+
+
+def test_percentiles():
+    times = [float(ms) for ms in range(100, 0, -1)]
+    assert get_percentile(times, 0) == 1.0
+    assert get_percentile(times, 50) == 50.5
+    assert get_percentile(times, 90) == pytest.approx(90.1)
+    assert get_percentile(times, 99) == pytest.approx(99.01)
+    assert get_percentile(times, 100) == 100.0
+    assert get_percentile([3.0], 99) == 3.0
+
+
+def test_latency_histogram():
+    assert get_latency_histogram([float(ms) for ms in range(1, 101)]) == (10,) * 10
+    assert get_latency_histogram([2.0] * 5) == (5, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+    # The maximum falls into the last bin.
+    assert get_latency_histogram([1.0, 2.0, 3.0, 4.0], bins=3) == (1, 1, 2)
+
+
+def test_latency_tail():
+    # Two slow invocations out of a hundred.
+    times = [1.0] * 98 + [10.0, 100.0]
+    stats = get_benchmark_stats(times)
+    assert stats.median_ms == 1.0
+    assert stats.p90_ms == 1.0
+    assert stats.p99_ms == pytest.approx(10.9)
+    assert stats.max_ms == 100.0
+    assert stats.histogram == (99, 0, 0, 0, 0, 0, 0, 0, 0, 1)
+    columns = get_stats_columns(stats)
+    assert columns[-4:] == (1000.0, 10900.0, 100000.0, "99 0 0 0 0 0 0 0 0 1")
+    assert get_stats_columns(None) == (None,) * len(columns)
+    assert get_latency_flags(100) == ["--benchmark_repetitions=100", "--benchmark_min_time=1x"]
@@ -0,0 +1,57 @@
+import os
+
+from utils.compile_cache import CompileCache, parse_size
+
+
+def _set_mtime(cache: CompileCache, key: str, mtime: float):
+    os.utime(cache.get_entry_path(key), (mtime, mtime))
+
+
+def test_parse_size():
+    assert parse_size("512") == 512
+    assert parse_size("512M") == 512 << 20
+    assert parse_size("20G") == 20 << 30
+    assert parse_size("1.5KiB") == 1536
+    assert parse_size(1000) == 1000
+
+
+def test_keys_depend_on_source_version_and_flags(tmp_path):
+    cache = CompileCache(tmp_path, compiler_version="1")
+    key = cache.get_key("module", ["--a"])
+    assert key == cache.get_key("module", ["--a"])
+    assert key != cache.get_key("module ", ["--a"])
+    assert key != cache.get_key("module", ["--b"])
+    assert key != CompileCache(tmp_path, compiler_version="2").get_key("module", ["--a"])
+
+
+def test_lookup_and_read(tmp_path):
+    cache = CompileCache(tmp_path / "cache", compiler_version="1")
+    cache.store("a", b"vmfb a")
+    assert cache.read("a") == b"vmfb a"
+    assert cache.read("b") is None
+    assert cache.lookup("a", tmp_path / "a.vmfb")
+    assert (tmp_path / "a.vmfb").read_bytes() == b"vmfb a"
+    assert not cache.lookup("b", tmp_path / "b.vmfb")
+    assert not (tmp_path / "b.vmfb").exists()
+
+
+def test_evicts_least_recently_used_beyond_size_limit(tmp_path):
+    cache = CompileCache(tmp_path, max_size=300, compiler_version="1")
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.store(key, bytes(100))
+        _set_mtime(cache, key, 1000 + i)
+    # A hit refreshes "a", so "b" is now the least recently used entry.
+    assert cache.read("a") is not None
+    cache.store("d", bytes(100))
+    assert [path.stem for path in sorted(tmp_path.glob("*.vmfb"))] == ["a", "c", "d"]
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_evicts_until_under_size_limit(tmp_path):
+    cache = CompileCache(tmp_path, max_size=250, compiler_version="1")
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.store(key, bytes(100))
+        _set_mtime(cache, key, 1000 + i)
+    cache.store("big", bytes(200))
+    assert [path.stem for path in tmp_path.glob("*.vmfb")] == ["big"]
+    assert sum(path.stat().st_size for path in tmp_path.glob("*.vmfb")) <= 250
@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip("iree.compiler")
+
+from utils import compiler
+from utils.compiler import compile_in_process
+
+CPU_FLAGS = ["--iree-hal-target-device=local", "--iree-hal-local-target-device-backends=llvm-cpu"]
+
+ADD_MLIR = """
+func.func @main(%a: tensor<4xf32>, %b: tensor<4xf32>) -> tensor<4xf32> {
+  %0 = arith.addf %a, %b : tensor<4xf32>
+  return %0 : tensor<4xf32>
+}
+"""
+
+# Adds tensors of different shapes, which the verifier rejects.
+INVALID_MLIR = """
+func.func @main(%a: tensor<4xf32>, %b: tensor<8xf32>) -> tensor<4xf32> {
+  %0 = arith.addf %a, %b : tensor<4xf32>
+  return %0 : tensor<4xf32>
+}
+"""
+
+
+def test_diagnostics_of_failed_compile():
+    ret_value, output = compile_in_process("invalid.mlir", None, CPU_FLAGS, INVALID_MLIR)
+    assert ret_value == 1
+    assert output.startswith(b"error: ")
+    assert b"tensor<8xf32>" in output
+
+
+def test_diagnostics_belong_to_their_invocation():
+    compile_in_process("invalid.mlir", None, CPU_FLAGS, INVALID_MLIR)
+    # The same session compiles the next kernel without the earlier errors.
+    ret_value, vmfb = compile_in_process("add.mlir", None, CPU_FLAGS, ADD_MLIR)
+    assert ret_value == 0
+    assert b"error" not in vmfb[:64]
+    ret_value, output = compile_in_process("typo.mlir", None, CPU_FLAGS, ADD_MLIR.replace("arith.addf", "arith.adf"))
+    assert ret_value == 1
+    assert b"arith.adf" in output
+    assert b"tensor<8xf32>" not in output
+
+
+def test_diagnostics_without_callback_api(monkeypatch):
+    # As with a release that renamed the private C API handles.
+    monkeypatch.setattr(compiler, "_ENABLE_CALLBACK_DIAGNOSTICS", "ireeCompilerRenamedCallbackDiagnostics")
+    ret_value, output = compile_in_process("invalid.mlir", None, CPU_FLAGS, INVALID_MLIR)
+    assert ret_value == 1
+    assert b"printed to stderr" in output
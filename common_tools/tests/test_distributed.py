@@ -0,0 +1,106 @@
+import os
+import stat
+import time
+import threading
+
+import pytest
+
+from conftest import read_rows
+from utils.distributed import WorkQueue, run_worker
+
+
+def _square(x):
+    if x < 0:
+        raise ValueError(f"negative input {x}")
+    return x * x
+
+
+def _get_failed(args):
+    return ("failed", *args)
+
+
+def _run_in_thread(queue, jobs) -> tuple[threading.Thread, list]:
+    results = []
+    thread = threading.Thread(target=lambda: results.extend(queue.run(_square, jobs, _get_failed)))
+    thread.start()
+    return thread, results
+
+
+def _claim_by_dead_worker(queue_dir) -> str:
+    """Claim the pending job like a worker that died right away, and return its key."""
+    while not (pending := list((queue_dir / "pending").glob("*.job"))):
+        time.sleep(0.05)
+    key = pending[0].name.split(".")[0]
+    claimed = queue_dir / "claimed" / f"{key}.dead-worker.job"
+    os.rename(pending[0], claimed)
+    os.utime(claimed, (0, 0))
+    return key
+
+
+def test_worker_errors_become_failed_results(tmp_path):
+    queue = WorkQueue(tmp_path)
+    thread, results = _run_in_thread(queue, [("a", (2,)), ("b", (-1,)), ("c", (3,))])
+    run_worker(tmp_path, idle_timeout=1)
+    thread.join()
+    assert sorted(results, key=str) == sorted([4, ("failed", -1), 9], key=str)
+
+
+def test_stale_claim_is_requeued(tmp_path):
+    queue = WorkQueue(tmp_path, heartbeat_timeout=0.5)
+    thread, results = _run_in_thread(queue, [("a", (3,))])
+    _claim_by_dead_worker(tmp_path)
+    run_worker(tmp_path, idle_timeout=2, heartbeat_timeout=0.5)
+    thread.join()
+    assert results == [9]
+
+
+def test_abandoned_job_becomes_failed_result(tmp_path):
+    queue = WorkQueue(tmp_path, heartbeat_timeout=0.5, max_attempts=1)
+    thread, results = _run_in_thread(queue, [("a", (3,))])
+    _claim_by_dead_worker(tmp_path)
+    thread.join(timeout=10)
+    assert results == [("failed", 3)]
+    assert not list((tmp_path / "claimed").iterdir())
+
+
+def test_coordinator_with_local_workers(gemm_suite, tmp_path):
+    queue_dir = tmp_path / "queue"
+    workers = [
+        gemm_suite.start("--worker", "compile", "--queue-dir", queue_dir, "--worker-idle-timeout", "5"),
+        gemm_suite.start(
+            "--worker", "benchmark", "--queue-dir", queue_dir, "--devices", "hip://0,hip://1",
+            "--worker-idle-timeout", "5",
+        ),
+    ]
+    output = tmp_path / "gemm.csv"
+    gemm_suite.run("--output", output, "--queue-dir", queue_dir, "--distribute", "compile,benchmark")
+    for worker in workers:
+        assert worker.wait(timeout=60) == 0, worker.stdout.read()
+
+    rows = read_rows(output)
+    assert len(rows) == 8
+    assert all(row["ok"] == "True" for row in rows)
+    assert {row["device"] for row in rows} <= {"hip://0", "hip://1"}
+    assert not list((queue_dir / "benchmark" / "pending").iterdir())
+
+
+def test_queue_dirs_are_private(tmp_path):
+    WorkQueue(tmp_path / "queue" / "compile")
+    for subdir in ["", "pending", "claimed", "done"]:
+        assert stat.S_IMODE((tmp_path / "queue" / "compile" / subdir).stat().st_mode) & 0o077 == 0
+
+
+def test_queue_dirs_writable_by_others_are_rejected(gemm_suite, tmp_path):
+    queue_dir = tmp_path / "queue"
+    (queue_dir / "compile" / "pending").mkdir(parents=True)
+    (queue_dir / "compile" / "pending").chmod(0o777)
+    with pytest.raises(ValueError, match="writable by other users"):
+        WorkQueue(queue_dir / "compile")
+    with pytest.raises(ValueError, match="writable by other users"):
+        run_worker(queue_dir / "compile", idle_timeout=0)
+
+    queue_dir.chmod(0o775)
+    proc = gemm_suite.start("--queue-dir", queue_dir)
+    output, _ = proc.communicate(timeout=60)
+    assert proc.returncode == 2
+    assert f"chmod go-w {queue_dir}" in output
@@ -0,0 +1,134 @@
+import json
+
+import pytest
+
+from utils.problem_sets import (
+    ProblemSelection,
+    find_problem_set,
+    get_problem_set_names,
+    iter_problem_configs,
+    iter_problems,
+    load_problem_set,
+)
+
+PROBLEM_SET = {
+    "suite": "gemm",
+    "problems": [
+        {
+            "tag": "llama",
+            "description": "Two dtypes of every shape.",
+            "dtype": ["f16", "bf16"],
+            "transpose": "NT",
+            "columns": ["M", "N", "K"],
+            "shapes": [[16, 4096, 4096], [2048, 4096, 4096]],
+        },
+        {
+            "tag": "unet",
+            "dtype": "i8",
+            "transpose": "NN",
+            "columns": ["M", "N", "K"],
+            "shapes": [[2048, 1280, 5120]],
+        },
+    ],
+}
+
+TOML_PROBLEM_SET = """
+suite = "gemm"
+
+[[problems]]
+tag = "square"
+dtype = "f32"
+transpose = "NN"
+columns = ["M", "N", "K"]
+shapes = [[64, 64, 64], [128, 128, 128]]
+"""
+
+
+class _Config:
+    def __init__(self, fields):
+        self.fields = fields
+
+    def get_name(self):
+        fields = self.fields
+        return f"gemm_{fields['M']}_{fields['N']}_{fields['K']}_{fields['dtype']}_{fields['transpose']}"
+
+
+@pytest.fixture
+def problem_dir(tmp_path):
+    (tmp_path / "models.json").write_text(json.dumps(PROBLEM_SET))
+    (tmp_path / "square.toml").write_text(TOML_PROBLEM_SET)
+    return tmp_path
+
+
+def _get_names(problem_dir, selection=None, problem_sets=("models",)):
+    return [
+        (tag, config.get_name())
+        for tag, config in iter_problem_configs(problem_dir, problem_sets, "gemm", _Config, selection)
+    ]
+
+
+def test_iter_problems_expands_lists_in_file_order(problem_dir):
+    path = problem_dir / "models.json"
+    problems = list(iter_problems(load_problem_set(path, "gemm"), path))
+    assert problems[:3] == [
+        {"tag": "llama", "dtype": "f16", "transpose": "NT", "M": 16, "N": 4096, "K": 4096},
+        {"tag": "llama", "dtype": "f16", "transpose": "NT", "M": 2048, "N": 4096, "K": 4096},
+        {"tag": "llama", "dtype": "bf16", "transpose": "NT", "M": 16, "N": 4096, "K": 4096},
+    ]
+    assert len(problems) == 5
+
+
+def test_find_and_load_problem_sets(problem_dir):
+    assert get_problem_set_names(problem_dir) == ["models", "square"]
+    assert find_problem_set("square", problem_dir) == problem_dir / "square.toml"
+    assert find_problem_set(str(problem_dir / "models.json"), problem_dir / "elsewhere") == problem_dir / "models.json"
+    with pytest.raises(ValueError, match="one of models, square"):
+        find_problem_set("missing", problem_dir)
+    with pytest.raises(ValueError, match="not conv problems"):
+        load_problem_set(problem_dir / "models.json", "conv")
+    assert _get_names(problem_dir, problem_sets=["square"]) == [
+        ("square", "gemm_64_64_64_f32_NN"),
+        ("square", "gemm_128_128_128_f32_NN"),
+    ]
+
+
+def test_select_by_tag(problem_dir):
+    assert _get_names(problem_dir, ProblemSelection(tags=["unet"])) == [("unet", "gemm_2048_1280_5120_i8_NN")]
+    assert len(_get_names(problem_dir, ProblemSelection(tags=["unet", "llama"]))) == 5
+    assert _get_names(problem_dir, ProblemSelection(tags=["missing"])) == []
+
+
+def test_select_by_dtype(problem_dir):
+    assert _get_names(problem_dir, ProblemSelection(dtypes=["bf16"])) == [
+        ("llama", "gemm_16_4096_4096_bf16_NT"),
+        ("llama", "gemm_2048_4096_4096_bf16_NT"),
+    ]
+    assert len(_get_names(problem_dir, ProblemSelection(dtypes=["i8", "f16"]))) == 3
+
+
+def test_select_by_shape_regex(problem_dir):
+    selection = ProblemSelection(shape_regex=r"^gemm_2048_")
+    assert _get_names(problem_dir, selection) == [
+        ("llama", "gemm_2048_4096_4096_f16_NT"),
+        ("llama", "gemm_2048_4096_4096_bf16_NT"),
+        ("unet", "gemm_2048_1280_5120_i8_NN"),
+    ]
+
+
+def test_limit_counts_the_kernels_matching_the_other_selectors(problem_dir):
+    assert _get_names(problem_dir, ProblemSelection(limit=2)) == [
+        ("llama", "gemm_16_4096_4096_f16_NT"),
+        ("llama", "gemm_2048_4096_4096_f16_NT"),
+    ]
+    selection = ProblemSelection(dtypes=["bf16", "i8"], shape_regex="_2048_", limit=2)
+    assert _get_names(problem_dir, selection) == [
+        ("llama", "gemm_2048_4096_4096_bf16_NT"),
+        ("unet", "gemm_2048_1280_5120_i8_NN"),
+    ]
+    assert _get_names(problem_dir, ProblemSelection(limit=0)) == []
+
+
+def test_limit_spans_problem_sets(problem_dir):
+    names = _get_names(problem_dir, ProblemSelection(limit=6), problem_sets=["models", "square"])
+    assert names[-1] == ("square", "gemm_64_64_64_f32_NN")
+    assert len(names) == 6
@@ -0,0 +1,37 @@
+import os
+import shutil
+import subprocess
+import sys
+
+from conftest import COMMON_TOOLS, REPO_ROOT
+
+
+def _run(site, cwd, *args):
+    # `utils` copied elsewhere, like a non-editable install.
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(site), os.environ.get("PYTHONPATH")]))}
+    return subprocess.run(
+        [sys.executable, "-m", "utils.run", "gemm", *args, "--help"],
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        timeout=60,
+    )
+
+
+def test_repo_root_of_installed_utils(tmp_path):
+    site = tmp_path / "site-packages"
+    shutil.copytree(COMMON_TOOLS / "utils", site / "utils", ignore=shutil.ignore_patterns("__pycache__"))
+
+    proc = _run(site, tmp_path)
+    assert proc.returncode == 2
+    assert "Cannot find the suite drivers" in proc.stdout
+    proc = _run(site, tmp_path, "--repo-root", tmp_path)
+    assert proc.returncode == 2
+    assert "pass the root of the repository as --repo-root" in proc.stdout
+
+    for cwd, args in [(tmp_path, ["--repo-root", REPO_ROOT]), (REPO_ROOT, [])]:
+        proc = _run(site, cwd, *args)
+        assert proc.returncode == 0, proc.stdout
+        assert "python -m utils.run gemm" in proc.stdout
@@ -0,0 +1,47 @@
+import pytest
+
+iree_compiler = pytest.importorskip("iree.compiler")
+pytest.importorskip("iree.runtime")
+
+from utils.runtime import benchmark_in_process
+
+ADD_MLIR = """
+func.func @main(%a: tensor<64x64xf32>, %b: tensor<64x64xf32>) -> tensor<64x64xf32> {
+  %0 = arith.addf %a, %b : tensor<64x64xf32>
+  return %0 : tensor<64x64xf32>
+}
+"""
+
+
+@pytest.fixture(scope="module")
+def cpu_vmfb() -> bytes:
+    return iree_compiler.compile_str(
+        ADD_MLIR, target_backends=["llvm-cpu"], extra_args=["--iree-llvmcpu-target-cpu=host"]
+    )
+
+
+def get_exec_args(*flags) -> list[str]:
+    return [
+        "iree-benchmark-module",
+        "--device=local-task",
+        "--function=main",
+        "--input=64x64xf32",
+        "--input=64x64xf32",
+        "--benchmark_repetitions=3",
+        "--benchmark_min_time=10x",
+        *flags,
+    ]
+
+
+def test_benchmark_in_process_from_file(cpu_vmfb, tmp_path):
+    vmfb_file = tmp_path / "add.vmfb"
+    vmfb_file.write_bytes(cpu_vmfb)
+    times = benchmark_in_process(get_exec_args(f"--module={vmfb_file}"))
+    assert len(times) == 3
+    assert all(time_ms > 0 for time_ms in times)
+
+
+def test_benchmark_in_process_from_memory(cpu_vmfb):
+    times = benchmark_in_process(get_exec_args("--module=add.vmfb"), module_data=cpu_vmfb)
+    assert len(times) == 3
+    assert all(time_ms > 0 for time_ms in times)
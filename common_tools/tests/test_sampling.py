@@ -0,0 +1,118 @@
+import csv
+
+import pytest
+
+from utils.sampling import (
+    KernelCostModel,
+    parse_duration,
+    select_budgeted_configs,
+    select_within_budget,
+)
+
+
+class _Config:
+    def __init__(self, name, dtype, flops):
+        self.name, self.dtype, self.flops = name, dtype, flops
+
+    def get_name(self):
+        return self.name
+
+    def get_flops(self):
+        return self.flops
+
+
+class _Suite:
+    name = "gemm"
+
+    def get_stratum(self, tag, config):
+        return (tag, config.dtype)
+
+    def get_job_name(self, config):
+        return config.get_name()
+
+
+def _get_kernels():
+    # Two strata of four kernels each; the first kernel of each is the cheapest.
+    kernels = []
+    for stratum in [("gemm", "llama", "f16"), ("gemm", "llama", "bf16")]:
+        for i in range(4):
+            kernels.append((f"{stratum[2]}_{i}", [stratum], 2.0 + i, 1.0 + i))
+    return kernels
+
+
+def test_parse_duration():
+    assert parse_duration("90s") == 90
+    assert parse_duration("20m") == 1200
+    assert parse_duration("1.5h") == 5400
+    assert parse_duration("45") == 45
+    assert parse_duration(12) == 12.0
+    with pytest.raises(ValueError):
+        parse_duration("soon")
+
+
+def test_every_stratum_gets_its_cheapest_kernel_first():
+    # The cheapest kernels of both strata take 4s; nothing else fits.
+    assert select_within_budget(_get_kernels(), budget=5) == {"f16_0", "bf16_0"}
+
+
+def test_selection_stays_within_budget():
+    kernels = _get_kernels()
+    costs = {name: (compile_seconds, benchmark_seconds) for name, _, compile_seconds, benchmark_seconds in kernels}
+    for budget in [4, 9, 15, 30]:
+        selected = select_within_budget(kernels, budget)
+        assert sum(costs[name][0] for name in selected) <= budget
+        assert sum(costs[name][1] for name in selected) <= budget
+    assert len(select_within_budget(kernels, 100)) == len(kernels)
+    assert select_within_budget(kernels, 1) == set()
+
+
+def test_selection_spreads_over_strata_and_is_stable():
+    kernels = [(name, strata, 2.0, 1.0) for name, strata, _, _ in _get_kernels()]
+    selected = select_within_budget(kernels, budget=12)
+    # The remaining budget goes to the strata in turn.
+    assert len([name for name in selected if name.startswith("f16")]) == 3
+    assert len([name for name in selected if name.startswith("bf16")]) == 3
+    assert select_within_budget(list(reversed(kernels)), budget=12) == selected
+
+
+def test_selection_covers_new_values_first():
+    kernels = [
+        ("a", [("gemm", "llama", "f16")], 1.0, 1.0),
+        ("b", [("gemm", "llama", "bf16")], 1.0, 1.0),
+        ("c", [("gemm", "unet", "f16")], 1.0, 1.0),
+    ]
+    # "a" adds no value that "b" and "c" together do not cover.
+    assert select_within_budget(kernels, budget=2) == {"b", "c"}
+
+
+def test_workers_and_devices_scale_the_budget():
+    kernels = _get_kernels()
+    assert select_within_budget(kernels, budget=2, compile_workers=2, devices=2) == {"f16_0", "bf16_0"}
+    assert select_within_budget(kernels, budget=2, devices=2) == {"f16_0"}
+
+
+def test_select_budgeted_configs_writes_skipped_configs(tmp_path):
+    suite = _Suite()
+    configs = [("llama", _Config(f"{dtype}_{i}", dtype, (i + 1) * 1e14)) for dtype in ["f16", "bf16"] for i in range(3)]
+    # The same kernel listed under another tag is only run once.
+    configs.append(("unet", configs[0][1]))
+    cost_model = KernelCostModel(None, {"f16_0": 100.0})
+    skipped_file = tmp_path / "skipped.csv"
+    budgeted = select_budgeted_configs(
+        [suite], {"gemm": configs}, {"gemm": cost_model}, 45, 1, 1, {"gemm": str(skipped_file)}
+    )
+
+    names = [config.get_name() for _, config in budgeted["gemm"]]
+    assert names == ["f16_0", "bf16_0", "f16_0"]
+    with open(skipped_file) as f:
+        skipped = list(csv.DictReader(f))
+    assert sorted(row["name"] for row in skipped) == ["bf16_1", "bf16_2", "f16_1", "f16_2"]
+    assert {row["stratum"] for row in skipped} == {"llama/f16", "llama/bf16"}
+
+
+def test_cost_model_without_history():
+    cost_model = KernelCostModel(None, {"known": 2e6}, device_flops=1e12, runs_per_kernel=2)
+    assert cost_model.predict_compile_seconds("any", 1e9) == 20.0
+    # 1s of startup and three repetitions of the 2s mean, or of the 0.5s minimum time.
+    assert cost_model.predict_benchmark_seconds("known", 1e9) == 2 * (1 + 3 * 2)
+    assert cost_model.predict_benchmark_seconds("unknown", 1e9) == 2 * (1 + 3 * 0.5)
@@ -0,0 +1,85 @@
+import json
+import time
+
+from utils.scheduler import CompileScheduler
+
+
+def _compile(name, seconds=0.0):
+    time.sleep(seconds)
+    return name
+
+
+def _timed_compile(name, seconds):
+    start = time.time()
+    time.sleep(seconds)
+    return name, start, time.time()
+
+
+def _get_max_concurrency(results) -> int:
+    events = sorted([(start, 1) for _, start, _ in results] + [(end, -1) for _, _, end in results])
+    running = concurrency = 0
+    for _, change in events:
+        running += change
+        concurrency = max(concurrency, running)
+    return concurrency
+
+
+def _get_scheduler(tmp_path, history: dict, **kwargs) -> CompileScheduler:
+    history_path = tmp_path / "history.json"
+    history_path.write_text(json.dumps(history))
+    return CompileScheduler(history_path=history_path, **kwargs)
+
+
+def _get_failed(args):
+    return ("failed", args[0])
+
+
+def test_in_process_compile_timeout_restarts_the_pool():
+    scheduler = CompileScheduler(2, 1 << 40, backend="inprocess")
+    # "running" is still compiling when "hung" times out, and starts over.
+    jobs = [("hung", 3, ("hung", 600)), ("first", 2, ("first", 0.5)), ("running", 1, ("running", 0.8))]
+    start = time.monotonic()
+    results = list(scheduler.run(_compile, jobs, _get_failed, timeout=1))
+    assert time.monotonic() - start < 30
+    assert results == ["first", ("failed", "hung"), "running"]
+    assert "hung" not in scheduler.history
+
+
+def test_order_jobs_most_expensive_first_within_lookahead():
+    jobs = [(name, cost, ()) for name, cost in [("a", 1), ("b", 3), ("c", 2), ("d", 5), ("e", 4)]]
+    scheduler = CompileScheduler(1, 1 << 40)
+    assert [name for name, _, _ in scheduler.order_jobs(jobs)] == ["d", "e", "b", "c", "a"]
+    scheduler = CompileScheduler(1, 1 << 40, lookahead=2)
+    assert [name for name, _, _ in scheduler.order_jobs(jobs)] == ["b", "c", "d", "e", "a"]
+
+
+def test_order_jobs_prefers_the_compile_history(tmp_path):
+    history = {"a": {"size": 1, "seconds": 100, "peak_rss": 1}, "b": {"size": 1, "seconds": 10, "peak_rss": 1}}
+    scheduler = _get_scheduler(tmp_path, history, max_workers=1, memory_limit=1 << 40)
+    # Unmeasured kernels are predicted from the seconds per size of the history.
+    assert scheduler.predict_cost("c", 30) == 30 * 55
+    jobs = [("b", 1, ()), ("c", 0.01, ()), ("a", 1, ())]
+    assert [name for name, _, _ in scheduler.order_jobs(jobs)] == ["a", "b", "c"]
+
+
+def test_jobs_start_only_when_their_memory_fits(tmp_path):
+    names = ["a", "b", "c", "d"]
+    history = {name: {"size": 1, "seconds": 1, "peak_rss": 60} for name in names}
+    scheduler = _get_scheduler(tmp_path, history, max_workers=4, memory_limit=100)
+    jobs = [(name, 1, (name, 0.3)) for name in names]
+    results = list(scheduler.run(_timed_compile, jobs))
+    assert sorted(name for name, _, _ in results) == names
+    assert _get_max_concurrency(results) == 1
+
+    history = {name: {"size": 1, "seconds": 1, "peak_rss": 30} for name in names}
+    scheduler = _get_scheduler(tmp_path, history, max_workers=4, memory_limit=100)
+    results = list(scheduler.run(_timed_compile, jobs))
+    assert _get_max_concurrency(results) == 3
+
+
+def test_job_larger_than_the_memory_limit_runs_alone(tmp_path):
+    history = {"big": {"size": 1, "seconds": 2, "peak_rss": 500}, "small": {"size": 1, "seconds": 1, "peak_rss": 10}}
+    scheduler = _get_scheduler(tmp_path, history, max_workers=4, memory_limit=100)
+    results = list(scheduler.run(_timed_compile, [("big", 1, ("big", 0.3)), ("small", 1, ("small", 0.3))]))
+    assert sorted(name for name, _, _ in results) == ["big", "small"]
+    assert _get_max_concurrency(results) == 1
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+from conftest import COMMON_TOOLS
+from utils.run import SUITE_SCRIPTS
+from utils.startup import DEFAULT_MAX_STARTUP_SECONDS, measure_startup
+
+# Wall clock limits depend on the machine, so they are only checked on request.
+CHECK_STARTUP_SECONDS = os.environ.get("CHECK_STARTUP_SECONDS") == "1"
+
+
+@pytest.fixture(autouse=True)
+def _utils_path(monkeypatch):
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(filter(None, [str(COMMON_TOOLS), os.environ.get("PYTHONPATH")])))
+
+
+@pytest.mark.parametrize("suite", list(SUITE_SCRIPTS))
+def test_suite_does_not_import_heavy_modules(suite):
+    _, heavy = measure_startup(suite, repeat=1)
+    assert not heavy, f"{suite} imports {', '.join(heavy)} at startup"
+
+
+@pytest.mark.skipif(not CHECK_STARTUP_SECONDS, reason="set CHECK_STARTUP_SECONDS=1 to check the startup time")
+@pytest.mark.parametrize("suite", list(SUITE_SCRIPTS))
+def test_suite_starts_quickly(suite):
+    seconds, _ = measure_startup(suite, repeat=3)
+    assert seconds <= DEFAULT_MAX_STARTUP_SECONDS
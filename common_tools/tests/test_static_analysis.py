@@ -0,0 +1,93 @@
+from utils.static_analysis import estimate_occupancy, parse_amdgpu_metadata
+
+ISA = """\
+\t.amdhsa_kernel main_dispatch_0
+\t\t.amdhsa_next_free_vgpr 136
+\t\t.amdhsa_accum_offset 72
+\t.end_amdhsa_kernel
+\t.amdgpu_metadata
+---
+amdhsa.kernels:
+  - .agpr_count:     64
+    .group_segment_fixed_size: 32768
+    .max_flat_workgroup_size: 256
+    .name:           main_dispatch_0
+    .private_segment_fixed_size: 16
+    .sgpr_count:     40
+    .sgpr_spill_count: 0
+    .vgpr_count:     70
+    .vgpr_spill_count: 2
+    .wavefront_size: 64
+  - .group_segment_fixed_size: 0
+    .max_flat_workgroup_size: 64
+    .name:           main_dispatch_1
+    .sgpr_count:     20
+    .vgpr_count:     32
+amdhsa.target:   amdgcn-amd-amdhsa--gfx942
+amdhsa.version:
+  - 1
+  - 2
+...
+
+\t.end_amdgpu_metadata
+"""
+
+
+def _dispatch(**values) -> dict:
+    dispatch = {
+        "target": "gfx942",
+        "vgprs": 32,
+        "sgprs": 16,
+        "lds_bytes": 0,
+        "workgroup_size": 256,
+        "wavefront_size": 64,
+    }
+    dispatch.update(values)
+    return dispatch
+
+
+def test_parse_amdgpu_metadata():
+    first, second = parse_amdgpu_metadata(ISA)
+    assert first["name"] == "main_dispatch_0"
+    assert first["target"] == "gfx942"
+    assert (first["vgprs"], first["agprs"], first["sgprs"]) == (70, 64, 40)
+    assert (first["lds_bytes"], first["scratch_bytes"], first["vgpr_spills"]) == (32768, 16, 2)
+    assert first["workgroup_size"] == 256
+    # The descriptor's next_free_vgpr counts the AGPRs after accum_offset.
+    assert first["unified_vgprs"] == 136
+    assert first["occupancy"] == 2
+    assert second["name"] == "main_dispatch_1"
+    assert (second["vgprs"], second["agprs"], second["lds_bytes"]) == (32, 0, 0)
+    assert second["unified_vgprs"] == 32
+    assert second["occupancy"] == 8
+
+
+def test_parse_amdgpu_metadata_without_metadata():
+    assert parse_amdgpu_metadata("\ts_endpgm\n") == []
+
+
+def test_occupancy_is_limited_by_vgprs():
+    assert estimate_occupancy(_dispatch(vgprs=128)) == 4
+    assert estimate_occupancy(_dispatch(vgprs=129)) == 3
+    assert estimate_occupancy(_dispatch(vgprs=64, unified_vgprs=256)) == 2
+
+
+def test_occupancy_is_limited_by_sgprs():
+    assert estimate_occupancy(_dispatch(sgprs=96)) == 8
+    assert estimate_occupancy(_dispatch(sgprs=97)) == 7
+    assert estimate_occupancy(_dispatch(sgprs=400)) == 2
+
+
+def test_occupancy_is_limited_by_lds():
+    # Two workgroups of 4 waves fit in 64 KiB, i.e. 2 waves per SIMD.
+    assert estimate_occupancy(_dispatch(lds_bytes=32 << 10)) == 2
+    # A single wave that takes all the LDS still runs.
+    assert estimate_occupancy(_dispatch(lds_bytes=64 << 10, workgroup_size=64)) == 1
+    assert estimate_occupancy(_dispatch(lds_bytes=64 << 10, workgroup_size=1024)) == 4
+    assert estimate_occupancy(_dispatch(lds_bytes=96 << 10)) == 0
+    assert estimate_occupancy(_dispatch(target="gfx950", lds_bytes=64 << 10, workgroup_size=64)) == 1
+
+
+def test_occupancy_of_unknown_target():
+    assert estimate_occupancy(_dispatch(target="gfx1100")) is None
+    assert estimate_occupancy(_dispatch(target=None)) is None
@@ -0,0 +1,163 @@
+import csv
+import json
+
+from conftest import read_rows
+
+
+def test_full_run(gemm_suite, tmp_path):
+    output = tmp_path / "gemm.csv"
+    gemm_suite.run("--output", output)
+    rows = read_rows(output)
+    assert [int(row["index"]) for row in rows] == list(range(len(rows)))
+    assert len(rows) == 8
+    assert all(row["ok"] == "True" and float(row["mean_microseconds"]) > 0 for row in rows)
+    assert {row["device"] for row in rows} == {"hip"}
+
+
+def test_resume_runs_only_missing_kernels(gemm_suite, tmp_path):
+    output = tmp_path / "gemm.csv"
+    gemm_suite.run("--output", output)
+    with open(output, newline="") as f:
+        lines = list(csv.reader(f))
+    with open(output, "w", newline="") as f:
+        csv.writer(f).writerows(lines[:-3])
+    kept = read_rows(output)
+
+    proc = gemm_suite.run("--output", output, "--resume")
+    assert "skipping 5 completed kernels" in proc.stdout
+    rows = read_rows(output)
+    assert rows[:5] == kept
+    assert sorted(row["name"] for row in rows) == sorted(line[lines[0].index("name")] for line in lines[1:])
+
+
+def _write_problem_set(path, tags, shapes):
+    problems = [
+        {"tag": tag, "dtype": "f16", "transpose": "NT", "columns": ["M", "N", "K"], "shapes": shapes} for tag in tags
+    ]
+    path.write_text(json.dumps({"suite": "gemm", "problems": problems}))
+
+
+def test_resume_copies_kernels_measured_under_another_tag(gemm_suite, tmp_path):
+    output = tmp_path / "gemm.csv"
+    problems = tmp_path / "problems.json"
+    shapes = [[512, 512, 512], [1024, 1024, 1024]]
+    _write_problem_set(problems, ["llama"], shapes)
+    gemm_suite.run("--output", output, "--problems", problems)
+    measured = read_rows(output)
+    assert len(measured) == 2
+
+    _write_problem_set(problems, ["llama", "unet"], [*shapes, [2048, 2048, 2048]])
+    proc = gemm_suite.run("--output", output, "--problems", problems, "--resume")
+    # Only the new shape is measured; every kernel under the new tag is a copy.
+    assert "1 Success, 0 Failed out of 1 unique kernels" in proc.stdout
+    assert "Deduplicated 3 of 4 configs" in proc.stdout
+    rows = read_rows(output)
+    assert rows[:2] == measured
+    assert len(rows) == 6
+    copies = [row for row in rows if row["duplicate_of"]]
+    assert len(copies) == 3
+    assert all(row["tag"] == "unet" and row["duplicate_of"] == "llama" for row in copies)
+    by_name = {row["name"]: row for row in rows if not row["duplicate_of"]}
+    assert all(row["mean_microseconds"] == by_name[row["name"]]["mean_microseconds"] for row in copies)
+
+
+def test_shards_merge_into_full_run(gemm_suite, tmp_path):
+    gemm_suite.run("--output", tmp_path / "gemm.csv")
+    shards = [tmp_path / "shard1.csv", tmp_path / "shard2.csv"]
+    for i, shard in enumerate(shards, 1):
+        gemm_suite.run("--shard", f"{i}/2", "--output", shard)
+    assert all(read_rows(shard) for shard in shards)
+
+    merged = tmp_path / "merged.csv"
+    gemm_suite.run("--merge", *shards, "--output", merged)
+    rows = read_rows(merged)
+    full = read_rows(tmp_path / "gemm.csv")
+    assert [int(row["index"]) for row in rows] == list(range(len(full)))
+    assert sorted((row["tag"], row["name"]) for row in rows) == sorted((row["tag"], row["name"]) for row in full)
+
+
+def test_rounds(gemm_suite, tmp_path):
+    output = tmp_path / "gemm.csv"
+    proc = gemm_suite.run("--output", output, "--rounds", "3", "--seed", "7")
+    assert "order effect" in proc.stdout
+    rows = read_rows(output)
+    assert len(rows) == 8
+    assert all(row["ok"] == "True" and int(row["repetitions"]) == 9 for row in rows)
+
+    round_rows = read_rows(tmp_path / "gemm_rounds.csv")
+    assert len(round_rows) == 3 * len(rows)
+    assert {row["seed"] for row in round_rows} == {"7"}
+    orders = [[row["name"] for row in round_rows if row["round"] == str(i)] for i in range(3)]
+    assert all(sorted(order) == sorted(orders[0]) for order in orders)
+
+
+def test_kernels_stay_on_their_devices(gemm_suite, tmp_path):
+    devices = []
+    for output in [tmp_path / "first.csv", tmp_path / "second.csv"]:
+        gemm_suite.run(
+            "--output", output, "--devices", "hip://0,hip://1,hip://2", env={"FAKE_IREE_BENCHMARK_SECONDS": "0.2"}
+        )
+        rows = read_rows(output)
+        assert len(rows) == 8
+        devices.append({row["name"]: row["device"] for row in rows})
+    assert devices[0] == devices[1]
+    assert set(devices[0].values()) <= {"hip://0", "hip://1", "hip://2"}
+
+
+def test_work_stealing_devices_share_the_work_queue(gemm_suite, tmp_path):
+    output = tmp_path / "gemm.csv"
+    gemm_suite.run(
+        "--output", output, "--devices", "hip://0,hip://1,hip://2", "--work-stealing",
+        env={"FAKE_IREE_BENCHMARK_SECONDS": "0.2"},
+    )
+    rows = read_rows(output)
+    assert len(rows) == 8
+    assert all(row["ok"] == "True" for row in rows)
+    assert {row["device"] for row in rows} == {"hip://0", "hip://1", "hip://2"}
+
+
+def test_timed_out_benchmarks_are_failures(gemm_suite, tmp_path):
+    output = tmp_path / "gemm.csv"
+    proc = gemm_suite.run(
+        "--output", output, "--limit", "3", "--benchmark-timeout", "0.5", env={"FAKE_IREE_BENCHMARK_SECONDS": "600"}
+    )
+    assert "3 benchmarks failed or timed out" in proc.stdout
+    rows = read_rows(output)
+    assert len(rows) == 3
+    assert all(row["ok"] == "False" for row in rows)
+
+
+def test_selectors(gemm_suite, tmp_path):
+    output = tmp_path / "gemm.csv"
+    gemm_suite.run("--output", output, "--tag", "unet,compute", "--dtype", "bf16", "--shape-regex", "_2048_", "--limit", "3")
+    rows = read_rows(output)
+    assert len(rows) == 3
+    assert all(row["tag"] in ("unet", "compute") and "bf16" in row["name"] and "_2048_" in row["name"] for row in rows)
+
+
+def test_in_memory_only_writes_failed_kernels(gemm_suite, tmp_path):
+    output = tmp_path / "gemm.csv"
+    gemm_suite.run("--output", output, "--in-memory")
+    assert len(read_rows(output)) == 8
+    assert not (gemm_suite.root / "gemm").exists()
+
+    gemm_suite.run("--output", output, "--in-memory", env={"FAKE_IREE_COMPILE_FAILURE_RATE": "1"})
+    failed = [row["name"] for row in read_rows(output)]
+    assert all(row["ok"] == "False" for row in read_rows(output))
+    assert sorted(path.stem for path in (gemm_suite.root / "gemm" / "mlir").iterdir()) == sorted(failed)
+    assert sorted(path.name for path in (gemm_suite.root / "gemm" / "vmfb").iterdir()) == sorted(
+        f"{name}_error.txt" for name in failed
+    )
+
+
+def test_cpu_thread_sweep(gemm_suite, tmp_path):
+    output = tmp_path / "gemm.csv"
+    gemm_suite.run("--output", output, "--target-profile", "cpu", "--cpu-threads", "1,4")
+    rows = read_rows(output)
+    assert len(rows) == 8
+    for row in rows:
+        assert row["ok"] == "True" and row["device"] == "local-task"
+        # The row reports the largest thread count.
+        assert row["mean_microseconds"] == row["mean_microseconds_4_threads"]
+        assert float(row["scaling_efficiency_1_threads"]) == 1.0
+        assert float(row["scaling_efficiency_4_threads"]) > 0
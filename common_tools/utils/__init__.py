@@ -1 +1,18 @@
 from .bench_utils import *
+from .compile_cache import *
+from .result_cache import *
+from .scheduler import *
+from .distributed import *
+from .dedupe import *
+from .suite import *
+from .compiler import *
+from .runtime import *
+from .batching import *
+from .static_analysis import *
+from .tools import *
+from .targets import *
+from .sampling import *
+from .sharding import *
+from .problem_sets import *
+from .adaptive import *
+from .rounds import *
@@ -0,0 +1,140 @@
+import argparse
+import math
+import time
+import random
+import statistics
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+# Bootstrap of the confidence interval of the median.
+CI_CONFIDENCE = 0.95
+BOOTSTRAP_RESAMPLES = 1000
+
+# Repetitions of the first round of an adaptive benchmark, like a fixed run.
+INITIAL_REPETITIONS = 3
+DEFAULT_MAX_KERNEL_SECONDS = 30.0
+
+
+def get_median_ci(times: Sequence[float]) -> Optional[tuple[float, float]]:
+    """Percentile bootstrap interval of the median of `times` at `CI_CONFIDENCE`; None for a single time.
+
+    The resamples are drawn with a fixed seed, so the same times always get
+    the same interval.
+    """
+    if len(times) < 2:
+        return None
+    rng = random.Random(0)
+    medians = sorted(statistics.median(rng.choices(times, k=len(times))) for _ in range(BOOTSTRAP_RESAMPLES))
+    tail = (1 - CI_CONFIDENCE) / 2
+    return medians[int(tail * (BOOTSTRAP_RESAMPLES - 1))], medians[math.ceil((1 - tail) * (BOOTSTRAP_RESAMPLES - 1))]
+
+
+def get_relative_ci_width(times: Sequence[float]) -> Optional[float]:
+    """Width of the `get_median_ci` interval as a fraction of the median of `times`."""
+    ci = get_median_ci(times)
+    if ci is None:
+        return None
+    median = statistics.median(times)
+    return (ci[1] - ci[0]) / median if median else 0.0
+
+
+@dataclass(frozen=True)
+class AdaptiveRepetitions:
+    """Settings of `--target-ci`: repeat a benchmark until the CI of its median is narrow enough.
+
+    `target_ci` is the largest relative width of the interval, e.g. 0.02 for
+    2% of the median, and `max_seconds` caps the time spent on one kernel,
+    after which its samples so far are reported.
+    """
+
+    target_ci: float
+    max_seconds: float = DEFAULT_MAX_KERNEL_SECONDS
+
+    def is_converged(self, times: Sequence[float]) -> bool:
+        width = get_relative_ci_width(times)
+        return width is not None and width <= self.target_ci
+
+    def get_cache_flags(self) -> list[str]:
+        """Pseudo flags distinguishing adaptive measurements in the result cache."""
+        return [f"--target-ci={self.target_ci}", f"--max-kernel-seconds={self.max_seconds}"]
+
+
+def _get_next_repetitions(count: int, spent: float, adaptive: AdaptiveRepetitions) -> int:
+    # Double the samples, estimating the time of a repetition from the
+    # rounds so far, which includes the start up of every round.
+    if not spent:
+        return count
+    return max(1, min(count, int((adaptive.max_seconds - spent) * count / spent)))
+
+
+def run_adaptive_rounds(
+    run_round: Callable[[Sequence[str], int], dict[str, list[float]]],
+    names: Sequence[str],
+    adaptive: AdaptiveRepetitions,
+) -> dict[str, list[float]]:
+    """Collect repetition times of the functions `names` until every median is known to `adaptive.target_ci`.
+
+    `run_round(names, repetitions)` benchmarks the given functions in one run
+    and returns the time of every repetition per function; a function missing
+    from it failed. The first round runs `INITIAL_REPETITIONS`, and every
+    further round runs the functions that have not converged yet, doubling
+    their samples, but with no more repetitions than fit into the time left
+    to the function. The time of a round is shared by its functions. Returns
+    the times of every function that did not fail in any round.
+    """
+    samples = {name: [] for name in names}
+    spent = dict.fromkeys(names, 0.0)
+    pending = list(names)
+    repetitions = INITIAL_REPETITIONS
+    while pending:
+        start = time.monotonic()
+        times = run_round(pending, repetitions)
+        round_seconds = (time.monotonic() - start) / len(pending)
+        for name in pending:
+            if name not in times:
+                del samples[name]
+                continue
+            samples[name] += times[name]
+            spent[name] += round_seconds
+        pending = [
+            name for name in pending
+            if name in samples and spent[name] < adaptive.max_seconds and not adaptive.is_converged(samples[name])
+        ]
+        if pending:
+            repetitions = min(_get_next_repetitions(len(samples[name]), spent[name], adaptive) for name in pending)
+    return samples
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the options choosing the repetitions of every benchmark to `parser`."""
+    group = parser.add_argument_group("repetitions")
+    group.add_argument(
+        "--target-ci",
+        help="Instead of 3 repetitions, repeat every benchmark until the 95%% bootstrap confidence interval of its "
+        "median is narrower than this percentage of the median, or --max-kernel-seconds have passed. "
+        "The results record the width reached in median_ci_percent and the samples in repetitions",
+        type=float,
+        default=None,
+    )
+    group.add_argument(
+        "--max-kernel-seconds",
+        help="Time after which a --target-ci benchmark stops collecting repetitions of a kernel",
+        type=float,
+        default=DEFAULT_MAX_KERNEL_SECONDS,
+    )
+    group.add_argument(
+        "--latency-samples",
+        help="Time this many single invocations of every kernel instead of 3 repetitions averaged over "
+        "--benchmark_min_time, so the p90, p99, max and histogram columns describe the latency of one invocation",
+        type=int,
+        default=None,
+    )
+
+
+def check_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    if args.target_ci is not None and args.target_ci <= 0:
+        parser.error("--target-ci must be a positive percentage")
+    if args.latency_samples is not None and args.latency_samples < 1:
+        parser.error("--latency-samples must be at least 1")
+    if args.latency_samples and args.target_ci is not None:
+        parser.error("--latency-samples takes a fixed number of samples and cannot be used with --target-ci")
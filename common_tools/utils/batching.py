@@ -0,0 +1,206 @@
+import argparse
+import re
+import logging
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+from .adaptive import AdaptiveRepetitions
+from .bench_utils import get_module_flag, run_iree_batch_benchmark
+from .compile_cache import CompileCache
+from .compiler import DEFAULT_COMPILE_BACKEND, compile_mlir
+from .runtime import DEFAULT_BENCHMARK_BACKEND
+
+DEFAULT_KERNELS_PER_MODULE = 1
+
+_ALIAS_DEFINITION = re.compile(r"^([!#])([A-Za-z_][\w$.]*)\s*=", re.MULTILINE)
+_MAIN_FUNCTION = re.compile(
+    r"(?P<dialect>func|util)\.func(?:\s+public)?\s+@main\((?P<args>[^)]*)\)\s*->\s*(?P<result>[^{]+?)\s*\{"
+)
+
+
+class KernelBatch:
+    """Kernels of one suite that are compiled into one module and benchmarked together.
+
+    A batch goes through the pipeline like a single config: it has a name for
+    its mlir and vmfb files and the total flops of its kernels. `kernels` are
+    the `(tag, config)` pairs of the batch.
+    """
+
+    def __init__(self, kernels: list[tuple[str, Any]]):
+        self.kernels = kernels
+
+    def get_name(self) -> str:
+        name = self.kernels[0][1].get_name()
+        if len(self.kernels) > 1:
+            name += f"_and_{len(self.kernels) - 1}_more"
+        return name
+
+    def get_flops(self) -> int:
+        return sum(config.get_flops() for _, config in self.kernels)
+
+    def get_function_names(self) -> list[str]:
+        """Unique names of the exported function of every kernel, in order."""
+        names = []
+        for i, (_, config) in enumerate(self.kernels):
+            name = re.sub(r"\W", "_", config.get_name())
+            names.append(name if name not in names else f"{name}_{i}")
+        return names
+
+
+def _zero_literal(element_type: str) -> str:
+    return "0.0" if element_type.startswith(("f", "bf")) else "0"
+
+
+def build_batched_module(function_name: str, mlir_content: str, inputs: Sequence[str]) -> str:
+    """Turn the `@main` kernel of `mlir_content` into a function without arguments.
+
+    Kernels only export `@main` and take their inputs as arguments, while
+    iree-benchmark-module can only benchmark all functions of a module at once
+    if they take no arguments. The kernel becomes `@<function_name>_main` and
+    is called by `@<function_name>`, which passes it zero filled globals of
+    the `--input=<dims>x<type>` shapes in `inputs`. The globals are created
+    once when the module is loaded and go through an optimization barrier so
+    the compiler cannot fold the kernel away. Aliases are prefixed with
+    `function_name`, so the result can be concatenated with other kernels.
+    """
+    content = mlir_content.strip()
+    # Kernels wrapped in a module are unwrapped so their functions get
+    # exported from the batched module; aliases may be defined before it.
+    wrapped = re.search(r"^module\s*\{(.*)\}\Z", content, re.DOTALL | re.MULTILINE)
+    if wrapped:
+        content = content[: wrapped.start()] + wrapped.group(1)
+
+    aliases = sorted({name for _, name in _ALIAS_DEFINITION.findall(content)}, key=len, reverse=True)
+    if aliases:
+        alias_pattern = re.compile(r"([!#])(" + "|".join(re.escape(name) for name in aliases) + r")(?![\w$.])")
+        content = alias_pattern.sub(lambda m: f"{m.group(1)}{function_name}_{m.group(2)}", content)
+
+    main = _MAIN_FUNCTION.search(content)
+    if main is None:
+        raise ValueError(f"Cannot batch {function_name}: no @main function with a single result")
+    result_type = main.group("result")
+    # The wrapper is written in the dialect of the kernel; util.call cannot
+    # call a func.func.
+    if main.group("dialect") == "util":
+        func_op, call_op, return_op = "util.func", "util.call", "util.return"
+    else:
+        func_op, call_op, return_op = "func.func", "func.call", "func.return"
+    kernel = content[: main.start()] + main.group(0).replace("@main(", f"@{function_name}_main(", 1)
+    kernel += content[main.end():]
+    # The kernel is only called by its wrapper.
+    kernel = re.sub(
+        rf"(func\.func|util\.func)(\s+public)?(\s+@{function_name}_main\()", r"\1 private\3", kernel, count=1
+    )
+
+    input_types = []
+    globals_text = ""
+    loads = ""
+    for i, spec in enumerate(inputs):
+        *dims, element_type = spec.split("x")
+        tensor_type = f"tensor<{spec}>"
+        input_types.append(tensor_type)
+        globals_text += (
+            f"util.global private @{function_name}_input{i} = dense<{_zero_literal(element_type)}> : {tensor_type}\n"
+        )
+        loads += (
+            f"  %input{i} = util.global.load @{function_name}_input{i} : {tensor_type}\n"
+            f"  %arg{i} = util.optimization_barrier %input{i} : {tensor_type}\n"
+        )
+    call_args = ", ".join(f"%arg{i}" for i in range(len(inputs)))
+    wrapper = (
+        f"{func_op} public @{function_name}() -> {result_type} {{\n"
+        f"{loads}"
+        f"  %result = {call_op} @{function_name}_main({call_args}) : ({', '.join(input_types)}) -> {result_type}\n"
+        f"  {return_op} %result : {result_type}\n"
+        f"}}\n"
+    )
+    return f"{kernel.strip()}\n\n{globals_text}{wrapper}"
+
+
+def compile_batch(
+    batch: KernelBatch,
+    sources: Sequence[tuple[str, Sequence[str]]],
+    kernel_dir: Path,
+    vmfb_dir: Path,
+    compile_flags: Sequence[str],
+    cache: Optional[CompileCache] = None,
+    timeout: Optional[float] = None,
+    backend: str = DEFAULT_COMPILE_BACKEND,
+    in_memory: bool = False,
+):
+    """Compile the kernels of `batch` into one module.
+
+    `sources` holds the MLIR and `--input` shapes of every kernel. Returns
+    `(None, batch, mlir_file, vmfb_file)` like the compile functions of the
+    suites, with a `None` vmfb_file if any kernel fails to compile. With
+    `in_memory`, vmfb_file holds the contents of the module.
+    """
+    mlir_file, vmfb_file = kernel_dir / (batch.get_name() + ".mlir"), None
+    try:
+        mlir_content = "\n".join(
+            build_batched_module(function_name, mlir, inputs)
+            for function_name, (mlir, inputs) in zip(batch.get_function_names(), sources)
+        )
+        mlir_file, vmfb_file = compile_mlir(
+            batch.get_name(), mlir_content, kernel_dir, vmfb_dir, compile_flags, cache, timeout, backend, in_memory
+        )
+    except Exception:
+        # Isolate the failure to this batch; its kernels are recorded as failed rows.
+        logging.getLogger().exception(f"Failed to compile {batch.get_name()}")
+        vmfb_file = None
+    return (None, batch, mlir_file, vmfb_file)
+
+
+def benchmark_batch(
+    device: str,
+    batch: KernelBatch,
+    vmfb_filename: Optional[Path | bytes],
+    row_fn: Callable,
+    result_cache=None,
+    timeout: Optional[float] = None,
+    backend: str = DEFAULT_BENCHMARK_BACKEND,
+    benchmark_flags: Sequence[str] = (),
+    adaptive: Optional[AdaptiveRepetitions] = None,
+) -> list[tuple]:
+    """Benchmark all kernels of `batch` in one invocation; returns a result row per kernel.
+
+    Rows are built by the suite's `row_fn(device, tag, config, ok, stats,
+    reused)`, with the `BenchmarkStats` of the kernel.
+    """
+    function_names = batch.get_function_names()
+    results = {}
+    # Kernels that failed to compile are recorded as failed rows.
+    if vmfb_filename:
+        exec_args = [
+            "iree-benchmark-module",
+            f"--device={device}",
+            "--device_allocator=caching",
+            get_module_flag(vmfb_filename),
+            "--benchmark_repetitions=3",
+            *benchmark_flags,
+        ]
+        results = run_iree_batch_benchmark(
+            exec_args, vmfb_filename, function_names, result_cache, timeout, backend, adaptive
+        )
+    return [
+        row_fn(device, tag, config, *results.get(function_name, (False, None, False)))
+        for function_name, (tag, config) in zip(function_names, batch.kernels)
+    ]
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the option of batched modules to `parser`."""
+    group = parser.add_argument_group("batching")
+    group.add_argument(
+        "--kernels-per-module",
+        help="Compile this many kernels into one module and benchmark them with one iree-benchmark-module run, "
+        "which saves the process and device setup per kernel. A kernel that fails to compile fails its whole module.",
+        type=int,
+        default=DEFAULT_KERNELS_PER_MODULE,
+    )
+
+
+def check_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    if args.kernels_per_module < 1:
+        parser.error("--kernels-per-module must be at least 1")
+    if args.compile_only and args.kernels_per_module > 1:
+        parser.error("--compile-only analyzes every kernel on its own and cannot be used with --kernels-per-module")
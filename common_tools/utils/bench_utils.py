@@ -1,99 +1,477 @@
+import argparse
+import hashlib
 import os
+import re
+import json
 import logging
+import threading
+import tempfile
 import subprocess
 from pathlib import Path
+from contextlib import contextmanager
 import csv
-from typing import Sequence
+import statistics
+from typing import Iterator, Optional, Sequence
 from collections import namedtuple
-import matplotlib.pyplot as plt
 from itertools import cycle
-import numpy as np
 import sys
+from .adaptive import AdaptiveRepetitions, get_relative_ci_width, run_adaptive_rounds
+from .runtime import DEFAULT_BENCHMARK_BACKEND, benchmark_in_process
+from .tools import resolve_tool_command
 
-BenchmarkResult = namedtuple(
-    "BenchmarkResult", "benchmark_name time cpu_time iterations user_counters"
+# Statistics over the repetitions of a benchmark: times in milliseconds, the
+# coefficient of variation as a fraction of the mean, the width of the
+# bootstrap CI of the median as a fraction of the median (None for a single
+# repetition), and the counts of `get_latency_histogram`.
+BenchmarkStats = namedtuple(
+    "BenchmarkStats", "mean_ms median_ms stddev_ms cv min_ms repetitions median_ci p90_ms p99_ms max_ms histogram"
 )
 
-def run_iree_command(args: Sequence[str] = ()):
+# Result columns of the statistics, following `mean_microseconds`.
+STATS_FIELDNAMES = [
+    "median_microseconds", "stddev_microseconds", "cv_percent", "min_microseconds", "repetitions", "median_ci_percent",
+    "p90_microseconds", "p99_microseconds", "max_microseconds", "latency_histogram",
+]
+
+# Columns of the percentiles `--roofline-percentile` can plot; the median is p50.
+PERCENTILE_FIELDNAMES = {
+    "mean": "mean_microseconds",
+    "p50": "median_microseconds",
+    "p90": "p90_microseconds",
+    "p99": "p99_microseconds",
+    "max": "max_microseconds",
+}
+
+# Output format of iree-benchmark-module that `parse_benchmark_json` reads.
+BENCHMARK_FORMAT_FLAG = "--benchmark_format=json"
+
+LATENCY_HISTOGRAM_BINS = 10
+
+# Held while starting a subprocess and while forking pool workers. A worker
+# forked while another thread is starting a subprocess would inherit the
+# write ends of that subprocess's pipes and keep them open, so reading its
+# output would never finish.
+SPAWN_LOCK = threading.Lock()
+
+
+def _reset_spawn_lock():
+    global SPAWN_LOCK
+    SPAWN_LOCK = threading.Lock()
+
+
+# A child forked while the lock is held must not inherit it in locked state.
+os.register_at_fork(after_in_child=_reset_spawn_lock)
+
+def run_iree_command(args: Sequence[str] = (), timeout: Optional[float] = None, input: Optional[bytes] = None):
+    args = resolve_tool_command(args)
     command = "Exec:", " ".join(args)
     logging.getLogger().info(command)
-    proc = subprocess.run(
-        args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False
-    )
-    (
-        stdout_v,
-        stderr_v,
-    ) = (
-        proc.stdout,
-        proc.stderr,
-    )
+    stdin = subprocess.PIPE if input is not None else None
+    with SPAWN_LOCK:
+        proc = subprocess.Popen(args, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        stdout_v, stderr_v = proc.communicate(input, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        _, stderr_v = proc.communicate()
+        message = f"Command timed out after {timeout} seconds: {' '.join(args)}\n"
+        logging.getLogger().error(message)
+        return 1, message.encode() + stderr_v
     return_code = proc.returncode
     if return_code == 0:
-        return 0, proc.stdout
+        return 0, stdout_v
     logging.getLogger().error(
         f"Command failed!\n"
-        f"Stderr diagnostics:\n{proc.stderr}\n"
-        f"Stdout diagnostics:\n{proc.stdout}\n"
+        f"Stderr diagnostics:\n{stderr_v}\n"
+        f"Stdout diagnostics:\n{stdout_v}\n"
+    )
+    return 1, stderr_v
+
+_TIME_UNIT_MS = {"ns": 1e-6, "us": 1e-3, "ms": 1.0, "s": 1e3}
+_BENCHMARK_FUNCTION = re.compile(r"^BM_(?P<function>[^/]+)")
+
+def get_latency_flags(samples: int) -> list[str]:
+    """iree-benchmark-module flags timing `samples` single invocations, one per repetition."""
+    return [f"--benchmark_repetitions={samples}", "--benchmark_min_time=1x"]
+
+def get_percentile(times_ms: Sequence[float], percent: float) -> float:
+    """The `percent` percentile of `times_ms`, interpolated linearly between the closest ranks."""
+    ordered = sorted(times_ms)
+    position = (len(ordered) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def get_latency_histogram(times_ms: Sequence[float], bins: int = LATENCY_HISTOGRAM_BINS) -> tuple[int, ...]:
+    """Counts of `times_ms` in `bins` bins of equal width from their minimum to their maximum."""
+    low, high = min(times_ms), max(times_ms)
+    counts = [0] * bins
+    for time_ms in times_ms:
+        counts[min(int((time_ms - low) / (high - low) * bins), bins - 1) if high > low else 0] += 1
+    return tuple(counts)
+
+def get_benchmark_stats(times_ms: Sequence[float], aggregates: Optional[dict[str, float]] = None) -> BenchmarkStats:
+    """Statistics of the repetition times of a benchmark, preferring the `aggregates` the tool reported."""
+    aggregates = aggregates or {}
+    mean = aggregates.get("mean", statistics.mean(times_ms))
+    stddev = aggregates.get("stddev", statistics.stdev(times_ms) if len(times_ms) > 1 else 0.0)
+    return BenchmarkStats(
+        mean_ms=mean,
+        median_ms=aggregates.get("median", statistics.median(times_ms)),
+        stddev_ms=stddev,
+        cv=aggregates.get("cv", stddev / mean if mean else 0.0),
+        min_ms=min(times_ms),
+        repetitions=len(times_ms),
+        median_ci=get_relative_ci_width(times_ms),
+        p90_ms=get_percentile(times_ms, 90),
+        p99_ms=get_percentile(times_ms, 99),
+        max_ms=max(times_ms),
+        histogram=get_latency_histogram(times_ms),
     )
-    return 1, proc.stderr
 
-def decode_output(bench_lines):
-    benchmark_results = []
-    for line in bench_lines:
-        split = line.split()
-        if len(split) == 0:
+def _parse_benchmark_report(output: bytes) -> tuple[dict[str, list[float]], dict[str, dict[str, float]]]:
+    """Repetition times and aggregates in ms of every function in the JSON output of iree-benchmark-module."""
+    text = output.decode()
+    report = json.loads(text[text.index("{"):])
+    times_ms = {}
+    aggregates = {}
+    for entry in report.get("benchmarks", []):
+        match = _BENCHMARK_FUNCTION.match(entry["run_name"])
+        if not match or entry.get("error_occurred"):
             continue
-        benchmark_name = split[0]
-        time = " ".join(split[1:3])
-        cpu_time = " ".join(split[3:5])
-        iterations = split[5]
-        user_counters = None
-        if len(split) > 5:
-            user_counters = split[6]
-        benchmark_results.append(
-            BenchmarkResult(
-                benchmark_name=benchmark_name,
-                time=time,
-                cpu_time=cpu_time,
-                iterations=iterations,
-                user_counters=user_counters,
-            )
-        )
-    return benchmark_results
+        function = match.group("function")
+        if entry.get("run_type") == "aggregate":
+            value = entry["real_time"]
+            if entry.get("aggregate_unit", "time") == "time":
+                value *= _TIME_UNIT_MS[entry["time_unit"]]
+            aggregates.setdefault(function, {})[entry["aggregate_name"]] = value
+        else:
+            times_ms.setdefault(function, []).append(entry["real_time"] * _TIME_UNIT_MS[entry["time_unit"]])
+    return times_ms, aggregates
 
-def bench_summary_process(ret_value, output):
-    if ret_value == 1:
-        # Output should have already been logged earlier.
-        logging.getLogger().error("Running convolution benchmark failed. Exiting.")
-        return
+def parse_benchmark_json(output: bytes) -> dict[str, BenchmarkStats]:
+    """Return the statistics of every function benchmarked by one iree-benchmark-module run.
 
-    bench_lines = output.decode().split("\n")[3:]
-    benchmark_results = decode_output(bench_lines)
-    logging.getLogger().info(benchmark_results)
-    benchmark_mean_time = float(benchmark_results[3].time.split()[0])
-    
-    return benchmark_mean_time
+    Reads the output of `--benchmark_format=json`. Every repetition and
+    aggregate is converted to ms by its own `time_unit`; the CV aggregate is
+    a fraction rather than a time. Repetitions that report an error are
+    left out, so a function whose repetitions all failed has no result.
+    """
+    times_ms, aggregates = _parse_benchmark_report(output)
+    return {function: get_benchmark_stats(times, aggregates.get(function)) for function, times in times_ms.items()}
+
+def get_stats_columns(stats: Optional[BenchmarkStats]) -> tuple:
+    """Values of `STATS_FIELDNAMES` for a benchmark; None for a failed one."""
+    if stats is None:
+        return (None,) * len(STATS_FIELDNAMES)
+    return (
+        round(stats.median_ms * 1000, 4),
+        round(stats.stddev_ms * 1000, 4),
+        round(stats.cv * 100, 4),
+        round(stats.min_ms * 1000, 4),
+        stats.repetitions,
+        round(stats.median_ci * 100, 4) if stats.median_ci is not None else None,
+        round(stats.p90_ms * 1000, 4),
+        round(stats.p99_ms * 1000, 4),
+        round(stats.max_ms * 1000, 4),
+        " ".join(map(str, stats.histogram)),
+    )
 
-def write_results_to_csv(results : list[tuple] | list[list] | list[dict], output_filename: str, fieldnames: []):
-    if len(results) == 0:
-        print('No valid results')
+def _get_cached_stats(result_cache, cache_key: str) -> Optional[BenchmarkStats]:
+    value = result_cache.lookup(cache_key)
+    # Entries of earlier versions held the mean time or fewer statistics.
+    if not isinstance(value, list) or len(value) != len(BenchmarkStats._fields):
+        return None
+    return BenchmarkStats(*value)
+
+def get_module_flag(vmfb: Path | str | bytes) -> str:
+    """The `--module` flag of iree-benchmark-module for a vmfb file or, with `--in-memory`, its contents."""
+    # Replaced with a temporary file when the benchmark is run.
+    if isinstance(vmfb, bytes):
+        return "--module=-"
+    return f"--module={vmfb}"
+
+@contextmanager
+def _module_args(exec_args: Sequence[str], vmfb: Path | str | bytes) -> Iterator[list[str]]:
+    """Yield `exec_args` for a subprocess, with a vmfb kept in memory put into a tmpfs file."""
+    if not isinstance(vmfb, bytes):
+        yield list(exec_args)
         return
-    
-    fieldnames = fieldnames
-
-    with open(output_filename, 'w', newline='') as f:
-        if isinstance(results[0], list) or isinstance(results[0], tuple):
-            writer = csv.writer(f)
-            writer.writerow(fieldnames)
-        elif isinstance(results[0], dict):
-            writer = csv.DictWriter(f, fieldnames)
-            writer.writeheader()
+    # A file on tmpfs rather than stdin: pool workers forked meanwhile would
+    # inherit the write end of a stdin pipe and iree-benchmark-module would
+    # wait for its end forever.
+    with tempfile.NamedTemporaryFile(dir="/dev/shm" if os.path.isdir("/dev/shm") else None, suffix=".vmfb") as f:
+        f.write(vmfb)
+        f.flush()
+        yield [f"--module={f.name}" if arg == "--module=-" else arg for arg in exec_args]
+
+def _get_result_cache_key(
+    result_cache, vmfb_filename, exec_args: Sequence[str], backend: str, adaptive: Optional[AdaptiveRepetitions] = None
+) -> str:
+    cache_args = list(exec_args)
+    if backend != DEFAULT_BENCHMARK_BACKEND:
+        cache_args.append(f"--benchmark-backend={backend}")
+    if adaptive is not None:
+        cache_args += adaptive.get_cache_flags()
+    return result_cache.get_key(vmfb_filename, cache_args)
+
+def _run_benchmark_round(
+    exec_args: Sequence[str],
+    vmfb_filename,
+    function_names: Sequence[str],
+    repetitions: int,
+    timeout: Optional[float],
+    backend: str,
+) -> dict[str, list[float]]:
+    """Repetition times in ms of `function_names` from one run of `exec_args` with `repetitions`.
+
+    Functions that failed are missing from the result.
+    """
+    exec_args = [
+        arg for arg in exec_args if not arg.startswith(("--function=", "--benchmark_filter=", "--benchmark_repetitions="))
+    ]
+    exec_args.append(f"--benchmark_repetitions={repetitions}")
+    if backend == "inprocess":
+        module_data = vmfb_filename if isinstance(vmfb_filename, bytes) else None
+        times = {}
+        for name in function_names:
+            function_args = [*exec_args, f"--function={name}"]
+            try:
+                times[name] = benchmark_in_process(function_args, timeout, module_data)
+            except Exception:
+                logging.getLogger().exception(f"In-process benchmark of {' '.join(function_args)} failed!")
+        return times
+    if len(function_names) == 1:
+        exec_args.append(f"--function={function_names[0]}")
+    else:
+        # --function selects a single function; the benchmarks of several are
+        # selected by their Google benchmark names instead.
+        exec_args.append(f"--benchmark_filter=^BM_({'|'.join(map(re.escape, function_names))})/")
+    with _module_args(exec_args, vmfb_filename) as args:
+        ret_value, cmd_out = run_iree_command(args, timeout)
+    if ret_value != 0:
+        return {}
+    try:
+        times, _ = _parse_benchmark_report(cmd_out)
+    except (KeyError, ValueError):
+        logging.getLogger().error(f"Could not parse benchmark output:\n{cmd_out.decode()}")
+        return {}
+    return times
+
+def _run_adaptive_benchmark(
+    exec_args: Sequence[str],
+    vmfb_filename,
+    function_names: Sequence[str],
+    timeout: Optional[float],
+    backend: str,
+    adaptive: AdaptiveRepetitions,
+) -> dict[str, BenchmarkStats]:
+    """Statistics of `function_names` measured in rounds until their CIs are narrow enough (see `run_adaptive_rounds`)."""
+    samples = run_adaptive_rounds(
+        lambda names, repetitions: _run_benchmark_round(exec_args, vmfb_filename, names, repetitions, timeout, backend),
+        function_names,
+        adaptive,
+    )
+    return {name: get_benchmark_stats(times) for name, times in samples.items()}
+
+def _get_function_name(exec_args: Sequence[str]) -> str:
+    for arg in exec_args:
+        if arg.startswith("--function="):
+            return arg.removeprefix("--function=")
+    return "main"
+
+def run_iree_benchmark(
+    exec_args: Sequence[str],
+    vmfb_filename,
+    result_cache=None,
+    timeout: Optional[float] = None,
+    backend: str = DEFAULT_BENCHMARK_BACKEND,
+    adaptive: Optional[AdaptiveRepetitions] = None,
+):
+    """Benchmark a module, reusing a fresh measurement from `result_cache` if there is one.
+
+    `exec_args` is an iree-benchmark-module command line selecting one
+    function; its output is requested as JSON. The inprocess backend runs it
+    through iree.runtime instead (see `benchmark_in_process`). With
+    `adaptive`, the module is run in rounds until the median is known
+    precisely enough, and `timeout` applies to every round. Returns
+    `(ok, stats, reused)` with the `BenchmarkStats` of the function.
+    """
+    if BENCHMARK_FORMAT_FLAG not in exec_args:
+        exec_args = [*exec_args, BENCHMARK_FORMAT_FLAG]
+    cache_key = None
+    if result_cache is not None:
+        cache_key = _get_result_cache_key(result_cache, vmfb_filename, exec_args, backend, adaptive)
+        benchmark_stats = _get_cached_stats(result_cache, cache_key)
+        if benchmark_stats is not None:
+            return True, benchmark_stats, True
+
+    ok, benchmark_stats = False, None
+    if adaptive is not None:
+        function = _get_function_name(exec_args)
+        benchmark_stats = _run_adaptive_benchmark(
+            exec_args, vmfb_filename, [function], timeout, backend, adaptive
+        ).get(function)
+        ok = benchmark_stats is not None
+    elif backend == "inprocess":
+        try:
+            module_data = vmfb_filename if isinstance(vmfb_filename, bytes) else None
+            benchmark_stats = get_benchmark_stats(benchmark_in_process(exec_args, timeout, module_data))
+            ok = True
+        except Exception:
+            logging.getLogger().exception(f"In-process benchmark of {' '.join(exec_args)} failed!")
+    else:
+        with _module_args(exec_args, vmfb_filename) as args:
+            ret_value, cmd_out = run_iree_command(args, timeout)
+        if ret_value == 0:
+            try:
+                results = parse_benchmark_json(cmd_out)
+                # A single function is benchmarked.
+                benchmark_stats = next(iter(results.values()), None)
+            except (KeyError, ValueError):
+                logging.getLogger().error(f"Could not parse benchmark output:\n{cmd_out.decode()}")
+            if benchmark_stats is None:
+                logging.getLogger().error(f"No benchmark result in:\n{cmd_out.decode()}")
+            ok = benchmark_stats is not None
+    if ok and result_cache is not None:
+        result_cache.store(cache_key, list(benchmark_stats))
+    return ok, benchmark_stats, False
+
+def run_iree_batch_benchmark(
+    exec_args: Sequence[str],
+    vmfb_filename,
+    function_names: Sequence[str],
+    result_cache=None,
+    timeout: Optional[float] = None,
+    backend: str = DEFAULT_BENCHMARK_BACKEND,
+    adaptive: Optional[AdaptiveRepetitions] = None,
+) -> dict[str, tuple[bool, Optional[BenchmarkStats], bool]]:
+    """Benchmark every function of a module in one iree-benchmark-module run.
+
+    `exec_args` must not select a `--function`, and the functions must not
+    take arguments. Measurements are cached per function; the module only
+    runs if one of them is missing. The inprocess backend times the
+    functions one after the other on its persistent device. With `adaptive`,
+    later rounds only run the functions whose median is not precise enough
+    yet. Returns `(ok, stats, reused)` for every name of `function_names`.
+    """
+    if BENCHMARK_FORMAT_FLAG not in exec_args:
+        exec_args = [*exec_args, BENCHMARK_FORMAT_FLAG]
+    cache_keys = {}
+    if result_cache is not None:
+        for name in function_names:
+            cache_keys[name] = _get_result_cache_key(
+                result_cache, vmfb_filename, [*exec_args, f"--function={name}"], backend, adaptive
+            )
+        cached = {name: _get_cached_stats(result_cache, key) for name, key in cache_keys.items()}
+        if all(value is not None for value in cached.values()):
+            return {name: (True, value, True) for name, value in cached.items()}
+
+    if adaptive is not None:
+        stats = _run_adaptive_benchmark(exec_args, vmfb_filename, function_names, timeout, backend, adaptive)
+        results = {
+            name: (True, stats[name], False) if name in stats else (False, None, False)
+            for name in function_names
+        }
+    elif backend == "inprocess":
+        results = {
+            name: run_iree_benchmark([*exec_args, f"--function={name}"], vmfb_filename, None, timeout, backend)
+            for name in function_names
+        }
+    else:
+        with _module_args(exec_args, vmfb_filename) as args:
+            ret_value, cmd_out = run_iree_command(args, timeout)
+        stats = {}
+        if ret_value == 0:
+            try:
+                stats = parse_benchmark_json(cmd_out)
+            except (KeyError, ValueError):
+                logging.getLogger().error(f"Could not parse benchmark output:\n{cmd_out.decode()}")
+        results = {}
+        for name in function_names:
+            if name in stats:
+                results[name] = (True, stats[name], False)
+            else:
+                if ret_value == 0:
+                    logging.getLogger().error(f"No benchmark result for {name} in:\n{cmd_out.decode()}")
+                results[name] = (False, None, False)
+    if result_cache is not None:
+        for name, (ok, benchmark_stats, _) in results.items():
+            if ok:
+                result_cache.store(cache_keys[name], list(benchmark_stats))
+    return results
+
+def iter_results(filename: str) -> Iterator[dict]:
+    """Lazily read result rows from a CSV or, for a `.jsonl` suffix, a JSON lines file."""
+    with open(filename, newline="") as f:
+        if filename.endswith(".jsonl"):
+            yield from (json.loads(line) for line in f if line.strip())
         else:
-            print('Invalid result format')
-            return
-        
-        for result in results:
-            writer.writerow(result)
+            yield from csv.DictReader(f)
+
+def read_results(filename: str) -> list[dict]:
+    """Read result rows from a CSV or, for a `.jsonl` suffix, a JSON lines file."""
+    return list(iter_results(filename))
+
+def get_kernel_key(*fields: str) -> int:
+    """64 bit hash of the `fields` identifying a kernel, e.g. its tag and name.
+
+    Sets over every kernel of a sweep hold these keys rather than the
+    names, which are often longer than the 8 bytes of a key.
+    """
+    return int.from_bytes(hashlib.blake2b("\0".join(fields).encode(), digest_size=8).digest(), "little")
+
+class ResultWriter:
+    """Writes result rows to a CSV file as soon as they are measured.
+
+    A `.jsonl` output file gets one JSON object per row instead. Rows are
+    flushed one by one so a crash loses at most the kernel that was
+    running. With `resume`, rows already in `output_filename` are kept, new
+    rows are appended, and `completed` holds the `get_kernel_key(tag, name)`
+    of every kernel that does not need to run again. It still grows with the
+    rows of the file, by less than 100 bytes per row. Rows are given without the
+    leading `index` column, which is assigned here.
+    """
+
+    def __init__(self, output_filename: str, fieldnames: list[str], resume: bool = False):
+        self.output_filename = output_filename
+        self.fieldnames = fieldnames
+        self.json_lines = output_filename.endswith(".jsonl")
+        self.completed = set()
+        self.next_index = 0
+        self.failure_count = 0
+        mode = "w"
+        if resume and os.path.exists(output_filename):
+            for row in read_results(output_filename):
+                if list(row.keys()) != fieldnames:
+                    raise ValueError(f"Cannot resume {output_filename}: it has different columns")
+                self.completed.add(get_kernel_key(row["tag"], row["name"]))
+                self.next_index = max(self.next_index, int(row["index"]) + 1)
+            mode = "a"
+        self.file = open(output_filename, mode, newline="")
+        self.writer = csv.writer(self.file)
+        if mode == "w" and not self.json_lines:
+            self.writer.writerow(fieldnames)
+            self.file.flush()
+
+    def is_completed(self, tag: str, name: str) -> bool:
+        return get_kernel_key(tag, name) in self.completed
+
+    def write(self, row: tuple | list):
+        row = (self.next_index, *row)
+        record = dict(zip(self.fieldnames, row))
+        # Rows copied from a CSV file hold the text of the flag.
+        if str(record["ok"]) != "True":
+            self.failure_count += 1
+        if self.json_lines:
+            self.file.write(json.dumps(record) + "\n")
+        else:
+            self.writer.writerow(row)
+        self.file.flush()
+        self.next_index += 1
+
+    def close(self):
+        self.file.close()
 
 def filter_batch(data, b):
     data_new = []
@@ -119,26 +497,40 @@ def filter_model(data, model):
             data_new.append(row)
     return data_new
 
-def roofline(results=None, out=None, batch=None, dtype=None, model=None, **kwargs):
-    """Generate a roofline plot of GEMM performance from multiple result files and save raw data as CSV."""
+def roofline(results=None, out=None, batch=None, dtype=None, model=None, percentile="mean", **kwargs):
+    """Generate a roofline plot of GEMM performance from multiple result files and save raw data as CSV.
+
+    The throughput of every kernel is taken at its `percentile` time, one of
+    `PERCENTILE_FIELDNAMES`, rather than at its mean time.
+    """
     if results is None:
         raise ValueError("No result files provided")
     if out is None:
         raise ValueError("No output file path provided")
 
+    # Only needed for plotting; keeps them out of benchmark runs.
+    import matplotlib.pyplot as plt
+    import numpy as np
+
     files = results.split(',')
+    time_field = PERCENTILE_FIELDNAMES[percentile]
     colors = cycle(['b', 'g', 'r', 'c', 'm', 'y', 'k'])
     
     plt.figure(figsize=(12, 8))
 
     for idx, result_file in enumerate(files):
         data = []
-        with open(result_file.strip(), mode='r') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                row = {k: float(v) if k in ['index', 'mean_microseconds', 'arithmetic_intensity', 'tflops'] else v for k, v in row.items()}
-                row['ok'] = True if 'ok' not in row else row['ok'] == 'True'
-                data.append(row)
+        for row in read_results(result_file.strip()):
+            # Failed kernels are recorded without timings.
+            if 'ok' in row and str(row['ok']) != 'True':
+                continue
+            if time_field not in row:
+                raise ValueError(f"{result_file.strip()} has no {time_field} column to plot {percentile} with")
+            row = {k: float(v) if k in ['index', 'mean_microseconds', 'arithmetic_intensity', 'tflops', time_field] else v for k, v in row.items()}
+            row['ok'] = True
+            # The FLOP count is the same at every percentile.
+            row['tflops'] = row['tflops'] * row['mean_microseconds'] / row[time_field]
+            data.append(row)
         if batch:
             data = filter_batch(data, batch)
         if dtype:
@@ -156,7 +548,7 @@ def roofline(results=None, out=None, batch=None, dtype=None, model=None, **kwarg
     plt.yscale('log')
     plt.xlabel('Arithmetic Intensity (FLOP/byte)')
     plt.ylabel('Performance (TFLOP/s)')
-    plt.title('Roofline Plot of Kernel Performance')
+    plt.title('Roofline Plot of Kernel Performance' if percentile == 'mean' else f'Roofline Plot of Kernel Performance ({percentile} latency)')
 
     tflops_map = {
         "f32": 653.7,
@@ -195,3 +587,18 @@ def roofline(results=None, out=None, batch=None, dtype=None, model=None, **kwarg
     plt.close()
     
     print(f"Roofline plot saved as '{out}'")
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the options of roofline plots to `parser`."""
+    group = parser.add_argument_group("roofline")
+    group.add_argument("--roofline", help="Comma separated csv file list to generate roofline plot with", default=None)
+    group.add_argument("--plot", help="location to save plot", default=None)
+    group.add_argument("--batch", help="roofline on certain batch", type=int, default=None)
+    group.add_argument(
+        "--roofline-percentile",
+        help="Time of every kernel the roofline plots its throughput at; p50 is the median",
+        choices=list(PERCENTILE_FIELDNAMES),
+        default="mean",
+    )
+    group.add_argument("--model", help="roofline on certain model", default=None)
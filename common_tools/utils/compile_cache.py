@@ -0,0 +1,149 @@
+import argparse
+import os
+import hashlib
+import logging
+import shutil
+import subprocess
+import functools
+import tempfile
+from pathlib import Path
+from typing import Optional, Sequence
+from .tools import get_tool_command
+
+DEFAULT_CACHE_SIZE = "20G"
+
+_SIZE_SUFFIXES = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_size(size: str | int) -> int:
+    """Parse a human readable byte count such as `512M` or `20G`."""
+    if isinstance(size, int):
+        return size
+    size = size.strip().upper().removesuffix("B").removesuffix("I")
+    suffix = size[-1] if size and size[-1] in _SIZE_SUFFIXES else ""
+    number = size[: len(size) - len(suffix)]
+    return int(float(number) * _SIZE_SUFFIXES[suffix])
+
+
+@functools.lru_cache(maxsize=None)
+def get_iree_compile_version(compiler: str = "iree-compile") -> str:
+    """Return the `--version` banner of the compiler, cached per process."""
+    try:
+        proc = subprocess.run(
+            [*get_tool_command(compiler), "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False
+        )
+    except OSError:
+        logging.getLogger().warning(f"Could not query {compiler} version")
+        return "unknown"
+    return proc.stdout.decode().strip()
+
+
+class CompileCache:
+    """Content-addressed store of compiled vmfb files.
+
+    Entries are keyed on the MLIR source, the compiler version and the full
+    compiler flag list (file paths excluded). The cache directory is shared
+    between processes, so writes go through a temporary file and a rename.
+    Least recently used entries are evicted once the directory grows past
+    `max_size` bytes; a hit refreshes the entry's mtime.
+    """
+
+    def __init__(self, cache_dir: Path | str, max_size: str | int = DEFAULT_CACHE_SIZE, compiler_version: Optional[str] = None):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = parse_size(max_size)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Queried once here so pool workers, which receive a pickled copy of
+        # the cache, do not each have to run the compiler.
+        self.compiler_version = compiler_version or get_iree_compile_version()
+
+    def get_key(self, mlir_content: str, compile_flags: Sequence[str]) -> str:
+        hasher = hashlib.sha256()
+        for part in [mlir_content, self.compiler_version, *compile_flags]:
+            hasher.update(part.encode())
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    def get_entry_path(self, key: str) -> Path:
+        return self.cache_dir / (key + ".vmfb")
+
+    def lookup(self, key: str, vmfb_file: Path) -> bool:
+        """Copy the cached vmfb for `key` to `vmfb_file`. Returns False on a miss."""
+        entry = self.get_entry_path(key)
+        try:
+            shutil.copyfile(entry, vmfb_file)
+            os.utime(entry)
+        except FileNotFoundError:
+            return False
+        logging.getLogger().info(f"Compile cache hit {entry} -> {vmfb_file}")
+        return True
+
+    def read(self, key: str) -> Optional[bytes]:
+        """Return the cached vmfb for `key`, or None on a miss."""
+        entry = self.get_entry_path(key)
+        try:
+            data = entry.read_bytes()
+            os.utime(entry)
+        except FileNotFoundError:
+            return None
+        logging.getLogger().info(f"Compile cache hit {entry}")
+        return data
+
+    def store(self, key: str, vmfb: Path | bytes):
+        """Add a vmfb, given as file or as its contents, to the cache."""
+        tmp_name = None
+        try:
+            fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            if isinstance(vmfb, bytes):
+                with os.fdopen(fd, "wb") as f:
+                    f.write(vmfb)
+            else:
+                os.close(fd)
+                shutil.copyfile(vmfb, tmp_name)
+            os.replace(tmp_name, self.get_entry_path(key))
+        except OSError:
+            # E.g. a remote worker that cannot reach the cache directory.
+            logging.getLogger().warning(f"Failed to store compile cache entry {key}")
+            if tmp_name is not None:
+                Path(tmp_name).unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits `max_size`."""
+        entries = []
+        for entry in self.cache_dir.glob("*.vmfb"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            entry.unlink(missing_ok=True)
+            total_size -= size
+            logging.getLogger().info(f"Evicted {entry} from compile cache")
+
+
+def get_compile_cache(
+    cache_dir: Optional[str], max_size: str = DEFAULT_CACHE_SIZE, compiler_version: Optional[str] = None
+) -> Optional[CompileCache]:
+    if cache_dir is None:
+        return None
+    return CompileCache(cache_dir, max_size, compiler_version)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the options of the compile cache to `parser`."""
+    group = parser.add_argument_group("compile cache")
+    group.add_argument(
+        "--compile-cache",
+        help="Directory of a content-addressed vmfb cache shared between runs. Disabled when unset.",
+        default=None,
+    )
+    group.add_argument(
+        "--compile-cache-size",
+        help="Maximum size of the compile cache (e.g. 512M, 20G); least recently used entries are evicted beyond it",
+        default=DEFAULT_CACHE_SIZE,
+    )
@@ -0,0 +1,280 @@
+import argparse
+import ctypes
+import logging
+import shutil
+import threading
+from pathlib import Path
+from typing import Optional, Sequence
+from .bench_utils import run_iree_command
+from .compile_cache import CompileCache, get_iree_compile_version
+from .static_analysis import analyze_executables, get_dump_flags, get_static_stats_file, write_static_stats
+
+COMPILE_BACKENDS = ["subprocess", "inprocess"]
+DEFAULT_COMPILE_BACKEND = "subprocess"
+
+# Sessions of this thread by compiler flags. A session owns the MLIR context
+# and the parsed flags, so reusing it across kernels saves setting both up
+# for every kernel. The context must not be used by two compilations at
+# once, so every thread has its own sessions.
+_thread_sessions = threading.local()
+# Names of the iree_compiler_diagnostic_severity_t values.
+_DIAGNOSTIC_SEVERITIES = ["note", "warning", "error", "remark"]
+# C API function enabling callback diagnostics, which the Python API does not wrap.
+_ENABLE_CALLBACK_DIAGNOSTICS = "ireeCompilerInvocationEnableCallbackDiagnostics"
+_DiagnosticCallback = ctypes.CFUNCTYPE(None, ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p)
+
+
+def check_compile_backend(backend: str):
+    """Fail early if `backend` cannot be used here.
+
+    Also loads the in-process compiler before the compile pool forks its
+    workers, so they inherit the initialized compiler.
+    """
+    if backend == "inprocess":
+        try:
+            import iree.compiler.api
+        except ImportError as e:
+            raise RuntimeError("The inprocess compile backend requires the iree-base-compiler package") from e
+
+
+def get_compiler_version(backend: str = DEFAULT_COMPILE_BACKEND) -> str:
+    if backend == "inprocess":
+        from iree.compiler import version
+        return f"iree.compiler {version.VERSION} {version.REVISIONS}"
+    return get_iree_compile_version()
+
+
+def _get_session(compile_flags: Sequence[str]):
+    from iree.compiler.api import Session
+
+    sessions = _thread_sessions.__dict__
+    key = tuple(compile_flags)
+    if key not in sessions:
+        session = Session()
+        session.set_flags(*compile_flags)
+        sessions[key] = session
+    return sessions[key]
+
+
+def _capture_diagnostics(invocation, diagnostics: list[bytes]):
+    """Collect the diagnostics of `invocation` into `diagnostics` instead of printing them.
+
+    The Python API only exposes console diagnostics, so the callback
+    diagnostics of the C API are enabled through the private handles of
+    `iree.compiler.api.ctypes_dl`. Releases without them fall back to console
+    diagnostics, which leaves a note in `diagnostics`. Returns the callback,
+    which must be kept alive as long as the invocation, or None.
+    """
+    from iree.compiler.api import ctypes_dl
+
+    dylib = getattr(ctypes_dl, "_dylib", None)
+    if not hasattr(dylib, _ENABLE_CALLBACK_DIAGNOSTICS) or not hasattr(invocation, "_inv_p"):
+        invocation.enable_console_diagnostics()
+        diagnostics.append(b"note: diagnostics were printed to stderr by this version of iree.compiler\n")
+        return None
+    enable = getattr(dylib, _ENABLE_CALLBACK_DIAGNOSTICS)
+    enable.restype = None
+    enable.argtypes = [ctypes.c_void_p, ctypes.c_int, _DiagnosticCallback, ctypes.c_void_p]
+
+    def collect(severity, message, size, user_data):
+        diagnostics.append(f"{_DIAGNOSTIC_SEVERITIES[severity]}: ".encode() + ctypes.string_at(message, size) + b"\n")
+
+    callback = _DiagnosticCallback(collect)
+    enable(invocation._inv_p, 0, callback, None)
+    return callback
+
+
+def compile_in_process(
+    mlir_file: Path | str, vmfb_file: Optional[Path], compile_flags: Sequence[str], mlir_content: Optional[str] = None
+) -> tuple[int, bytes]:
+    """Compile through the IREE compiler API; returns `(ret_value, output)` like `run_iree_command`.
+
+    With `mlir_content` the source is read from memory and `mlir_file` only
+    names it in messages. Without `vmfb_file` the output on success is the
+    vmfb itself.
+    """
+    from iree.compiler.api import Output, Source
+
+    vmfb = None
+    diagnostics = []
+    try:
+        session = _get_session(compile_flags)
+        with session.invocation() as invocation:
+            # Kept alive while the invocation may call it.
+            callback = _capture_diagnostics(invocation, diagnostics)
+            if mlir_content is not None:
+                source = Source.wrap_buffer(session, mlir_content.encode())
+            else:
+                source = Source.open_file(session, str(mlir_file))
+            with source:
+                ok = invocation.parse_source(source) and invocation.execute()
+            if ok and vmfb_file is None:
+                with Output.open_membuffer() as output:
+                    invocation.output_vm_bytecode(output)
+                    vmfb = bytes(output.map_memory())
+            elif ok:
+                with Output.open_file(str(vmfb_file)) as output:
+                    invocation.output_vm_bytecode(output)
+                    output.keep()
+    except Exception as e:
+        # E.g. unknown flags, which the API reports as exceptions.
+        ok = False
+        diagnostics.append(f"{e}\n".encode())
+    output_text = b"".join(diagnostics)
+    if not ok:
+        logging.getLogger().error(f"In-process compilation of {mlir_file} failed!\n{output_text.decode()}")
+        return 1, output_text
+    return 0, vmfb if vmfb is not None else output_text
+
+
+def run_iree_compile(
+    mlir_file: Path,
+    vmfb_file: Path,
+    compile_flags: Sequence[str],
+    timeout: Optional[float] = None,
+    backend: str = DEFAULT_COMPILE_BACKEND,
+) -> tuple[int, bytes]:
+    """Compile `mlir_file` to `vmfb_file`; returns `(ret_value, stderr)`.
+
+    The in-process backend cannot interrupt a compilation, so `timeout` only
+    applies to the subprocess backend; `CompileScheduler.run` enforces it for
+    in-process compilations.
+    """
+    if backend == "inprocess":
+        return compile_in_process(mlir_file, vmfb_file, compile_flags)
+
+    exec_args = [
+        "iree-compile",
+        # Input file
+        f"{mlir_file}",
+        # Output file
+        "-o",
+        f"{vmfb_file}",
+    ] + list(compile_flags)
+
+    print(" ".join(exec_args))
+
+    return run_iree_command(exec_args, timeout)
+
+
+def run_iree_compile_in_memory(
+    mlir_content: str,
+    compile_flags: Sequence[str],
+    timeout: Optional[float] = None,
+    backend: str = DEFAULT_COMPILE_BACKEND,
+    name: str = "<stdin>",
+) -> tuple[int, bytes]:
+    """Compile `mlir_content` without touching the disk; returns `(ret_value, vmfb or stderr)`.
+
+    The subprocess backend streams the MLIR through the stdin and stdout of
+    iree-compile. `name` is only used for messages.
+    """
+    if backend == "inprocess":
+        return compile_in_process(name, None, compile_flags, mlir_content)
+
+    exec_args = ["iree-compile", "-", "-o", "-"] + list(compile_flags)
+
+    print(f"{' '.join(exec_args)} < {name}")
+
+    return run_iree_command(exec_args, timeout, input=mlir_content.encode())
+
+
+def compile_mlir(
+    name: str,
+    mlir_content: str,
+    kernel_dir: Path,
+    vmfb_dir: Path,
+    compile_flags: Sequence[str],
+    cache: Optional[CompileCache] = None,
+    timeout: Optional[float] = None,
+    backend: str = DEFAULT_COMPILE_BACKEND,
+    in_memory: bool = False,
+    analyze: bool = False,
+) -> tuple[Path, Optional[Path | bytes]]:
+    """Compile the kernel `name`, reusing `cache` if given; returns `(mlir_file, vmfb)`.
+
+    `vmfb` is the path of the compiled module, or with `in_memory` its
+    contents, and None if compilation failed. In memory, the MLIR is only
+    written to `mlir_file` when compilation fails, so it can be inspected
+    next to the diagnostics in `<vmfb_dir>/<name>_error.txt`, and the
+    directories are only created then.
+
+    With `analyze`, the executables of the module are dumped to
+    `<vmfb_dir>/<name>_dump` and summarized in `<vmfb_dir>/<name>_static.json`
+    (see `analyze_executables`). Only a compilation dumps them, so the cache
+    is not read then.
+    """
+    mlir_file = kernel_dir / (name + ".mlir")
+    vmfb_file = vmfb_dir / (name + ".vmfb")
+    dump_dir = vmfb_dir / (name + "_dump")
+    stats_file = get_static_stats_file(vmfb_dir, name)
+    if analyze:
+        # Leftovers of an earlier run must not be taken for this compilation.
+        shutil.rmtree(dump_dir, ignore_errors=True)
+        stats_file.unlink(missing_ok=True)
+        vmfb_dir.mkdir(parents=True, exist_ok=True)
+
+    if not in_memory:
+        with open(mlir_file, "w") as f:
+            f.write(mlir_content)
+
+    if cache is not None:
+        cache_key = cache.get_key(mlir_content, compile_flags)
+    if cache is not None and not analyze:
+        if in_memory:
+            vmfb = cache.read(cache_key)
+            if vmfb is not None:
+                print(f"Reused cached compilation of {name}")
+                return mlir_file, vmfb
+        elif cache.lookup(cache_key, vmfb_file):
+            print(f"Reused cached compilation of {mlir_file} for {vmfb_file}")
+            return mlir_file, vmfb_file
+
+    if analyze:
+        compile_flags = list(compile_flags) + get_dump_flags(dump_dir)
+    if in_memory:
+        ret_value, output = run_iree_compile_in_memory(mlir_content, compile_flags, timeout, backend, name)
+    else:
+        ret_value, output = run_iree_compile(mlir_file, vmfb_file, compile_flags, timeout, backend)
+    if ret_value != 0:
+        error_file = vmfb_dir / (name + "_error.txt")
+        if in_memory:
+            kernel_dir.mkdir(parents=True, exist_ok=True)
+            vmfb_dir.mkdir(parents=True, exist_ok=True)
+            with open(mlir_file, "w") as f:
+                f.write(mlir_content)
+        print(f"Failed to compile {mlir_file}. Error dumped in {error_file}")
+        with open(error_file, "w") as f:
+            f.write(output.decode("utf-8"))
+        return mlir_file, None
+
+    if in_memory:
+        print(f"Successfully compiled {name}")
+        vmfb = output
+    else:
+        print(f"Successfully compiled {mlir_file} to {vmfb_file}")
+        vmfb = vmfb_file
+    if analyze:
+        write_static_stats(stats_file, analyze_executables(dump_dir, vmfb))
+    if cache is not None:
+        cache.store(cache_key, vmfb)
+    return mlir_file, vmfb
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the options of the compile backend to `parser`."""
+    group = parser.add_argument_group("compilation")
+    group.add_argument(
+        "--compile-backend",
+        help="Compile through iree-compile subprocesses, or in-process through the iree.compiler API with "
+        "sessions reused within each compile worker",
+        choices=COMPILE_BACKENDS,
+        default=DEFAULT_COMPILE_BACKEND,
+    )
+    group.add_argument(
+        "--in-memory",
+        action="store_true",
+        default=False,
+        help="Stream the MLIR to the compiler and keep the vmfbs in memory instead of writing them to the kernel "
+        "and vmfb directories; only kernels that fail to compile leave their MLIR and errors there",
+    )
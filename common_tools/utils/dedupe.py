@@ -0,0 +1,91 @@
+import threading
+from typing import Iterable, Iterator
+
+from .bench_utils import get_kernel_key
+
+# Result column naming the tag a copied row was measured under; empty for
+# the rows that were measured.
+DUPLICATE_FIELDNAME = "duplicate_of"
+
+
+class KernelDeduplicator:
+    """Runs every unique kernel once and fans its result row out to all tags.
+
+    The same kernel (identified by its name, which also names its mlir and
+    vmfb files) can be listed under several problem tags. Only the first
+    occurrence is compiled and benchmarked; the result row is copied for every
+    other tag, with `DUPLICATE_FIELDNAME` set to the tag it was measured
+    under. Duplicates seen while their kernel runs are copied by `fan_out`.
+    Only the `get_kernel_key` of finished kernels is kept, so duplicates seen
+    after their kernel finished are copied by `drain` from the rows already
+    written. The finished keys still grow with the kernels of a run, by
+    less than 100 bytes each. `fieldnames` end with `DUPLICATE_FIELDNAME`;
+    rows are given without it and without the leading `index` column, as for
+    `ResultWriter`, and are returned with it.
+    """
+
+    def __init__(self, fieldnames: list[str]):
+        self.fieldnames = fieldnames
+        self.tag_pos = fieldnames.index("tag") - 1
+        self.name_pos = fieldnames.index("name") - 1
+        self.waiting = {}
+        self.finished = set()
+        self.late_tags = {}
+        self.duplicate_count = 0
+        # Configs are consumed on the scheduler's feeder thread.
+        self.lock = threading.Lock()
+
+    def resume(self, written_records: Iterable[dict]):
+        """Mark the kernels measured in the rows of a resumed result file as finished.
+
+        Their duplicates under tags missing from the file are then copied by
+        `drain` rather than measured again.
+        """
+        with self.lock:
+            for record in written_records:
+                if record[DUPLICATE_FIELDNAME] in (None, ""):
+                    self.finished.add(get_kernel_key(record["name"]))
+
+    def is_duplicate(self, tag: str, name: str) -> bool:
+        """Register `(tag, name)`; returns True if the kernel already runs for another tag."""
+        with self.lock:
+            if get_kernel_key(name) in self.finished:
+                self.late_tags.setdefault(name, []).append(tag)
+            elif name in self.waiting:
+                self.waiting[name].append(tag)
+            else:
+                self.waiting[name] = []
+                return False
+            self.duplicate_count += 1
+            return True
+
+    def fan_out(self, row: tuple) -> Iterator[tuple]:
+        """Yield `row` followed by its copies for every other tag of the kernel seen so far."""
+        with self.lock:
+            name = row[self.name_pos]
+            self.finished.add(get_kernel_key(name))
+            tags = self.waiting.pop(name, [])
+        yield (*row, None)
+        for tag in tags:
+            yield self._copy_row(row, tag)
+
+    def drain(self, written_records: Iterable[dict]) -> Iterator[tuple]:
+        """Yield the copies of duplicates that were seen after their kernel finished.
+
+        `written_records` are the rows of the result file, e.g. from
+        `iter_results`, and are only read if there are such duplicates.
+        """
+        with self.lock:
+            late_tags, self.late_tags = self.late_tags, {}
+        if not late_tags:
+            return
+        for record in written_records:
+            if record["name"] in late_tags and record[DUPLICATE_FIELDNAME] in (None, ""):
+                row = tuple(record[field] for field in self.fieldnames[1:-1])
+                for tag in late_tags.pop(record["name"]):
+                    yield self._copy_row(row, tag)
+
+    def _copy_row(self, row: tuple, tag: str) -> tuple:
+        copy = list(row)
+        copy[self.tag_pos] = tag
+        return (*copy, row[self.tag_pos])
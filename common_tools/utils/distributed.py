@@ -0,0 +1,368 @@
+import argparse
+import os
+import time
+import uuid
+import pickle
+import stat
+import shutil
+import socket
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+DISTRIBUTED_STAGES = ["compile", "benchmark"]
+DEFAULT_HEARTBEAT_TIMEOUT = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+# Jobs submitted to the queue directory but not yet collected.
+DEFAULT_MAX_OUTSTANDING = 256
+POLL_INTERVAL = 0.2
+
+
+def check_queue_dir(queue_dir: Path):
+    """Raise ValueError if users other than the owner can write to `queue_dir`.
+
+    Jobs and results are unpickled from the queue directory, so anyone who
+    can write to it can run code on the coordinator and the workers.
+    """
+    if queue_dir.stat().st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise ValueError(
+            f"{queue_dir} is writable by other users, who could run code on the coordinator and the workers "
+            f"through it; make it writable by its owner only (chmod go-w {queue_dir})"
+        )
+
+
+def _make_queue_dirs(queue_dir: Path):
+    # Created for the owner only; directories created earlier are checked.
+    for path in [queue_dir, *(queue_dir / subdir for subdir in ["pending", "claimed", "done"])]:
+        path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        check_queue_dir(path)
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _map_paths(value, path_map: dict[Path, Path]):
+    """Rewrite every Path inside `value` that lies below a key of `path_map`."""
+    if isinstance(value, Path):
+        for src, dst in path_map.items():
+            if value.is_relative_to(src):
+                return dst / value.relative_to(src)
+        return value
+    if isinstance(value, tuple):
+        return tuple(_map_paths(v, path_map) for v in value)
+    if isinstance(value, list):
+        return [_map_paths(v, path_map) for v in value]
+    return value
+
+
+class WorkQueue:
+    """Coordinator side of a work queue kept in a directory shared with workers.
+
+    Jobs are pickled `(fn, args)` files in `pending/`. A worker claims a job by
+    renaming it into `claimed/` and keeps touching the claimed file while the
+    job runs; the result, together with any files the job produced, comes back
+    through `done/`. Claimed jobs whose heartbeat stops for `heartbeat_timeout`
+    seconds (e.g. the worker died) are put back into `pending/`, up to
+    `max_attempts` times, and a result that arrives twice is only used once.
+    A job that raised on its worker or was abandoned by `max_attempts` workers
+    is reported as failed, without stopping the other jobs. At most `max_outstanding` jobs are
+    submitted ahead of the collected results, so the job stream is consumed
+    lazily and the queue directory stays small.
+
+    Top level `Path` arguments are shipped to the worker: files are copied
+    into the job, and directories are replaced by a scratch directory on the
+    worker whose contents are copied back into the original directory.
+    `fn` is pickled by reference, so workers must run the same driver script
+    as the coordinator (see `run_workers`).
+
+    Since jobs and results are unpickled, the queue directory must only be
+    writable by trusted users. Its directories are created for their owner
+    only, and directories other users can write to are rejected (see
+    `check_queue_dir`).
+    """
+
+    def __init__(
+        self,
+        queue_dir: Path | str,
+        heartbeat_timeout: float = DEFAULT_HEARTBEAT_TIMEOUT,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        max_outstanding: int = DEFAULT_MAX_OUTSTANDING,
+    ):
+        self.queue_dir = Path(queue_dir)
+        self.max_outstanding = max_outstanding
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        _make_queue_dirs(self.queue_dir)
+
+    def submit(self, key: str, fn: Callable, args: tuple):
+        files = {}
+        dirs = []
+        for i, arg in enumerate(args):
+            if isinstance(arg, Path) and arg.is_file():
+                files[i] = (arg.name, arg.read_bytes())
+            elif isinstance(arg, Path) and arg.is_dir():
+                dirs.append(i)
+        job = {"fn": fn, "args": args, "files": files, "dirs": dirs}
+        _write_atomic(self.queue_dir / "pending" / f"{key}.job", pickle.dumps(job))
+
+    def requeue_stale(self, attempts: dict[str, int]) -> list[str]:
+        """Put the stale claims of `attempts` back into `pending/`; returns the keys given up after `max_attempts`."""
+        now = time.time()
+        abandoned = []
+        for claimed in (self.queue_dir / "claimed").glob("*.job"):
+            key = claimed.name.split(".")[0]
+            if key not in attempts:
+                continue
+            try:
+                if now - claimed.stat().st_mtime < self.heartbeat_timeout:
+                    continue
+                if attempts[key] >= self.max_attempts:
+                    claimed.unlink()
+                    abandoned.append(key)
+                    continue
+                os.rename(claimed, self.queue_dir / "pending" / f"{key}.job")
+            except FileNotFoundError:
+                # The worker finished in the meantime.
+                continue
+            attempts[key] += 1
+            logging.getLogger().warning(f"Worker of {claimed.name} stopped responding, requeued job")
+        return abandoned
+
+    def run(
+        self, fn: Callable, jobs: Iterable[tuple[str, tuple]], get_failed_result: Callable[[tuple], Any]
+    ) -> Iterator[Any]:
+        """Yield `fn(*args)` computed by the workers for every job, in completion order.
+
+        A failed job yields `get_failed_result(args)` instead, and its error is logged.
+        """
+        run_id = uuid.uuid4().hex[:8]
+        attempts = {}
+        # Name and args of the jobs in `attempts`, to report their failures.
+        outstanding = {}
+        lock = threading.Lock()
+        collected = threading.Condition(lock)
+        feeding_done = threading.Event()
+        feed_errors = []
+
+        def feed_jobs():
+            try:
+                for i, (name, args) in enumerate(jobs):
+                    key = f"{run_id}-{i:07d}"
+                    with collected:
+                        while len(attempts) >= self.max_outstanding:
+                            collected.wait()
+                        attempts[key] = 1
+                        outstanding[key] = (name, args)
+                    logging.getLogger().info(f"Queued {name} as {key}")
+                    self.submit(key, fn, args)
+            except BaseException as e:
+                feed_errors.append(e)
+            finally:
+                feeding_done.set()
+
+        threading.Thread(target=feed_jobs, daemon=True).start()
+        try:
+            for key, result, error in self._collect_results(run_id, attempts, collected, feeding_done, feed_errors):
+                with collected:
+                    name, args = outstanding.pop(key)
+                if error is None:
+                    yield result
+                    continue
+                logging.getLogger().error(f"{name} failed on a worker: {error}")
+                yield get_failed_result(args)
+        finally:
+            # Do not leave work behind for the workers if the coordinator stops early.
+            for job_file in (self.queue_dir / "pending").glob(f"{run_id}-*.job"):
+                job_file.unlink(missing_ok=True)
+
+    def _collect_results(self, run_id, attempts, lock, feeding_done, feed_errors) -> Iterator[tuple[str, Any, Any]]:
+        # Yields `(key, result, error)` for every job.
+        while True:
+            if feed_errors:
+                raise feed_errors[0]
+            with lock:
+                if feeding_done.is_set() and not attempts:
+                    return
+                abandoned = self.requeue_stale(attempts)
+                for key in abandoned:
+                    del attempts[key]
+                    lock.notify()
+            for key in abandoned:
+                yield key, None, f"abandoned by {self.max_attempts} workers"
+            result_files = sorted((self.queue_dir / "done").glob(f"{run_id}-*.result"))
+            if not result_files:
+                time.sleep(POLL_INTERVAL)
+                continue
+            for result_file in result_files:
+                key = result_file.name.split(".")[0]
+                with open(result_file, "rb") as f:
+                    payload = pickle.load(f)
+                result_file.unlink()
+                with lock:
+                    if key not in attempts:
+                        continue
+                    del attempts[key]
+                    lock.notify()
+                for claimed in (self.queue_dir / "claimed").glob(f"{key}.*"):
+                    claimed.unlink(missing_ok=True)
+                if payload["error"] is not None:
+                    yield key, None, payload["error"]
+                    continue
+                for path, data in payload["outputs"].items():
+                    Path(path).parent.mkdir(parents=True, exist_ok=True)
+                    Path(path).write_bytes(data)
+                yield key, payload["result"], None
+
+
+def _claim_job(queue_dir: Path, worker_id: str) -> Optional[Path]:
+    for job_file in sorted((queue_dir / "pending").glob("*.job")):
+        claimed = queue_dir / "claimed" / f"{job_file.stem}.{worker_id}.job"
+        try:
+            os.rename(job_file, claimed)
+            # The rename keeps the submission time; start the heartbeat from now.
+            os.utime(claimed)
+        except FileNotFoundError:
+            # Another worker was faster.
+            continue
+        return claimed
+    return None
+
+
+def _heartbeat(claimed: Path, interval: float, stop: threading.Event):
+    while not stop.wait(interval):
+        try:
+            os.utime(claimed)
+        except FileNotFoundError:
+            # The coordinator gave up on us; finish anyway; duplicates are dropped.
+            return
+
+
+def _execute_job(job: dict, extra_args: tuple, scratch_dir: Path) -> dict:
+    args = list(job["args"])
+    for i, (name, data) in job["files"].items():
+        local_file = scratch_dir / f"input{i}" / name
+        local_file.parent.mkdir(parents=True)
+        local_file.write_bytes(data)
+        args[i] = local_file
+    path_map = {}
+    for i in job["dirs"]:
+        local_dir = scratch_dir / f"dir{i}"
+        local_dir.mkdir()
+        path_map[local_dir] = job["args"][i]
+        args[i] = local_dir
+
+    result, error = None, None
+    try:
+        result = job["fn"](*extra_args, *args)
+    except Exception as e:
+        logging.getLogger().exception("Job failed")
+        error = e
+
+    outputs = {}
+    for local_dir, original_dir in path_map.items():
+        for local_file in local_dir.rglob("*"):
+            if local_file.is_file():
+                outputs[str(original_dir / local_file.relative_to(local_dir))] = local_file.read_bytes()
+    return {"result": _map_paths(result, path_map), "error": error, "outputs": outputs}
+
+
+def run_worker(
+    queue_dir: Path | str,
+    extra_args: tuple = (),
+    idle_timeout: Optional[float] = None,
+    heartbeat_timeout: float = DEFAULT_HEARTBEAT_TIMEOUT,
+):
+    """Process jobs from `queue_dir` as `fn(*extra_args, *args)` until idle for `idle_timeout` seconds."""
+    queue_dir = Path(queue_dir)
+    _make_queue_dirs(queue_dir)
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+    idle_since = time.time()
+    while idle_timeout is None or time.time() - idle_since < idle_timeout:
+        claimed = _claim_job(queue_dir, worker_id)
+        if claimed is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        key = claimed.name.split(".")[0]
+        logging.getLogger().info(f"Worker {worker_id} running {key}")
+        stop = threading.Event()
+        threading.Thread(target=_heartbeat, args=(claimed, heartbeat_timeout / 4, stop), daemon=True).start()
+        scratch_dir = Path(tempfile.mkdtemp(prefix="iree-kernel-benchmark-"))
+        try:
+            with open(claimed, "rb") as f:
+                job = pickle.load(f)
+            payload = _execute_job(job, extra_args, scratch_dir)
+            try:
+                data = pickle.dumps(payload)
+            except Exception:
+                payload["error"] = RuntimeError(repr(payload["error"]) if payload["error"] else "Unpicklable job result")
+                payload["result"] = None
+                data = pickle.dumps(payload)
+            _write_atomic(queue_dir / "done" / f"{key}.{worker_id}.result", data)
+        finally:
+            stop.set()
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+        claimed.unlink(missing_ok=True)
+        idle_since = time.time()
+
+
+def run_workers(queue_dir: Path | str, worker_extra_args: Sequence[tuple], idle_timeout: Optional[float] = None):
+    """Run one worker thread per entry of `worker_extra_args`, e.g. one per device."""
+    threads = [
+        threading.Thread(target=run_worker, args=(queue_dir, extra_args, idle_timeout))
+        for extra_args in worker_extra_args
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def get_work_queue(queue_dir: Optional[str], stage: str, distribute: str) -> Optional[WorkQueue]:
+    """Return the queue for `stage` if it is handed to remote workers."""
+    if queue_dir is None or stage not in distribute.split(","):
+        return None
+    return WorkQueue(Path(queue_dir) / stage)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the options of coordinators and workers to `parser`."""
+    group = parser.add_argument_group("distributed runs")
+    group.add_argument(
+        "--queue-dir",
+        help="Directory shared with remote workers that is used as work queue. Runs all stages locally when unset. "
+        "Jobs are exchanged as pickles, so it must only be writable by trusted users; directories that other users "
+        "can write to are rejected",
+        default=None,
+    )
+    group.add_argument(
+        "--distribute",
+        help="Comma separated stages handed to the workers of --queue-dir",
+        default=",".join(DISTRIBUTED_STAGES),
+    )
+    group.add_argument(
+        "--worker",
+        help="Run as a worker of the given stage, pulling jobs from --queue-dir (benchmark workers use --devices)",
+        choices=DISTRIBUTED_STAGES,
+        default=None,
+    )
+    group.add_argument(
+        "--worker-idle-timeout",
+        help="Seconds after which an idle worker exits. Workers run until killed when unset.",
+        type=float,
+        default=None,
+    )
+
+
+def check_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Reject a `--queue-dir` that other users can write to."""
+    if args.queue_dir and os.path.isdir(args.queue_dir):
+        try:
+            check_queue_dir(Path(args.queue_dir))
+        except ValueError as e:
+            parser.error(str(e))
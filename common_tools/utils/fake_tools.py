@@ -0,0 +1,302 @@
+"""Stand-ins for iree-compile and iree-benchmark-module that need neither IREE nor a GPU.
+
+    python common_tools/utils/fake_tools.py iree-compile <args>
+    python common_tools/utils/fake_tools.py iree-benchmark-module <args>
+
+The suites use them with `--fake-tools`. They take the command lines the
+suites pass to the real tools: the fake iree-compile writes a fake vmfb that
+lists the public functions of the MLIR (and with the
+`--iree-hal-dump-executable-*` flags, an AMDGPU ISA and binary dump), and the
+fake iree-benchmark-module prints Google benchmark output for the functions of
+such a vmfb. They are configured through the environment:
+
+    FAKE_IREE_LATENCY_MS            mean kernel time; every function gets a fixed
+                                    factor of 0.5 to 1.5 of it (default 1.0)
+    FAKE_IREE_NOISE                 relative standard deviation of the time of a
+                                    repetition (default 0.01)
+    FAKE_IREE_COMPILE_SECONDS       time a compilation takes (default 0)
+    FAKE_IREE_BENCHMARK_SECONDS     time the benchmark of a function takes (default 0)
+    FAKE_IREE_COMPILE_FAILURE_RATE  fraction of kernels that fail to compile (default 0)
+    FAKE_IREE_BENCHMARK_FAILURE_RATE
+                                    fraction of benchmark runs that fail (default 0)
+    FAKE_IREE_HANG_RATE             fraction of compilations and benchmark runs that
+                                    never finish, to exercise timeouts (default 0)
+    FAKE_IREE_SEED                  seed of the noise; set it for reproducible times
+
+Which kernels fail or hang, and the latency factor of every function, only
+depend on the kernel (and device) and FAKE_IREE_SEED, so reruns fail the
+same kernels.
+Only the standard library is imported, so the fakes start quickly.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import struct
+import statistics
+import hashlib
+from pathlib import Path
+
+FAKE_VMFB_MAGIC = b"FAKEVMFB"
+FAKE_COMPILER_VERSION = "IREE (https://iree.dev):\n  IREE compiler version 0.0.0 (fake)\n  LLVM version 0.0.0 (fake)"
+
+_PUBLIC_FUNCTION = re.compile(r"(?:func|util)\.func\s+(?:public\s+)?@(?P<name>[\w$.]+)\((?P<args>[^)]*)\)")
+_SEPARATOR = "-" * 96
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+def _kernel_random(*identity) -> random.Random:
+    """Random numbers that only depend on the kernel and FAKE_IREE_SEED."""
+    seed = "\0".join([os.environ.get("FAKE_IREE_SEED", ""), *map(str, identity)])
+    return random.Random(hashlib.sha256(seed.encode()).hexdigest())
+
+
+def _hang():
+    while True:
+        time.sleep(3600)
+
+
+def _parse_flags(args: list[str]) -> tuple[dict[str, list[str]], list[str]]:
+    flags, positional = {}, []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "-o" and i + 1 < len(args):
+            flags.setdefault("-o", []).append(args[i + 1])
+            i += 1
+        elif arg.startswith("--"):
+            name, _, value = arg.partition("=")
+            flags.setdefault(name, []).append(value)
+        else:
+            positional.append(arg)
+        i += 1
+    return flags, positional
+
+
+def _elf_with_code(code_size: int) -> bytes:
+    """A 64-bit little endian ELF file with one executable section of `code_size` bytes."""
+    header = b"\x7fELF\x02\x01\x01" + bytes(9)
+    header += struct.pack("<HHIQQQIHHHHHH", 3, 224, 1, 0, 0, 64, 0, 64, 0, 0, 64, 2, 0)
+    null_section = bytes(64)
+    # SHT_PROGBITS with SHF_ALLOC | SHF_EXECINSTR.
+    code_section = struct.pack("<IIQQQQIIQQ", 0, 1, 0x6, 0, 0, code_size, 0, 0, 256, 0)
+    return header + null_section + code_section
+
+
+def _write_dumps(flags: dict[str, list[str]], functions: list[dict], rng: random.Random):
+    binaries_dir = flags.get("--iree-hal-dump-executable-binaries-to", [None])[-1]
+    intermediates_dir = flags.get("--iree-hal-dump-executable-intermediates-to", [None])[-1]
+    chip = (flags.get("--iree-hip-target") or flags.get("--iree-rocm-target") or ["gfx942"])[-1]
+    rocm = (
+        "rocm" in flags.get("--iree-hal-target-backends", [])
+        or "hip" in flags.get("--iree-hal-target-device", [])
+        or "--iree-hip-target" in flags
+        or "--iree-rocm-target" in flags
+    )
+    for i, function in enumerate(functions):
+        name = f"module_{function['name']}_dispatch_{i}"
+        if binaries_dir:
+            Path(binaries_dir).mkdir(parents=True, exist_ok=True)
+            suffix = "rocm_hsaco_fb.hsaco" if rocm else "embedded_elf_x86_64.so"
+            (Path(binaries_dir) / f"{name}_{suffix}").write_bytes(_elf_with_code(rng.randrange(1024, 65536, 4)))
+        if intermediates_dir and rocm:
+            Path(intermediates_dir).mkdir(parents=True, exist_ok=True)
+            vgprs = rng.randrange(32, 513, 8)
+            metadata = {
+                "agpr_count": 0,
+                "group_segment_fixed_size": rng.choice([0, 16384, 32768, 65536]),
+                "max_flat_workgroup_size": rng.choice([64, 128, 256]),
+                "name": f"{function['name']}_dispatch_{i}",
+                "private_segment_fixed_size": 0,
+                "sgpr_count": rng.randrange(16, 105),
+                "sgpr_spill_count": 0,
+                "vgpr_count": vgprs,
+                "vgpr_spill_count": 0,
+                "wavefront_size": 64,
+            }
+            lines = [f"  - .{key}: {value}" if j == 0 else f"    .{key}: {value}" for j, (key, value) in enumerate(metadata.items())]
+            isa = (
+                "\t.amdgpu_metadata\n---\namdhsa.kernels:\n" + "\n".join(lines) + "\n"
+                f"amdhsa.target:   amdgcn-amd-amdhsa--{chip}\n...\n\n\t.end_amdgpu_metadata\n"
+            )
+            (Path(intermediates_dir) / f"{name}_rocm_hsaco_fb.rocmasm").write_text(isa)
+
+
+def fake_iree_compile(args: list[str]) -> int:
+    if "--version" in args:
+        print(FAKE_COMPILER_VERSION)
+        return 0
+    flags, positional = _parse_flags(args)
+    if not positional or "-o" not in flags:
+        print("iree-compile: expected an input file and -o <output>", file=sys.stderr)
+        return 1
+    source = sys.stdin.read() if positional[0] == "-" else Path(positional[0]).read_text()
+    source_name = "<stdin>" if positional[0] == "-" else positional[0]
+
+    rng = _kernel_random("compile", source)
+    time.sleep(_env_float("FAKE_IREE_COMPILE_SECONDS", 0))
+    if rng.random() < _env_float("FAKE_IREE_HANG_RATE", 0):
+        _hang()
+    functions = [
+        {"name": match.group("name"), "args": bool(match.group("args").strip())}
+        for match in _PUBLIC_FUNCTION.finditer(source)
+        if "private" not in match.group(0)
+    ]
+    if not functions:
+        print(f"{source_name}:1:1: error: expected a func.func or util.func", file=sys.stderr)
+        return 1
+    if rng.random() < _env_float("FAKE_IREE_COMPILE_FAILURE_RATE", 0):
+        print(f"{source_name}:1:1: error: failed to legalize operation (injected by fake iree-compile)", file=sys.stderr)
+        return 1
+
+    _write_dumps(flags, functions, rng)
+    module = {
+        "functions": functions,
+        "source": hashlib.sha256(source.encode()).hexdigest(),
+        "flags": sorted(arg for arg in args if arg.startswith("--") and not arg.startswith("--iree-hal-dump")),
+    }
+    vmfb = FAKE_VMFB_MAGIC + json.dumps(module).encode()
+    output = flags["-o"][-1]
+    if output == "-":
+        sys.stdout.buffer.write(vmfb)
+    else:
+        Path(output).write_bytes(vmfb)
+    return 0
+
+
+def _format_time(value: float) -> str:
+    # Google benchmark's precision for times.
+    if value < 1:
+        return f"{value:10.3f}"
+    if value < 10:
+        return f"{value:10.2f}"
+    if value < 100:
+        return f"{value:10.1f}"
+    return f"{value:10.0f}"
+
+
+def _format_rate(value: float) -> str:
+    for threshold, suffix in [(1e9, "G"), (1e6, "M"), (1e3, "k")]:
+        if value >= threshold:
+            return f"{value / threshold:g}{suffix}/s"
+    return f"{value:g}/s"
+
+
+def _benchmark_line(name: str, time_ms: float, iterations: int, unit: str = "ms") -> str:
+    rate = _format_rate(1000 / time_ms) if unit == "ms" and time_ms > 0 else f"{time_ms:.2f}%"
+    return f"{name:<44}{_format_time(time_ms)} {unit} {_format_time(time_ms * 0.99)} {unit} {iterations:>12} items_per_second={rate}"
+
+
+def _benchmark_entry(
+    run_name: str, run_type: str, time_ms: float, iterations: int, repetitions: int, **fields
+) -> dict:
+    """A benchmark of the output of `--benchmark_format=json`."""
+    aggregate_name = fields.get("aggregate_name")
+    entry = {
+        "name": f"{run_name}_{aggregate_name}" if aggregate_name else run_name,
+        "run_name": run_name,
+        "run_type": run_type,
+        "repetitions": repetitions,
+        **fields,
+        "threads": 1,
+        "iterations": iterations,
+        "real_time": time_ms,
+        "cpu_time": time_ms * 0.99,
+        "time_unit": "ms",
+    }
+    if aggregate_name:
+        entry["aggregate_unit"] = "percentage" if aggregate_name == "cv" else "time"
+    return entry
+
+
+def fake_iree_benchmark_module(args: list[str]) -> int:
+    flags, _ = _parse_flags(args)
+    module_file = flags.get("--module", [None])[-1]
+    if not module_file:
+        print("iree-benchmark-module: --module is required", file=sys.stderr)
+        return 1
+    try:
+        data = Path(module_file).read_bytes()
+    except OSError as e:
+        print(f"iree-benchmark-module: NOT_FOUND; {e}", file=sys.stderr)
+        return 1
+    if not data.startswith(FAKE_VMFB_MAGIC):
+        print(f"iree-benchmark-module: INVALID_ARGUMENT; {module_file} was not compiled by the fake iree-compile", file=sys.stderr)
+        return 1
+    module = json.loads(data[len(FAKE_VMFB_MAGIC):])
+    exported = {function["name"]: function for function in module["functions"]}
+    if "--function" in flags:
+        names = flags["--function"]
+        for name in names:
+            if name not in exported:
+                print(f"iree-benchmark-module: NOT_FOUND; no function `{name}` exported by module", file=sys.stderr)
+                return 1
+    else:
+        # Like the real tool, all functions without arguments.
+        names = [name for name, function in exported.items() if not function["args"]]
+    if "--benchmark_filter" in flags:
+        pattern = re.compile(flags["--benchmark_filter"][-1])
+        names = [name for name in names if pattern.search(f"BM_{name}/process_time/real_time")]
+        if not names:
+            print(f"Failed to match any benchmarks against regex: {pattern.pattern}", file=sys.stderr)
+            return 1
+    repetitions = int(flags.get("--benchmark_repetitions", ["1"])[-1])
+    device = flags.get("--device", ["local-task"])[-1]
+
+    run_rng = _kernel_random("benchmark", module["source"], device)
+    if run_rng.random() < _env_float("FAKE_IREE_HANG_RATE", 0):
+        _hang()
+    if run_rng.random() < _env_float("FAKE_IREE_BENCHMARK_FAILURE_RATE", 0):
+        print("iree-benchmark-module: ABORTED; device lost (injected by fake iree-benchmark-module)", file=sys.stderr)
+        return 1
+
+    json_format = flags.get("--benchmark_format", ["console"])[-1] == "json"
+    print(f"Running iree-benchmark-module\nRun on fake device {device}", file=sys.stderr)
+    if not json_format:
+        print(_SEPARATOR)
+        print(f"{'Benchmark':<44}{'Time':>10}    {'CPU':>10}    {'Iterations':>12} UserCounters...")
+        print(_SEPARATOR)
+    entries = []
+    seed = os.environ.get("FAKE_IREE_SEED")
+    noise_rng = _kernel_random("noise", module["source"]) if seed is not None else random.Random()
+    latency_ms = _env_float("FAKE_IREE_LATENCY_MS", 1.0)
+    noise = _env_float("FAKE_IREE_NOISE", 0.01)
+    for name in names:
+        mean_ms = latency_ms * (0.5 + _kernel_random("latency", module["source"], name).random())
+        times = [max(mean_ms * (1 + noise_rng.gauss(0, noise)), 1e-6) for _ in range(repetitions)]
+        time.sleep(_env_float("FAKE_IREE_BENCHMARK_SECONDS", 0))
+        iterations = max(1, int(500 / mean_ms))
+        benchmark = f"BM_{name}/process_time/real_time"
+        for index, value in enumerate(times):
+            entries.append(_benchmark_entry(benchmark, "iteration", value, iterations, repetitions, repetition_index=index))
+        if repetitions > 1:
+            mean, median, stddev = statistics.mean(times), statistics.median(times), statistics.stdev(times)
+            for aggregate, value in [("mean", mean), ("median", median), ("stddev", stddev), ("cv", stddev / mean)]:
+                entries.append(_benchmark_entry(benchmark, "aggregate", value, repetitions, repetitions, aggregate_name=aggregate))
+    if json_format:
+        print(json.dumps({"context": {"executable": "iree-benchmark-module (fake)", "num_cpus": 1}, "benchmarks": entries}, indent=2))
+        return 0
+    for entry in entries:
+        if entry.get("aggregate_name") == "cv":
+            print(_benchmark_line(entry["name"], entry["real_time"] * 100, entry["iterations"], unit="%"))
+        else:
+            print(_benchmark_line(entry["name"], entry["real_time"], entry["iterations"]))
+    return 0
+
+
+FAKE_TOOLS = {
+    "iree-compile": fake_iree_compile,
+    "iree-benchmark-module": fake_iree_benchmark_module,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in FAKE_TOOLS:
+        sys.exit(f"usage: {sys.argv[0]} {{{','.join(FAKE_TOOLS)}}} <args>")
+    sys.exit(FAKE_TOOLS[sys.argv[1]](sys.argv[2:]))
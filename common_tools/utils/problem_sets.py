@@ -0,0 +1,156 @@
+import argparse
+import re
+import json
+import itertools
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, Sequence
+
+PROBLEM_SET_SUFFIXES = (".json", ".toml", ".yaml", ".yml")
+
+# Keys of a problem entry that are not expanded into configs.
+_ENTRY_KEYS = ("tag", "description", "columns", "shapes")
+
+
+@dataclass
+class ProblemSelection:
+    """Selectors applied to the problems of a suite before any kernel is generated.
+
+    `tags` and `dtypes` are matched exactly, the latter against every field
+    of a problem ending in `dtype`. `shape_regex` is searched for in the
+    kernel name, and `limit` keeps the first kernels that match the rest.
+    """
+
+    tags: Optional[list[str]] = None
+    dtypes: Optional[list[str]] = None
+    shape_regex: Optional[str] = None
+    limit: Optional[int] = None
+
+    def matches(self, fields: dict) -> bool:
+        if self.tags and fields["tag"] not in self.tags:
+            return False
+        if self.dtypes and not any(
+            value in self.dtypes for key, value in fields.items() if key.endswith("dtype")
+        ):
+            return False
+        return True
+
+
+def get_problem_set_names(problem_dir: Path) -> list[str]:
+    """Names of the problem sets of a suite, i.e. the stems of its problem files."""
+    return sorted(path.stem for path in problem_dir.iterdir() if path.suffix in PROBLEM_SET_SUFFIXES)
+
+
+def find_problem_set(name: str, problem_dir: Path) -> Path:
+    """The file of a problem set, given by its name in `problem_dir` or by its path."""
+    path = Path(name)
+    if path.suffix in PROBLEM_SET_SUFFIXES and path.exists():
+        return path
+    for suffix in PROBLEM_SET_SUFFIXES:
+        path = problem_dir / (name + suffix)
+        if path.exists():
+            return path
+    raise ValueError(
+        f"Unknown problem set {name}; pass a file or one of {', '.join(get_problem_set_names(problem_dir))}"
+    )
+
+
+def load_problem_set(path: Path, suite: str) -> dict:
+    """Read a JSON, TOML or YAML problem file, checking that it belongs to `suite`."""
+    if path.suffix == ".json":
+        with open(path) as f:
+            problem_set = json.load(f)
+    elif path.suffix == ".toml":
+        import tomllib
+
+        with open(path, "rb") as f:
+            problem_set = tomllib.load(f)
+    else:
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"Reading {path} requires PyYAML (pip install pyyaml)")
+        with open(path) as f:
+            problem_set = yaml.safe_load(f)
+    if problem_set.get("suite") != suite:
+        raise ValueError(f"{path} holds {problem_set.get('suite')} problems, not {suite} problems")
+    return problem_set
+
+
+def iter_problems(problem_set: dict, path: Path) -> Iterator[dict]:
+    """Expand the entries of a problem set into the fields of every kernel.
+
+    Every entry has a `tag`, the names of its shape `columns` and a list of
+    `shapes`. Its other keys are fields of all of its kernels; a list
+    value is expanded into one kernel per item. Kernels are yielded in file
+    order, with the fields expanded in the order of their keys and the
+    shapes innermost.
+    """
+    for entry in problem_set["problems"]:
+        columns = entry["columns"]
+        parameters = {key: value for key, value in entry.items() if key not in _ENTRY_KEYS}
+        values = [value if isinstance(value, list) else [value] for value in parameters.values()]
+        for combination in itertools.product(*values):
+            fields = {"tag": entry["tag"], **dict(zip(parameters, combination))}
+            for shape in entry["shapes"]:
+                if len(shape) != len(columns):
+                    raise ValueError(f"{path}: {entry['tag']}: shape {shape} does not match the columns {columns}")
+                yield {**fields, **dict(zip(columns, shape))}
+
+
+def iter_problem_configs(
+    problem_dir: Path,
+    problem_sets: Sequence[str],
+    suite: str,
+    make_config: Callable[[dict], Any],
+    selection: Optional[ProblemSelection] = None,
+) -> Iterator[tuple[str, Any]]:
+    """Lazily yield the `(tag, config)` pairs of the problem sets of a suite that match `selection`.
+
+    `make_config` turns the fields of a kernel (see `iter_problems`) into a
+    config of the suite.
+    """
+    selection = selection or ProblemSelection()
+    shape_regex = re.compile(selection.shape_regex) if selection.shape_regex else None
+    count = 0
+    for name in problem_sets:
+        path = find_problem_set(name, problem_dir)
+        for fields in iter_problems(load_problem_set(path, suite), path):
+            if selection.limit is not None and count >= selection.limit:
+                return
+            if not selection.matches(fields):
+                continue
+            config = make_config(fields)
+            if shape_regex and not shape_regex.search(config.get_name()):
+                continue
+            count += 1
+            yield fields["tag"], config
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the problem set and selector options to `parser`."""
+    group = parser.add_argument_group("kernel selection")
+    group.add_argument(
+        "--problems",
+        help="Comma separated problem sets to run: names of files in the problem_sets directory of the suite "
+        "(e.g. gemm_extra) or paths to JSON, TOML or YAML problem files (default: the default set of the suite)",
+        default=None,
+    )
+    group.add_argument("--tag", help="Only run kernels of these comma separated tags", default=None)
+    group.add_argument("--shape-regex", help="Only run kernels whose name matches this regular expression", default=None)
+    group.add_argument(
+        "--limit", help="Only run the first N kernels of every suite that match the other selectors", type=int, default=None
+    )
+    group.add_argument(
+        "--dtype",
+        help="Only run kernels of these comma separated dtypes; with --roofline, plot only this dtype",
+        default=None,
+    )
+
+
+def check_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    if args.shape_regex:
+        try:
+            re.compile(args.shape_regex)
+        except re.error as e:
+            parser.error(f"invalid --shape-regex: {e}")
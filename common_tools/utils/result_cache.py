@@ -0,0 +1,124 @@
+import argparse
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Sequence
+
+DEFAULT_RESULT_MAX_AGE_HOURS = 24.0
+
+
+def hash_file(path: Path | str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ResultCache:
+    """JSON lines store of benchmark measurements for reuse across runs.
+
+    A measurement is keyed on the vmfb contents together with the benchmark
+    command line (which carries the device and benchmark flags), ignoring the
+    path the vmfb happens to live at. Entries older than `max_age_hours` are
+    treated as misses and get overwritten by the next measurement.
+
+    Every measurement is appended to the file as one line, so storing costs
+    the same no matter how large the cache is, and a crash can at most cut
+    off the line being written. Lines superseded by later ones for the same
+    key, and cut off lines, are dropped when the cache is loaded.
+    """
+
+    def __init__(self, path: Path | str, max_age_hours: float = DEFAULT_RESULT_MAX_AGE_HOURS):
+        self.path = Path(path)
+        self.max_age_seconds = max_age_hours * 3600
+        self.entries = {}
+        # Benchmarks of several devices store results concurrently.
+        self.lock = threading.Lock()
+        if self.path.exists():
+            self.load()
+
+    def load(self):
+        line_count = 0
+        # Appending to a file without a final newline would join two lines.
+        complete = True
+        with open(self.path) as f:
+            for line in f:
+                complete = line.endswith("\n")
+                if not line.strip():
+                    continue
+                line_count += 1
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.getLogger().warning(f"Skipping a truncated entry of {self.path}")
+                    continue
+                if "key" in entry:
+                    self.entries[entry["key"]] = {"timestamp": entry["timestamp"], "value": entry["value"]}
+                else:
+                    # Caches of earlier versions were one JSON object of all entries.
+                    self.entries.update(entry)
+                    complete = False
+        if not complete or line_count != len(self.entries):
+            self.compact()
+
+    def get_key(self, vmfb: Path | str | bytes, benchmark_args: Sequence[str]) -> str:
+        """Key of a measurement of `vmfb`, given as file or, with `--in-memory`, as its contents."""
+        flags = [arg for arg in benchmark_args if not arg.startswith("--module=")]
+        vmfb_hash = hashlib.sha256(vmfb).hexdigest() if isinstance(vmfb, bytes) else hash_file(vmfb)
+        hasher = hashlib.sha256()
+        for part in [vmfb_hash, *flags]:
+            hasher.update(part.encode())
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    def lookup(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None or time.time() - entry["timestamp"] > self.max_age_seconds:
+            return None
+        logging.getLogger().info(f"Reusing benchmark result {key} from {self.path}")
+        return entry["value"]
+
+    def store(self, key: str, value):
+        entry = {"timestamp": time.time(), "value": value}
+        with self.lock:
+            self.entries[key] = entry
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"key": key, **entry}) + "\n")
+
+    def compact(self):
+        """Rewrite the file with one line per key, replacing it atomically."""
+        with self.lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp_path, "w") as f:
+                for key, entry in self.entries.items():
+                    f.write(json.dumps({"key": key, **entry}) + "\n")
+            os.replace(tmp_path, self.path)
+
+
+def get_result_cache(path: Optional[str], max_age_hours: float = DEFAULT_RESULT_MAX_AGE_HOURS) -> Optional[ResultCache]:
+    if path is None:
+        return None
+    return ResultCache(path, max_age_hours)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the options of the result cache to `parser`."""
+    group = parser.add_argument_group("result cache")
+    group.add_argument(
+        "--result-cache",
+        help="JSON lines file of earlier measurements to reuse for unchanged kernels. Disabled when unset.",
+        default=None,
+    )
+    group.add_argument(
+        "--result-max-age",
+        help="Only reuse measurements taken within this many hours",
+        type=float,
+        default=DEFAULT_RESULT_MAX_AGE_HOURS,
+    )
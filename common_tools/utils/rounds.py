@@ -0,0 +1,289 @@
+import argparse
+import csv
+import math
+import os
+import random
+import statistics
+from collections import namedtuple
+from typing import Any, Callable, Hashable, Iterable, Iterator, Sequence
+from tqdm import tqdm
+
+from .adaptive import get_relative_ci_width
+from .batching import KernelBatch
+from .bench_utils import LATENCY_HISTOGRAM_BINS, BenchmarkStats
+
+# Effects whose t statistic reaches this are reported as detected.
+DRIFT_T_THRESHOLD = 3.0
+
+# Leading columns of the `<output>_rounds.csv` file, followed by the result
+# columns of the suite.
+ROUND_FIELDNAMES = ["seed", "round", "position"]
+
+# `order_effect` is the relative change of the kernel times from the first
+# to the last position of a round, `round_drift` their relative change from
+# one round to the next, each with its t statistic; `round_ratios` are the
+# median times of every round relative to the combined kernel times.
+DriftReport = namedtuple("DriftReport", "order_effect order_t round_drift round_t round_ratios")
+
+
+def get_round_orders(count: int, rounds: int, seed: int) -> list[list[int]]:
+    """Orders of `count` jobs in every round, each shuffled anew from `seed`."""
+    rng = random.Random(seed)
+    orders = []
+    for _ in range(rounds):
+        order = list(range(count))
+        rng.shuffle(order)
+        orders.append(order)
+    return orders
+
+
+def get_row_stats(row: Sequence, fieldnames: Sequence[str]) -> BenchmarkStats:
+    """The `BenchmarkStats` of a successful result row, given without its index, from its columns."""
+    values = dict(zip(fieldnames[1:], row))
+    median_ci = values["median_ci_percent"]
+    return BenchmarkStats(
+        mean_ms=values["mean_microseconds"] / 1000,
+        median_ms=values["median_microseconds"] / 1000,
+        stddev_ms=values["stddev_microseconds"] / 1000,
+        cv=values["cv_percent"] / 100,
+        min_ms=values["min_microseconds"] / 1000,
+        repetitions=values["repetitions"],
+        median_ci=median_ci / 100 if median_ci is not None else None,
+        p90_ms=values["p90_microseconds"] / 1000,
+        p99_ms=values["p99_microseconds"] / 1000,
+        max_ms=values["max_microseconds"] / 1000,
+        histogram=tuple(int(count) for count in values["latency_histogram"].split()),
+    )
+
+
+def _combine_histograms(stats: Sequence[BenchmarkStats], low: float, high: float) -> tuple[int, ...]:
+    # The samples of every round are placed at the centers of its bins.
+    counts = [0] * LATENCY_HISTOGRAM_BINS
+    for round_stats in stats:
+        width = (round_stats.max_ms - round_stats.min_ms) / len(round_stats.histogram)
+        for i, count in enumerate(round_stats.histogram):
+            center = round_stats.min_ms + (i + 0.5) * width
+            index = int((center - low) / (high - low) * LATENCY_HISTOGRAM_BINS) if high > low else 0
+            counts[min(index, LATENCY_HISTOGRAM_BINS - 1)] += count
+    return tuple(counts)
+
+
+def combine_round_stats(stats: Sequence[BenchmarkStats]) -> BenchmarkStats:
+    """Statistics of a kernel over the `stats` of all its rounds.
+
+    The mean, standard deviation, minimum and maximum are those of all
+    samples together. The median and percentiles are the medians of the
+    rounds' values, so a round disturbed by drift does not shift them, and
+    the CI of the median is bootstrapped from the round medians.
+    """
+    repetitions = sum(s.repetitions for s in stats)
+    mean = sum(s.mean_ms * s.repetitions for s in stats) / repetitions
+    squares = sum((s.repetitions - 1) * s.stddev_ms**2 + s.repetitions * (s.mean_ms - mean) ** 2 for s in stats)
+    stddev = math.sqrt(squares / (repetitions - 1)) if repetitions > 1 else 0.0
+    medians = [s.median_ms for s in stats]
+    low, high = min(s.min_ms for s in stats), max(s.max_ms for s in stats)
+    return BenchmarkStats(
+        mean_ms=mean,
+        median_ms=statistics.median(medians),
+        stddev_ms=stddev,
+        cv=stddev / mean if mean else 0.0,
+        min_ms=low,
+        repetitions=repetitions,
+        median_ci=get_relative_ci_width(medians),
+        p90_ms=statistics.median(s.p90_ms for s in stats),
+        p99_ms=statistics.median(s.p99_ms for s in stats),
+        max_ms=high,
+        histogram=_combine_histograms(stats, low, high),
+    )
+
+
+def combine_round_rows(
+    rows: Sequence[Sequence], fieldnames: Sequence[str], row_fn: Callable, tag: str, config
+) -> tuple:
+    """One result row of a kernel from its rows of every round, rebuilt by the suite's `row_fn`.
+
+    Rounds in which the kernel failed are left out; a kernel that failed in
+    every round keeps its last failed row.
+    """
+    ok_pos = fieldnames.index("ok") - 1
+    ok_rows = [row for row in rows if row[ok_pos]]
+    if not ok_rows:
+        return tuple(rows[-1])
+    stats = combine_round_stats([get_row_stats(row, fieldnames) for row in ok_rows])
+    device = ok_rows[-1][fieldnames.index("device") - 1]
+    return row_fn(device, tag, config, True, stats, False)
+
+
+def _regress(xs: Sequence[float], ys: Sequence[float]) -> tuple[float, float]:
+    # Least squares slope of ys over xs and the t statistic of its correlation.
+    if len(xs) < 3 or len(set(xs)) < 2:
+        return 0.0, 0.0
+    mean_x, mean_y = statistics.mean(xs), statistics.mean(ys)
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    syy = sum((y - mean_y) ** 2 for y in ys)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    if not syy:
+        return 0.0, 0.0
+    r = sxy / math.sqrt(sxx * syy)
+    t = r * math.sqrt((len(xs) - 2) / (1 - r * r)) if abs(r) < 1 else math.copysign(math.inf, r)
+    return sxy / sxx, t
+
+
+def detect_drift(
+    times: Sequence[tuple[int, int, Hashable, float]], combined: dict[Hashable, float], rounds: int
+) -> DriftReport:
+    """Order and drift effects in the `(round, position, kernel, mean)` times of a multi-round run.
+
+    `combined` holds the mean time of every kernel over all rounds. Every
+    time is taken relative to it, which cancels the differences between
+    kernels, and since the order is shuffled every round, positions and
+    rounds are independent of the kernels. The relative times are then
+    regressed on the position within a round, scaled to 0 for the first and
+    1 for the last job, and on the round.
+    """
+    count = max((position for _, position, _, _ in times), default=0)
+    positions, round_indices, ratios = [], [], []
+    for round_index, position, kernel, mean in times:
+        if combined.get(kernel):
+            positions.append(position / count if count else 0.0)
+            round_indices.append(round_index)
+            ratios.append(mean / combined[kernel])
+    order_effect, order_t = _regress(positions, ratios)
+    round_drift, round_t = _regress(round_indices, ratios)
+    round_ratios = []
+    for round_index in range(rounds):
+        round_values = [ratio for index, ratio in zip(round_indices, ratios) if index == round_index]
+        round_ratios.append(statistics.median(round_values) if round_values else None)
+    return DriftReport(order_effect, order_t, round_drift, round_t, round_ratios)
+
+
+def format_drift_report(report: DriftReport) -> str:
+    """Summary of a `DriftReport` for the end of a run."""
+
+    def effect(value, t):
+        detected = "detected" if abs(t) >= DRIFT_T_THRESHOLD else "not significant"
+        return f"{value * 100:+.2f}% (t={t:.1f}, {detected})"
+
+    rounds = ", ".join(
+        f"{ratio * 100 - 100:+.2f}%" if ratio is not None else "failed" for ratio in report.round_ratios
+    )
+    return (
+        f"order effect from the first to the last kernel of a round {effect(report.order_effect, report.order_t)}; "
+        f"drift per round {effect(report.round_drift, report.round_t)}; median time per round: {rounds}"
+    )
+
+
+def write_round_rows(filename: str, fieldnames: Sequence[str], rows: Sequence[tuple]):
+    """Write the result rows of every round, each prefixed with the `ROUND_FIELDNAMES`."""
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([*ROUND_FIELDNAMES, *fieldnames[1:]])
+        writer.writerows(rows)
+
+
+def _run_round_benchmark(device: str, job_index: int, suite_name: str, tag, config, fn: Callable, *args):
+    return job_index, suite_name, fn(device, *args)
+
+
+def run_rounds(
+    jobs: Iterable[tuple],
+    suites: dict[str, Any],
+    output_files: dict[str, str],
+    run_benchmarks: Callable,
+    get_failed_result: Callable,
+    rounds: int,
+    seed: int,
+) -> Iterator[tuple[str, Any]]:
+    """Benchmark `jobs` in `rounds` rounds shuffled from `seed`; yields the `(suite_name, result)` of every job.
+
+    `jobs` are the `(suite_name, tag, config, fn, fn_args)` benchmark jobs of
+    kernels or `KernelBatch`es of the `BenchmarkSuite`s in `suites`, by name.
+    `run_benchmarks(fn, jobs, get_failed_result)` runs one round, e.g. on a
+    `BenchmarkScheduler`, and `get_failed_result(suite_name, tag, config, fn,
+    *fn_args)` gives the result of a job that failed on a remote worker. The
+    rounds of every kernel are combined by `combine_round_rows`, their rows
+    are written to `<output>_rounds.csv` next to the `output_files` of the
+    suites, and the drift between rounds is printed.
+    """
+    # Every round needs all kernels compiled to shuffle them.
+    jobs = list(jobs)
+    print(f"Benchmarking {len(jobs)} jobs in {rounds} rounds shuffled with --seed {seed}")
+    results = [[] for _ in jobs]
+    round_rows = {suite_name: [] for suite_name in suites}
+    times = []
+    for round_index, order in enumerate(get_round_orders(len(jobs), rounds, seed)):
+        positions = {job_index: position for position, job_index in enumerate(order)}
+        round_jobs = []
+        for job_index in order:
+            suite_name, tag, config, fn, fn_args = jobs[job_index]
+            round_jobs.append((config.get_name(), (job_index, suite_name, tag, config, fn, *fn_args)))
+        progress = tqdm(total=len(jobs), unit="job", desc=f"Round {round_index + 1}/{rounds}")
+        round_results = []
+        get_failed_round = lambda job_args: (job_args[0], *get_failed_result(*job_args[1:]))
+        for round_result in run_benchmarks(_run_round_benchmark, round_jobs, get_failed_round):
+            round_results.append(round_result)
+            progress.update()
+        progress.close()
+        # Sorted by job, so every job has its rounds in order.
+        round_results.sort(key=lambda round_result: round_result[0])
+        for job_index, suite_name, result in round_results:
+            results[job_index].append(result)
+            fieldnames = suites[suite_name].fieldnames
+            # Batched kernels come back as a list of rows.
+            for kernel_index, row in enumerate(result if isinstance(result, list) else [result]):
+                round_rows[suite_name].append((seed, round_index, positions[job_index], *row))
+                if row[fieldnames.index("ok") - 1]:
+                    mean = row[fieldnames.index("mean_microseconds") - 1]
+                    times.append((round_index, positions[job_index], (job_index, kernel_index), mean))
+
+    combined = {}
+    for job_index, (suite_name, tag, config, _, _) in enumerate(jobs):
+        suite = suites[suite_name]
+        kernels = config.kernels if isinstance(config, KernelBatch) else [(tag, config)]
+        rows = []
+        for kernel_index, (kernel_tag, kernel_config) in enumerate(kernels):
+            kernel_rows = [
+                result[kernel_index] if isinstance(result, list) else result for result in results[job_index]
+            ]
+            row = combine_round_rows(
+                kernel_rows, suite.fieldnames, suite.get_row_function(), kernel_tag, kernel_config
+            )
+            if row[suite.fieldnames.index("ok") - 1]:
+                combined[(job_index, kernel_index)] = row[suite.fieldnames.index("mean_microseconds") - 1]
+            rows.append(row)
+        yield suite_name, rows if isinstance(config, KernelBatch) else rows[0]
+
+    for suite_name, suite in suites.items():
+        root, _ = os.path.splitext(output_files[suite_name])
+        write_round_rows(f"{root}_rounds.csv", suite.fieldnames, round_rows[suite_name])
+    print(f"Rounds: {format_drift_report(detect_drift(times, combined, rounds))}")
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the options of multi-round runs to `parser`."""
+    group = parser.add_argument_group("rounds")
+    group.add_argument(
+        "--rounds",
+        help="Benchmark every kernel in this many rounds, each in a new random order, and combine its rounds "
+        "into one row. The rows of every round go to <output>_rounds.csv, and order and drift effects are reported",
+        type=int,
+        default=1,
+    )
+    group.add_argument(
+        "--seed",
+        help="Seed of the --rounds orders, to repeat the orders of an earlier run (default: random, printed)",
+        type=int,
+        default=None,
+    )
+
+
+def check_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Also draws the `--seed` of a run that did not set one."""
+    if args.rounds < 1:
+        parser.error("--rounds must be at least 1")
+    if args.rounds > 1 and args.target_profile == "cpu" and not args.compile_only:
+        parser.error("--rounds cannot combine the thread sweeps of --target-profile cpu")
+    if args.rounds > 1 and args.result_cache:
+        parser.error("--rounds measures every kernel in every round; it cannot reuse results from --result-cache")
+    if args.seed is None:
+        args.seed = random.randrange(1 << 32)
@@ -0,0 +1,78 @@
+"""Run several benchmark suites in one process.
+
+    python -m utils.run gemm,attention,conv [flags]
+
+All suites share one compile pool and one benchmark scheduler, and their
+kernels are interleaved so neither the CPUs nor the devices idle between
+suites. Flags are those of the individual suite drivers; each suite writes
+to its default output file. Remote workers are started the same way, e.g.
+`python -m utils.run gemm,conv --queue-dir /shared/queue --worker compile`.
+Unless `utils` is installed in editable mode, run it from the root of the
+repository or pass that as `--repo-root`.
+"""
+
+import sys
+import argparse
+import importlib.util
+from pathlib import Path
+from typing import Optional
+from .suite import BenchmarkSuite, run_suites
+
+# Driver scripts of the suites, relative to the root of the repository.
+SUITE_SCRIPTS = {
+    "gemm": Path("gemmbench") / "gemm_bench.py",
+    "attention": Path("attentionbench") / "attention_bench.py",
+    "conv": Path("convbench") / "shark_conv.py",
+}
+
+
+def find_repo_root() -> Path:
+    """The checkout holding the suite drivers.
+
+    That is the checkout `utils` was installed from in editable mode (or is
+    imported from through `PYTHONPATH`), else the current directory.
+    """
+    for root in (Path(__file__).resolve().parent.parent.parent, Path.cwd()):
+        if all((root / script).exists() for script in SUITE_SCRIPTS.values()):
+            return root
+    raise ValueError("Cannot find the suite drivers; run from the root of the repository or pass --repo-root")
+
+
+def load_suite(name: str, repo_root: Optional[Path] = None) -> type[BenchmarkSuite]:
+    """Import the driver script of suite `name` in `repo_root` (see `find_repo_root`) and return its suite class."""
+    script = (repo_root or find_repo_root()) / SUITE_SCRIPTS[name]
+    if not script.exists():
+        raise ValueError(f"{script} does not exist; pass the root of the repository as --repo-root")
+    # Every suite directory has its own `problems` module; make sure the driver
+    # imports the one next to it rather than the one of a previous suite.
+    sys.modules.pop("problems", None)
+    sys.path.insert(0, str(script.parent))
+    try:
+        spec = importlib.util.spec_from_file_location(script.stem, script)
+        module = importlib.util.module_from_spec(spec)
+        # Registered under its own name so compile and benchmark functions can
+        # be pickled by reference for the pool and remote workers.
+        sys.modules[script.stem] = module
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(str(script.parent))
+    for value in vars(module).values():
+        if isinstance(value, type) and issubclass(value, BenchmarkSuite) and value.name == name:
+            return value
+    raise ValueError(f"{script} does not define a benchmark suite named {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("suites", help=f"Comma separated suites to run: {','.join(SUITE_SCRIPTS)}")
+    parser.add_argument("--repo-root", help="Root of the repository holding the suite drivers", type=Path, default=None)
+    args, argv = parser.parse_known_args()
+    names = args.suites.split(",")
+    unknown = [name for name in names if name not in SUITE_SCRIPTS]
+    if unknown:
+        parser.error(f"Unknown suites {','.join(unknown)}; choose from {','.join(SUITE_SCRIPTS)}")
+    try:
+        suites = [load_suite(name, args.repo_root) for name in names]
+    except ValueError as e:
+        parser.error(str(e))
+    run_suites(suites, argv, prog=f"python -m utils.run {args.suites}")
@@ -0,0 +1,184 @@
+import argparse
+import time
+import logging
+import threading
+from typing import Optional, Sequence
+
+BENCHMARK_BACKENDS = ["subprocess", "inprocess"]
+DEFAULT_BENCHMARK_BACKEND = "subprocess"
+
+# iree-benchmark-module's defaults, used when the flags are not given.
+DEFAULT_BENCHMARK_REPETITIONS = 1
+DEFAULT_BENCHMARK_MIN_TIME = "0.5"
+
+# Element types of the `--input=<dims>x<type>` flags.
+_ELEMENT_TYPE_NAMES = {
+    "f16": "FLOAT_16",
+    "f32": "FLOAT_32",
+    "f64": "FLOAT_64",
+    "bf16": "BFLOAT_16",
+    "f8E4M3FN": "FLOAT_8_E4M3_FN",
+    "f8E4M3FNUZ": "FLOAT_8_E4M3_FNUZ",
+    "f8E5M2": "FLOAT_8_E5M2",
+    "f8E5M2FNUZ": "FLOAT_8_E5M2_FNUZ",
+    "i8": "INT_8",
+    "i16": "INT_16",
+    "i32": "INT_32",
+    "i64": "INT_64",
+    "si8": "SINT_8",
+    "si16": "SINT_16",
+    "si32": "SINT_32",
+    "si64": "SINT_64",
+    "ui8": "UINT_8",
+    "ui16": "UINT_16",
+    "ui32": "UINT_32",
+    "ui64": "UINT_64",
+}
+
+# The VM instance and, per device URI, the device and its HAL module. They
+# live as long as the process, so the driver, the device and its caching
+# allocator are set up once rather than for every kernel.
+_instance = None
+_devices = {}
+_devices_lock = threading.Lock()
+# The `--task_*` flags of the local-task executor. They are process wide and
+# read when the driver is created, so they are set once, before any device.
+_task_flags = None
+
+
+def check_benchmark_backend(backend: str):
+    """Fail early if `backend` cannot be used here."""
+    if backend == "inprocess":
+        try:
+            import iree.runtime
+        except ImportError as e:
+            raise RuntimeError("The inprocess benchmark backend requires the iree-base-runtime package") from e
+
+
+def _get_device(device_uri: str, allocators: Sequence[str], task_flags: Sequence[str] = ()):
+    """Return the VM instance, and the device and HAL module of `device_uri`."""
+    import iree.runtime as rt
+
+    global _instance, _task_flags
+    with _devices_lock:
+        if _task_flags is None:
+            _task_flags = tuple(task_flags)
+            if task_flags:
+                rt.flags.parse_flags(*task_flags)
+        elif tuple(task_flags) != _task_flags:
+            raise ValueError(
+                f"In-process devices already use {' '.join(_task_flags) or 'the default task flags'}; "
+                f"{' '.join(task_flags) or 'the default task flags'} need a new process"
+            )
+        if _instance is None:
+            _instance = rt.VmInstance()
+        key = (device_uri, tuple(allocators))
+        if key not in _devices:
+            device = rt.get_driver(device_uri).create_device_by_uri(device_uri, allocators=list(allocators) or None)
+            _devices[key] = device, rt.create_hal_module(_instance, device)
+        return (_instance, *_devices[key])
+
+
+def _allocate_input(device, spec: str):
+    """Allocate a zero filled buffer view for an `--input=<dims>x<type>` flag."""
+    import iree.runtime as rt
+
+    if "=" in spec:
+        raise ValueError(f"Input values are not supported in-process: {spec}")
+    *dims, type_name = spec.split("x")
+    if type_name not in _ELEMENT_TYPE_NAMES:
+        raise ValueError(f"Unsupported input element type {type_name} in {spec}")
+    element_type = getattr(rt.HalElementType, _ELEMENT_TYPE_NAMES[type_name])
+    shape = [int(dim) for dim in dims]
+    # The low byte of an element type is its bit width.
+    byte_length = (int(element_type) & 0xFF) // 8
+    for dim in shape:
+        byte_length *= dim
+    buffer = device.allocator.allocate_buffer(rt.MemoryType.DEVICE_LOCAL, rt.BufferUsage.DEFAULT, byte_length)
+    buffer.fill_zero(0, byte_length)
+    return rt.HalBufferView(buffer, shape, element_type)
+
+
+def benchmark_in_process(
+    exec_args: Sequence[str], timeout: Optional[float] = None, module_data: Optional[bytes] = None
+) -> list[float]:
+    """Time a module through iree.runtime; returns the time per invocation of every repetition in ms.
+
+    Takes the command line of iree-benchmark-module (`--device`,
+    `--device_allocator`, `--module`, `--function`, `--input`,
+    `--benchmark_repetitions`, `--benchmark_min_time` and the `--task_*`
+    flags, which must be the same for every call) and mirrors its
+    measurement: every repetition invokes the function until
+    `--benchmark_min_time` seconds have passed, or as often as a `Nx` value
+    says, and its time is the mean over these invocations. The device stays alive between kernels and the
+    inputs are allocated once per kernel. Exported functions are synchronous,
+    so an invocation returns once the device finished the kernel. A hung
+    invocation cannot be interrupted; `timeout` only stops further
+    invocations. With `module_data`, the module is loaded from it instead of
+    the `--module` file.
+    """
+    import iree.runtime as rt
+
+    flags = {}
+    inputs = []
+    task_flags = []
+    for arg in exec_args[1:]:
+        name, _, value = arg.partition("=")
+        if name == "--input":
+            inputs.append(value)
+        elif name.startswith("--task_"):
+            task_flags.append(arg)
+        else:
+            flags[name] = value
+    allocators = [flags["--device_allocator"]] if "--device_allocator" in flags else []
+    repetitions = int(flags.get("--benchmark_repetitions", DEFAULT_BENCHMARK_REPETITIONS))
+    min_time = flags.get("--benchmark_min_time", DEFAULT_BENCHMARK_MIN_TIME)
+    # A minimum time like `10x` is a fixed number of invocations instead.
+    min_iterations = int(min_time[:-1]) if min_time.endswith("x") else None
+    min_time = 0.0 if min_iterations else float(min_time.rstrip("s"))
+
+    instance, device, hal_module = _get_device(flags["--device"], allocators, task_flags)
+    if module_data is not None:
+        module = rt.VmModule.copy_buffer(instance, module_data)
+    else:
+        module = rt.VmModule.mmap(instance, flags["--module"])
+    context = rt.VmContext(instance, [hal_module, module])
+    function = module.lookup_function(flags.get("--function", "main"))
+    if function is None:
+        raise ValueError(f"{flags['--module']} has no function {flags.get('--function', 'main')}")
+    arg_list = rt.VmVariantList(len(inputs))
+    for spec in inputs:
+        arg_list.push_ref(_allocate_input(device, spec))
+
+    # The first invocation also loads the executables of the module.
+    context.invoke(function, arg_list, rt.VmVariantList(1))
+
+    start = time.perf_counter()
+    repetition_times = []
+    for _ in range(repetitions):
+        iterations = 0
+        repetition_start = time.perf_counter()
+        while True:
+            context.invoke(function, arg_list, rt.VmVariantList(1))
+            iterations += 1
+            elapsed = time.perf_counter() - repetition_start
+            if elapsed >= min_time and iterations >= (min_iterations or 1):
+                break
+        repetition_times.append(elapsed / iterations)
+        if timeout is not None and time.perf_counter() - start > timeout:
+            raise TimeoutError(f"Benchmark timed out after {timeout} seconds: {flags['--module']}")
+    repetition_times_ms = [repetition_time * 1000 for repetition_time in repetition_times]
+    logging.getLogger().info(f"{flags['--module']}: {repetition_times_ms} ms per repetition")
+    return repetition_times_ms
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the option of the benchmark backend to `parser`."""
+    group = parser.add_argument_group("benchmark backend")
+    group.add_argument(
+        "--benchmark-backend",
+        help="Benchmark through iree-benchmark-module subprocesses, or in-process through iree.runtime with one "
+        "device kept alive per --devices entry (--benchmark-timeout cannot interrupt a running kernel in-process)",
+        choices=BENCHMARK_BACKENDS,
+        default=DEFAULT_BENCHMARK_BACKEND,
+    )
@@ -0,0 +1,256 @@
+import argparse
+import csv
+import zlib
+from collections import deque
+from typing import Any, Iterable, Optional, Sequence
+
+from .bench_utils import read_results
+from .scheduler import CompileScheduler
+
+# Assumptions of the analytic cost model for kernels without any history.
+DEFAULT_COMPILE_SECONDS = 20.0
+# Start up of iree-benchmark-module, including device and module setup.
+BENCHMARK_STARTUP_SECONDS = 1.0
+# Every repetition runs for at least `--benchmark_min_time`.
+BENCHMARK_MIN_TIME_SECONDS = 0.5
+BENCHMARK_REPETITIONS = 3
+# Throughput assumed for kernels that were never benchmarked.
+DEFAULT_DEVICE_FLOPS = 100e12
+DEFAULT_CPU_FLOPS = 1e12
+
+SKIPPED_FIELDNAMES = ["tag", "name", "stratum", "predicted_compile_seconds", "predicted_benchmark_seconds"]
+
+_DURATION_SUFFIXES = {"s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(duration: str | float) -> float:
+    """Parse a duration such as `90s`, `20m` or `1.5h` into seconds; plain numbers are seconds."""
+    if isinstance(duration, (int, float)):
+        return float(duration)
+    duration = duration.strip().lower()
+    suffix = duration[-1] if duration and duration[-1] in _DURATION_SUFFIXES else "s"
+    number = duration.removesuffix(suffix)
+    return float(number) * _DURATION_SUFFIXES[suffix]
+
+
+def read_benchmark_history(filename: str) -> dict[str, float]:
+    """Mean microseconds of every kernel that succeeded in an earlier result file."""
+    history = {}
+    for row in read_results(filename):
+        if str(row.get("ok")) == "True" and row.get("mean_microseconds") not in (None, ""):
+            history[row["name"]] = float(row["mean_microseconds"])
+    return history
+
+
+class KernelCostModel:
+    """Predicts the compile and benchmark seconds of kernels.
+
+    Compile times come from the compile history of a `CompileScheduler`, if
+    given, and kernel times from `benchmark_history` (see
+    `read_benchmark_history`). Kernels missing from both are predicted from
+    their FLOP count with the assumptions above. `runs_per_kernel` counts the benchmark runs of every
+    kernel, e.g. one per thread count of a CPU sweep.
+    """
+
+    def __init__(
+        self,
+        scheduler: Optional[CompileScheduler],
+        benchmark_history: Optional[dict[str, float]] = None,
+        device_flops: float = DEFAULT_DEVICE_FLOPS,
+        runs_per_kernel: int = 1,
+    ):
+        self.scheduler = scheduler
+        self.benchmark_history = benchmark_history or {}
+        self.device_flops = device_flops
+        self.runs_per_kernel = runs_per_kernel
+
+    def predict_compile_seconds(self, job_name: str, flops: float) -> float:
+        if self.scheduler is None:
+            return DEFAULT_COMPILE_SECONDS
+        if job_name in self.scheduler.history or self.scheduler.seconds_per_size is not None:
+            return self.scheduler.predict_cost(job_name, flops)
+        return DEFAULT_COMPILE_SECONDS
+
+    def predict_benchmark_seconds(self, name: str, flops: float) -> float:
+        mean_microseconds = self.benchmark_history.get(name)
+        if mean_microseconds is None:
+            mean_seconds = flops / self.device_flops
+        else:
+            mean_seconds = mean_microseconds / 1e6
+        repetition_seconds = max(BENCHMARK_MIN_TIME_SECONDS, mean_seconds)
+        return self.runs_per_kernel * (BENCHMARK_STARTUP_SECONDS + BENCHMARK_REPETITIONS * repetition_seconds)
+
+
+def select_within_budget(
+    kernels: Sequence[tuple[str, list[tuple], float, float]],
+    budget: float,
+    compile_workers: int = 1,
+    devices: int = 1,
+) -> set[str]:
+    """Names of the kernels to run within `budget` seconds, covering as many strata as possible.
+
+    `kernels` are `(name, strata, compile_seconds, benchmark_seconds)`, where
+    `strata` lists the strata the kernel belongs to, e.g. `(suite, tag,
+    dtype, transposes)` for every tag it is listed under. Compilation and
+    benchmarking run side by side, so a selection fits while its compile
+    time over `compile_workers` and its benchmark time over `devices` both
+    stay within the budget.
+
+    The cheapest kernel of every stratum is picked first, starting with the
+    strata that add the most values not covered yet in any of their
+    dimensions. The remaining budget is then handed out to the strata in
+    turn, one kernel at a time in an order fixed by a hash of its name, so
+    the sample spreads over the shapes of every stratum and stays the same
+    from run to run.
+    """
+    selected = set()
+    compile_total = 0.0
+    benchmark_total = 0.0
+
+    def cost(kernel):
+        return max(kernel[2] / compile_workers, kernel[3] / devices)
+
+    def try_select(kernel):
+        nonlocal compile_total, benchmark_total
+        name, _, compile_seconds, benchmark_seconds = kernel
+        if name in selected:
+            return True
+        if (compile_total + compile_seconds) / compile_workers > budget:
+            return False
+        if (benchmark_total + benchmark_seconds) / devices > budget:
+            return False
+        selected.add(name)
+        compile_total += compile_seconds
+        benchmark_total += benchmark_seconds
+        return True
+
+    by_stratum = {}
+    for kernel in kernels:
+        for stratum in kernel[1]:
+            by_stratum.setdefault(stratum, []).append(kernel)
+
+    def get_values(stratum):
+        # Values are qualified by the suite, the first dimension of a stratum.
+        return {(stratum[0], i, value) for i, value in enumerate(stratum)}
+
+    covered = set()
+    cheapest = {stratum: min(stratum_kernels, key=cost) for stratum, stratum_kernels in by_stratum.items()}
+    remaining = set(by_stratum)
+    while remaining:
+        stratum = max(
+            remaining, key=lambda s: (len(get_values(s) - covered), -cost(cheapest[s]), s)
+        )
+        remaining.remove(stratum)
+        if try_select(cheapest[stratum]):
+            covered |= get_values(stratum)
+
+    queues = {
+        stratum: deque(sorted(stratum_kernels, key=lambda kernel: (zlib.crc32(kernel[0].encode()), kernel[0])))
+        for stratum, stratum_kernels in sorted(by_stratum.items())
+    }
+    while queues:
+        for stratum in list(queues):
+            queue = queues[stratum]
+            while queue and queue[0][0] in selected:
+                queue.popleft()
+            if not queue:
+                del queues[stratum]
+                continue
+            # Kernels that do not fit are dropped; cheaper ones may still fit.
+            try_select(queue.popleft())
+    return selected
+
+
+def write_skipped(filename: str, skipped: Sequence[tuple]):
+    """Write the `SKIPPED_FIELDNAMES` rows of the configs left out of a budgeted run."""
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(SKIPPED_FIELDNAMES)
+        writer.writerows(skipped)
+
+
+def select_budgeted_configs(
+    suites: Sequence,
+    configs: dict[str, Iterable[tuple[str, Any]]],
+    cost_models: dict[str, KernelCostModel],
+    budget: float,
+    compile_workers: int,
+    devices: int,
+    skipped_files: dict[str, str],
+    benchmark: bool = True,
+) -> dict[str, list[tuple[str, Any]]]:
+    """Sample the configs of all `BenchmarkSuite`s that fit in `budget` seconds together.
+
+    The configs left out are written to the `skipped_files` of each suite.
+    Without `benchmark`, only the compile time of the kernels is counted.
+    """
+    configs = {suite.name: list(configs[suite.name]) for suite in suites}
+    kernels = {}
+    for suite in suites:
+        cost_model = cost_models[suite.name]
+        for tag, config in configs[suite.name]:
+            key = f"{suite.name}/{config.get_name()}"
+            stratum = (suite.name, *suite.get_stratum(tag, config))
+            if key in kernels:
+                kernels[key][1].append(stratum)
+                continue
+            flops = config.get_flops()
+            benchmark_seconds = 0.0
+            if benchmark:
+                benchmark_seconds = cost_model.predict_benchmark_seconds(config.get_name(), flops)
+            kernels[key] = (
+                key,
+                [stratum],
+                cost_model.predict_compile_seconds(suite.get_job_name(config), flops),
+                benchmark_seconds,
+            )
+    selected = select_within_budget(list(kernels.values()), budget, compile_workers, devices)
+
+    compile_seconds = sum(kernels[key][2] for key in selected) / compile_workers
+    benchmark_seconds = sum(kernels[key][3] for key in selected) / devices
+    print(
+        f"Budget of {budget / 60:.1f} minutes: running {len(selected)} of {len(kernels)} kernels, "
+        f"predicted to take {max(compile_seconds, benchmark_seconds) / 60:.1f} minutes."
+    )
+    budgeted = {}
+    for suite in suites:
+        budgeted[suite.name] = []
+        skipped = []
+        for tag, config in configs[suite.name]:
+            key = f"{suite.name}/{config.get_name()}"
+            if key in selected:
+                budgeted[suite.name].append((tag, config))
+            else:
+                _, _, compile_seconds, benchmark_seconds = kernels[key]
+                stratum = "/".join(map(str, suite.get_stratum(tag, config)))
+                skipped.append((tag, config.get_name(), stratum, round(compile_seconds, 2), round(benchmark_seconds, 2)))
+        strata = {stratum for key, (_, strata, _, _) in kernels.items() if key.startswith(suite.name + "/") for stratum in strata}
+        covered = {stratum for key, (_, strata, _, _) in kernels.items() if key in selected for stratum in strata}
+        skipped_file = skipped_files[suite.name]
+        write_skipped(skipped_file, skipped)
+        print(
+            f"{suite.name}: Running {len(budgeted[suite.name])} of {len(configs[suite.name])} configs covering "
+            f"{len(covered & strata)} of {len(strata)} strata; skipped configs written to {skipped_file}"
+        )
+    return budgeted
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the option of time-budgeted runs to `parser`."""
+    group = parser.add_argument_group("time budget")
+    group.add_argument(
+        "--budget",
+        help="Only run a sample of the kernels predicted to finish within this time, e.g. 20m or 2h. "
+        "The sample covers every tag, dtype and variant of the suites first; the configs left out are "
+        "listed next to the results in <output>_skipped.csv",
+        default=None,
+    )
+
+
+def check_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Parse `--budget` into seconds."""
+    if args.budget:
+        try:
+            args.budget = parse_duration(args.budget)
+        except ValueError:
+            parser.error(f"invalid --budget: {args.budget}")
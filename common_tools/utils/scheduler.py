@@ -0,0 +1,388 @@
+import argparse
+import os
+import json
+import time
+import queue
+import logging
+import resource
+import threading
+import statistics
+import zlib
+import heapq
+from pathlib import Path
+from multiprocessing.context import ForkContext, ForkProcess
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from . import bench_utils
+from .compile_cache import parse_size
+from .compiler import DEFAULT_COMPILE_BACKEND
+
+DEFAULT_COMPILE_TIMEOUT = 1800.0
+DEFAULT_BENCHMARK_TIMEOUT = 600.0
+
+# Peak RSS assumed for a kernel that has never been compiled before.
+DEFAULT_COMPILE_RSS = 2 << 30
+# Fraction of the currently available memory the compile jobs may use.
+DEFAULT_MEMORY_FRACTION = 0.9
+# Number of upcoming compile jobs that are ordered by predicted cost.
+DEFAULT_LOOKAHEAD = 4096
+# Compiled kernels that may wait for a device before compilation pauses.
+DEFAULT_MAX_QUEUED_PER_DEVICE = 8
+
+
+def get_default_num_workers() -> int:
+    # Leave one core to drive the benchmarks running alongside compilation.
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def get_available_memory() -> int:
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+class _SpawnLockedForkProcess(ForkProcess):
+    @staticmethod
+    def _Popen(process_obj):
+        # See bench_utils.SPAWN_LOCK; benchmarks start subprocesses from
+        # threads of this process while the pool replaces its workers.
+        with bench_utils.SPAWN_LOCK:
+            return ForkProcess._Popen(process_obj)
+
+
+class _SpawnLockedForkContext(ForkContext):
+    Process = _SpawnLockedForkProcess
+
+
+def _run_measured_job(fn, args, in_process):
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    if in_process:
+        # Workers are kept across jobs, so this is the high-water mark of all
+        # compilations of this worker so far: an upper bound for this job.
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    else:
+        # Workers are replaced after every job, so the children of this process
+        # are the compiler invocations of this job only. ru_maxrss is in KiB.
+        peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    return result, elapsed, peak_rss
+
+
+class CompileScheduler:
+    """Runs compile jobs on a process pool bounded by both cores and memory.
+
+    Every job is a `(name, size, args)` tuple: `name` identifies the kernel in
+    the history file, `size` is a relative cost hint (e.g. the FLOP count)
+    used until the kernel has been measured, and `args` are passed to the
+    compile function. Jobs are started longest predicted compile time first
+    among the next `lookahead` jobs, so arbitrarily long job streams are
+    scheduled in bounded memory. A job only starts once its predicted peak
+    RSS fits next to the jobs that are already running. Measured compile
+    time and peak RSS are written back to the history file for the next run.
+
+    With the `inprocess` compile backend, workers are kept for the whole run
+    so they can reuse their compiler sessions, and hung compilations are
+    abandoned by replacing the pool (see `run`). The compile time of every
+    backend is kept in the history, and kernels with a known subprocess time
+    report their speedup over it.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        memory_limit: Optional[str | int] = None,
+        history_path: Optional[Path | str] = None,
+        lookahead: int = DEFAULT_LOOKAHEAD,
+        backend: str = DEFAULT_COMPILE_BACKEND,
+    ):
+        self.max_workers = max_workers or get_default_num_workers()
+        self.lookahead = lookahead
+        self.backend = backend
+        # Speedup over the subprocess backend of every kernel compiled so far.
+        self.speedups = []
+        if memory_limit is None:
+            self.memory_limit = int(get_available_memory() * DEFAULT_MEMORY_FRACTION)
+        else:
+            self.memory_limit = parse_size(memory_limit)
+        self.history_path = Path(history_path) if history_path else None
+        self.history = {}
+        if self.history_path and self.history_path.exists():
+            with open(self.history_path) as f:
+                self.history = json.load(f)
+        # Fallback predictions for kernels missing from the history.
+        self.seconds_per_size = None
+        sized = [entry for entry in self.history.values() if entry.get("size")]
+        if sized:
+            self.seconds_per_size = sum(e["seconds"] for e in sized) / sum(e["size"] for e in sized)
+        self.default_memory = DEFAULT_COMPILE_RSS
+        if self.history:
+            median_rss = statistics.median(entry["peak_rss"] for entry in self.history.values())
+            self.default_memory = max(DEFAULT_COMPILE_RSS, int(median_rss))
+
+    def predict_cost(self, name: str, size: float) -> float:
+        if name in self.history:
+            return self.history[name]["seconds"]
+        if self.seconds_per_size is None:
+            return float(size)
+        return size * self.seconds_per_size
+
+    def predict_memory(self, name: str) -> int:
+        if name in self.history:
+            return self.history[name]["peak_rss"]
+        return self.default_memory
+
+    def order_jobs(self, jobs: Iterable[tuple[str, float, tuple]]) -> Iterator[tuple[str, float, tuple]]:
+        """Yield jobs most expensive first among the next `lookahead` jobs."""
+        window = []
+        for i, job in enumerate(jobs):
+            heapq.heappush(window, (-self.predict_cost(job[0], job[1]), i, job))
+            if len(window) >= self.lookahead:
+                yield heapq.heappop(window)[2]
+        while window:
+            yield heapq.heappop(window)[2]
+
+    def record(self, name: str, size: float, seconds: float, peak_rss: int):
+        backend_seconds = dict(self.history.get(name, {}).get("backend_seconds", {}))
+        baseline = backend_seconds.get(DEFAULT_COMPILE_BACKEND)
+        if self.backend != DEFAULT_COMPILE_BACKEND and baseline and seconds > 0:
+            self.speedups.append(baseline / seconds)
+            logging.getLogger().info(
+                f"Compiled {name} {baseline / seconds:.2f}x faster than with the {DEFAULT_COMPILE_BACKEND} backend"
+            )
+        backend_seconds[self.backend] = seconds
+        self.history[name] = {"size": size, "seconds": seconds, "peak_rss": peak_rss, "backend_seconds": backend_seconds}
+
+    def save_history(self):
+        if self.history_path is None:
+            return
+        self.history_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.history_path.with_suffix(self.history_path.suffix + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.history, f, indent=1)
+        os.replace(tmp_path, self.history_path)
+
+    def run(
+        self,
+        compile_fn: Callable,
+        jobs: Iterable[tuple[str, float, tuple]],
+        get_failed_result: Optional[Callable] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[Any]:
+        """Yield `compile_fn(*args)` for every job, in completion order.
+
+        Results are handed out as soon as each compilation lands so the caller
+        can benchmark a kernel while the rest are still compiling.
+
+        Subprocess compilations enforce their timeout themselves. An
+        in-process compilation cannot be interrupted, so with the `inprocess`
+        backend a job still running after `timeout` seconds is abandoned:
+        the pool is replaced, the other running jobs start over on the new
+        pool, and `get_failed_result(args)` is yielded for the abandoned job.
+        """
+        pending = self.order_jobs(jobs)
+        next_job = next(pending, None)
+        started = 0
+        done = queue.Queue()
+        running = {}
+        deadlines = {}
+        used_memory = 0
+        in_process = self.backend == "inprocess"
+        if not in_process:
+            timeout = None
+        maxtasksperchild = None if in_process else 1
+        pool = None
+        # Results of a replaced pool are ignored.
+        generation = 0
+
+        def submit(job_id):
+            args = running[job_id][3]
+            if timeout is not None:
+                deadlines[job_id] = time.monotonic() + timeout
+            pool.apply_async(
+                _run_measured_job,
+                (compile_fn, args, in_process),
+                callback=lambda r, job_id=job_id, gen=generation: done.put((gen, job_id, r, None)),
+                error_callback=lambda e, job_id=job_id, gen=generation: done.put((gen, job_id, None, e)),
+            )
+
+        try:
+            pool = _SpawnLockedForkContext().Pool(self.max_workers, maxtasksperchild=maxtasksperchild)
+            while next_job is not None or running:
+                while next_job is not None and len(running) < self.max_workers:
+                    name, size, args = next_job
+                    memory = self.predict_memory(name)
+                    # Always let one job run, even if it is predicted not to fit.
+                    if running and used_memory + memory > self.memory_limit:
+                        break
+                    next_job = next(pending, None)
+                    started += 1
+                    used_memory += memory
+                    running[started] = (name, size, memory, args)
+                    submit(started)
+
+                try:
+                    wait = max(0.0, min(deadlines.values()) - time.monotonic()) if deadlines else None
+                    job_generation, job_id, measured, error = done.get(timeout=wait)
+                except queue.Empty:
+                    expired = [job_id for job_id, deadline in deadlines.items() if deadline <= time.monotonic()]
+                    pool.terminate()
+                    generation += 1
+                    pool = _SpawnLockedForkContext().Pool(self.max_workers, maxtasksperchild=maxtasksperchild)
+                    failed = []
+                    for job_id in expired:
+                        name, size, memory, args = running.pop(job_id)
+                        del deadlines[job_id]
+                        used_memory -= memory
+                        logging.getLogger().error(f"Compiling {name} timed out after {timeout:.0f}s")
+                        if get_failed_result is None:
+                            raise TimeoutError(f"Compiling {name} timed out after {timeout:.0f}s")
+                        failed.append(get_failed_result(args))
+                    for job_id in running:
+                        submit(job_id)
+                    yield from failed
+                    continue
+                if job_generation != generation:
+                    continue
+                name, size, memory, _ = running.pop(job_id)
+                deadlines.pop(job_id, None)
+                used_memory -= memory
+                if error is not None:
+                    raise error
+                result, seconds, peak_rss = measured
+                logging.getLogger().info(
+                    f"Compiled {name} in {seconds:.1f}s with {peak_rss >> 20} MiB peak RSS"
+                )
+                self.record(name, size, seconds, peak_rss)
+                yield result
+        finally:
+            if pool is not None:
+                pool.terminate()
+            self.save_history()
+
+
+class BenchmarkScheduler:
+    """Spreads benchmark jobs over several devices, one worker thread per device.
+
+    Every job is a `(name, args)` tuple and runs as `benchmark_fn(device, *args)`.
+    A kernel is always assigned to the same device (by a stable hash of its
+    name), so results stay comparable between runs and shards. Each device has
+    its own queue, so a slow kernel only holds up the device it runs on. The
+    queues are bounded: once a device has `max_queued` kernels waiting, jobs
+    stop being pulled from the (compile) stream until the device catches up.
+
+    With `work_stealing`, all devices instead pull from one shared queue
+    whenever they are idle. That keeps every device busy when kernel times
+    are uneven, but which device runs a kernel then depends on timing and
+    changes between runs.
+    """
+
+    def __init__(
+        self, devices: Sequence[str], max_queued: int = DEFAULT_MAX_QUEUED_PER_DEVICE, work_stealing: bool = False
+    ):
+        if not devices:
+            raise ValueError("At least one benchmark device is required")
+        self.devices = list(devices)
+        self.max_queued = max_queued
+        self.work_stealing = work_stealing
+
+    def get_device(self, name: str) -> str:
+        return self.devices[zlib.crc32(name.encode()) % len(self.devices)]
+
+    def run(self, benchmark_fn: Callable, jobs: Iterator[tuple[str, tuple]]) -> Iterator[Any]:
+        """Yield `benchmark_fn(device, *args)` for every job, in completion order.
+
+        `jobs` is consumed on a separate thread, so it may be a generator that
+        blocks on compilation, e.g. `CompileScheduler.run`.
+        """
+        results = queue.Queue()
+        if self.work_stealing:
+            shared_queue = queue.Queue(self.max_queued * len(self.devices))
+            device_queues = {device: shared_queue for device in self.devices}
+        else:
+            device_queues = {device: queue.Queue(self.max_queued) for device in self.devices}
+
+        def device_worker(device, device_queue):
+            while (args := device_queue.get()) is not None:
+                try:
+                    results.put((benchmark_fn(device, *args), None))
+                except BaseException as e:
+                    results.put((None, e))
+            results.put(None)
+
+        def feed_jobs():
+            try:
+                for name, args in jobs:
+                    device_queues[self.get_device(name)].put(args)
+            except BaseException as e:
+                results.put((None, e))
+            finally:
+                # One stop marker per worker, also when they share a queue.
+                for device_queue in device_queues.values():
+                    device_queue.put(None)
+
+        threads = [threading.Thread(target=feed_jobs, daemon=True)]
+        threads += [
+            threading.Thread(target=device_worker, args=item, daemon=True)
+            for item in device_queues.items()
+        ]
+        for thread in threads:
+            thread.start()
+
+        remaining_workers = len(self.devices)
+        while remaining_workers:
+            item = results.get()
+            if item is None:
+                remaining_workers -= 1
+                continue
+            result, error = item
+            if error is not None:
+                raise error
+            yield result
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the options of the compile and benchmark schedulers to `parser`."""
+    group = parser.add_argument_group("scheduling")
+    group.add_argument(
+        "--compile-timeout",
+        help="Seconds after which a hung compilation is killed and recorded as a failure; with --compile-backend "
+        "inprocess, the compile pool is restarted and the other running compilations start over",
+        type=float,
+        default=DEFAULT_COMPILE_TIMEOUT,
+    )
+    group.add_argument(
+        "--benchmark-timeout",
+        help="Seconds after which a hung iree-benchmark-module is killed and recorded as a failure",
+        type=float,
+        default=DEFAULT_BENCHMARK_TIMEOUT,
+    )
+    group.add_argument(
+        "--work-stealing",
+        action="store_true",
+        default=False,
+        help="Let every device take the next kernel whenever it is idle instead of assigning kernels to devices by "
+        "a stable hash of their name. Keeps all devices busy when kernel times are uneven, but the device that "
+        "runs a kernel then changes between runs",
+    )
+    group.add_argument(
+        "--jobs",
+        help="Maximum number of concurrent compilations (default: number of CPUs - 1)",
+        type=int,
+        default=None,
+    )
+    group.add_argument(
+        "--compile-memory-limit",
+        help="Memory the concurrent compilations may use, e.g. 200G (default: 90%% of available memory)",
+        default=None,
+    )
+    group.add_argument(
+        "--compile-history",
+        help="JSON file of measured compile times and peak RSS used to schedule compilations",
+        default=None,
+    )
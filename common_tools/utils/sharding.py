@@ -0,0 +1,143 @@
+import argparse
+import os
+import heapq
+from typing import Optional, Sequence
+
+from .bench_utils import ResultWriter, read_results
+from .sampling import KernelCostModel
+
+
+def parse_shard(shard: str) -> tuple[int, int]:
+    """Parse `i/n`, the i-th of n shards counting from 1, into `(i, n)`."""
+    index, count = (int(part) for part in shard.split("/"))
+    if not 1 <= index <= count:
+        raise ValueError(f"shard {index} does not exist out of {count}")
+    return index, count
+
+
+def get_shard_output(output_file: str, index: int, count: int) -> str:
+    """Default result file of a shard, e.g. `results/iree_gemm_shard1of4.csv`."""
+    root, ext = os.path.splitext(output_file)
+    return f"{root}_shard{index}of{count}{ext}"
+
+
+def partition_into_shards(kernels: Sequence[tuple[str, float]], count: int) -> dict[str, int]:
+    """Assign every `(name, predicted_seconds)` kernel to one of `count` shards, counting from 1.
+
+    Kernels are handed out most expensive first, each to the shard with the
+    least predicted time so far, which keeps the shards within the time of
+    one kernel of each other unless a single kernel outweighs a whole shard.
+    Ties are broken by name and shard number, so every runner computes the
+    same partition from the same kernels.
+    """
+    shards = [(0.0, index) for index in range(1, count + 1)]
+    assignment = {}
+    for name, seconds in sorted(kernels, key=lambda kernel: (-kernel[1], kernel[0])):
+        total, index = heapq.heappop(shards)
+        assignment[name] = index
+        heapq.heappush(shards, (total + seconds, index))
+    return assignment
+
+
+def merge_results(
+    input_files: Sequence[str], output_file: str, order: Optional[dict[tuple[str, str], int]] = None
+) -> tuple[int, int]:
+    """Combine the result files of shards into `output_file`, with stable indices.
+
+    Rows are sorted by the position of their `(tag, name)` in `order`, e.g.
+    the order the suite enumerates its configs in, and then indexed from 0,
+    so the merged file does not depend on the shard count or on the order
+    kernels finished in. Rows missing from `order` go last, sorted by tag and
+    name. A kernel found in several files keeps its first successful row.
+    Returns the number of merged rows and the number of kernels of `order`
+    missing from all files.
+    """
+    order = order or {}
+    fieldnames = None
+    rows = {}
+    for input_file in input_files:
+        for row in read_results(input_file):
+            if fieldnames is None:
+                fieldnames = list(row.keys())
+            elif list(row.keys()) != fieldnames:
+                raise ValueError(f"Cannot merge {input_file}: it has different columns than {input_files[0]}")
+            key = (row["tag"], row["name"])
+            if key not in rows or (str(rows[key]["ok"]) != "True" and str(row["ok"]) == "True"):
+                rows[key] = row
+    if fieldnames is None:
+        raise ValueError("No results to merge")
+
+    def position(key):
+        return (0, order[key], "", "") if key in order else (1, 0, *key)
+
+    writer = ResultWriter(output_file, fieldnames)
+    for key in sorted(rows, key=position):
+        writer.write([rows[key][field] for field in fieldnames[1:]])
+    writer.close()
+    return len(rows), len(set(order) - set(rows))
+
+
+def merge_suite_shards(suite, input_files: Sequence[str], output_file: str):
+    """Merge the result files of the shards of a `BenchmarkSuite` in the order of its configs; see `merge_results`."""
+    order = {}
+    for tag, config in suite.iter_configs():
+        order.setdefault((tag, config.get_name()), len(order))
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    row_count, missing_count = merge_results(input_files, output_file, order)
+    print(f"{suite.name}: Merged {row_count} results of {len(input_files)} files into {output_file}")
+    if missing_count:
+        print(f"{suite.name}: {missing_count} of {len(order)} configs are missing from the merged results")
+
+
+def assign_shards(suites: Sequence, cost_model: KernelCostModel, shard: tuple[int, int]) -> dict[str, int]:
+    """Shard of every `<suite>/<kernel>` of the `BenchmarkSuite`s, out of `shard[1]`; see `partition_into_shards`.
+
+    Prints the share of the work of shard `shard[0]`.
+    """
+    kernels = {}
+    for suite in suites:
+        for tag, config in suite.iter_configs():
+            key = f"{suite.name}/{config.get_name()}"
+            if key not in kernels:
+                flops = config.get_flops()
+                kernels[key] = cost_model.predict_compile_seconds(
+                    suite.get_job_name(config), flops
+                ) + cost_model.predict_benchmark_seconds(config.get_name(), flops)
+    assignment = partition_into_shards(list(kernels.items()), shard[1])
+    shard_seconds = sum(seconds for key, seconds in kernels.items() if assignment[key] == shard[0])
+    shard_count = sum(1 for index in assignment.values() if index == shard[0])
+    print(
+        f"Running shard {shard[0]} of {shard[1]}: {shard_count} of {len(kernels)} kernels, "
+        f"{shard_seconds / 3600:.2f} of {sum(kernels.values()) / 3600:.2f} predicted hours of work."
+    )
+    return assignment
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the options of sharded runs to `parser`."""
+    group = parser.add_argument_group("sharding")
+    group.add_argument(
+        "--shard",
+        help="Only run the i-th of n shards of the kernels (counting from 1), e.g. 2/4. Shards are balanced "
+        "by predicted compile and benchmark time and are the same on every runner; results go to "
+        "<output>_shard<i>of<n>.csv unless --output is given",
+        default=None,
+    )
+    group.add_argument(
+        "--merge",
+        nargs="+",
+        help="Merge the result files of the shards of a suite into --output (default: results/iree_<suite>.csv) "
+        "with indices in the order of the suite's configs, then exit",
+        default=None,
+    )
+
+
+def check_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Parse `--shard` into `(index, count)`."""
+    if args.shard:
+        try:
+            args.shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(f"invalid --shard {args.shard}: {e}")
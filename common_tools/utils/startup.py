@@ -0,0 +1,68 @@
+"""Measure how long the benchmark suites take to load.
+
+    python -m utils.startup [--suites gemm,attention,conv] [--repeat 5] [--max-seconds 1.5]
+
+Every suite is loaded in a fresh interpreter. The command fails if loading a
+suite takes longer than --max-seconds, or if it imports one of
+HEAVY_MODULES, which only TK kernels and roofline plots need.
+"""
+
+import sys
+import json
+import time
+import argparse
+import subprocess
+from .run import SUITE_SCRIPTS
+
+HEAVY_MODULES = ["torch", "shark_turbine", "matplotlib", "numpy"]
+DEFAULT_MAX_STARTUP_SECONDS = 1.5
+
+_PROBE = """
+import sys, json
+from utils.run import load_suite
+load_suite(sys.argv[1])
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def measure_startup(suite: str, repeat: int = 5) -> tuple[float, list[str]]:
+    """Return the fastest of `repeat` cold loads of `suite`, and the heavy modules it imported."""
+    best = float("inf")
+    modules = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", _PROBE, suite], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False
+        )
+        elapsed = time.perf_counter() - start
+        if proc.returncode != 0:
+            raise RuntimeError(f"Loading {suite} failed:\n{proc.stderr.decode()}")
+        best = min(best, elapsed)
+        modules = json.loads(proc.stdout.decode().splitlines()[-1])
+    heavy = [name for name in modules if name.split(".")[0] in HEAVY_MODULES]
+    return best, sorted({name.split(".")[0] for name in heavy})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m utils.startup", description="Guard the startup time of the benchmark suites.")
+    parser.add_argument("--suites", help="Comma separated suites to load", default=",".join(SUITE_SCRIPTS))
+    parser.add_argument("--repeat", help="Loads per suite; the fastest one counts", type=int, default=5)
+    parser.add_argument(
+        "--max-seconds",
+        help="Fail if a suite takes longer than this to load",
+        type=float,
+        default=DEFAULT_MAX_STARTUP_SECONDS,
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for suite in args.suites.split(","):
+        seconds, heavy = measure_startup(suite, args.repeat)
+        print(f"{suite}: {seconds:.3f}s" + (f", imports {', '.join(heavy)}" if heavy else ""))
+        if seconds > args.max_seconds:
+            print(f"{suite}: startup exceeds {args.max_seconds}s")
+            failed = True
+        if heavy:
+            print(f"{suite}: {', '.join(heavy)} must only be imported when needed")
+            failed = True
+    sys.exit(1 if failed else 0)
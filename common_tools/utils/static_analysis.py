@@ -0,0 +1,232 @@
+import argparse
+import re
+import json
+import struct
+import logging
+from pathlib import Path
+from typing import Optional
+
+# Columns of the `--compile-only` results, after `index`, `tag` and `name`.
+STATIC_FIELDNAMES = [
+    "dispatches",
+    "vmfb_bytes",
+    "code_bytes",
+    "vgprs",
+    "agprs",
+    "sgprs",
+    "lds_bytes",
+    "scratch_bytes",
+    "vgpr_spills",
+    "sgpr_spills",
+    "occupancy",
+    "ok",
+]
+
+# Per-SIMD resources of the AMDGPU targets whose occupancy is estimated:
+# (max waves, VGPRs, VGPR allocation granule, SGPRs, SGPR allocation granule,
+# LDS bytes per CU, SIMDs per CU).
+_AMDGPU_LIMITS = {
+    "gfx90a": (8, 512, 8, 800, 16, 64 << 10, 4),
+    "gfx940": (8, 512, 8, 800, 16, 64 << 10, 4),
+    "gfx941": (8, 512, 8, 800, 16, 64 << 10, 4),
+    "gfx942": (8, 512, 8, 800, 16, 64 << 10, 4),
+    "gfx950": (8, 512, 8, 800, 16, 160 << 10, 4),
+}
+
+# Keys of a kernel in the `amdhsa.kernels` list of the `.amdgpu_metadata`
+# block that ends every AMDGPU ISA dump.
+_KERNEL_START = re.compile(r"^  - \.(?P<key>[\w.]+):\s*(?P<value>\S.*)?$")
+_KERNEL_KEY = re.compile(r"^    \.(?P<key>[\w.]+):\s*(?P<value>\S.*)?$")
+_TARGET = re.compile(r"^amdhsa\.target:\s*\S*-(?P<chip>gfx\w+)", re.MULTILINE)
+# Kernel descriptors of the ISA dump, with the registers actually allocated.
+_KERNEL_DESCRIPTOR = re.compile(
+    r"^\s*\.amdhsa_kernel\s+(?P<name>\S+)\s*$(?P<body>.*?)^\s*\.end_amdhsa_kernel", re.MULTILINE | re.DOTALL
+)
+_DESCRIPTOR_FIELD = re.compile(r"^\s*\.amdhsa_(?P<key>\w+)\s+(?P<value>\d+)\s*$", re.MULTILINE)
+
+_SHF_EXECINSTR = 0x4
+
+
+def get_dump_flags(dump_dir: Path) -> list[str]:
+    """iree-compile flags that dump the executable binaries and ISA of a module below `dump_dir`."""
+    return [
+        f"--iree-hal-dump-executable-binaries-to={dump_dir / 'binaries'}",
+        f"--iree-hal-dump-executable-intermediates-to={dump_dir / 'intermediates'}",
+    ]
+
+
+def parse_amdgpu_metadata(isa: str) -> list[dict]:
+    """Return the register, LDS and scratch usage of every kernel of an AMDGPU ISA dump."""
+    start = isa.find(".amdgpu_metadata")
+    end = isa.find(".end_amdgpu_metadata", start)
+    if start < 0 or end < 0:
+        return []
+    metadata = isa[start:end]
+    target = _TARGET.search(metadata)
+    descriptors = {}
+    for match in _KERNEL_DESCRIPTOR.finditer(isa[:start]):
+        fields = _DESCRIPTOR_FIELD.finditer(match.group("body"))
+        descriptors[match.group("name")] = {field.group("key"): int(field.group("value")) for field in fields}
+
+    kernels = []
+    for line in metadata.splitlines():
+        match = _KERNEL_START.match(line)
+        if match:
+            kernels.append({})
+        else:
+            match = _KERNEL_KEY.match(line)
+        if match and kernels and match.group("value") is not None:
+            kernels[-1][match.group("key")] = match.group("value").strip()
+
+    dispatches = []
+    for kernel in kernels:
+        dispatch = {
+            "name": kernel.get("name"),
+            "target": target.group("chip") if target else None,
+            "vgprs": int(kernel.get("vgpr_count", 0)),
+            "agprs": int(kernel.get("agpr_count", 0)),
+            "sgprs": int(kernel.get("sgpr_count", 0)),
+            "lds_bytes": int(kernel.get("group_segment_fixed_size", 0)),
+            "scratch_bytes": int(kernel.get("private_segment_fixed_size", 0)),
+            "vgpr_spills": int(kernel.get("vgpr_spill_count", 0)),
+            "sgpr_spills": int(kernel.get("sgpr_spill_count", 0)),
+            "workgroup_size": int(kernel.get("max_flat_workgroup_size", 0)),
+            "wavefront_size": int(kernel.get("wavefront_size", 64)),
+        }
+        dispatch["unified_vgprs"] = get_unified_vgprs(dispatch, descriptors.get(dispatch["name"], {}))
+        dispatch["occupancy"] = estimate_occupancy(dispatch)
+        dispatches.append(dispatch)
+    return dispatches
+
+
+def get_unified_vgprs(dispatch: dict, descriptor: dict) -> int:
+    """Registers a dispatch allocates in the unified VGPR file of CDNA, i.e. its VGPRs and AGPRs.
+
+    The `.vgpr_count` of the metadata only counts the architectural VGPRs.
+    The AGPRs are allocated after them, from `.amdhsa_accum_offset` on, and
+    `.amdhsa_next_free_vgpr` of the kernel descriptor holds the total. Without
+    a descriptor, the AGPRs are placed after the VGPRs rounded up to the
+    granule of 4 that `accum_offset` is given in.
+    """
+    if "next_free_vgpr" in descriptor:
+        return descriptor["next_free_vgpr"]
+    if not dispatch["agprs"]:
+        return dispatch["vgprs"]
+    accum_offset = descriptor.get("accum_offset", -(-dispatch["vgprs"] // 4) * 4)
+    return accum_offset + dispatch["agprs"]
+
+
+def estimate_occupancy(dispatch: dict) -> Optional[int]:
+    """Estimate the waves per SIMD of a dispatch from its registers and LDS; None for unknown targets.
+
+    The VGPR limit applies to `unified_vgprs`, since on the CDNA targets of
+    `_AMDGPU_LIMITS` the AGPRs share the register file with the VGPRs.
+    """
+    limits = _AMDGPU_LIMITS.get(dispatch["target"])
+    if limits is None:
+        return None
+    max_waves, vgprs, vgpr_granule, sgprs, sgpr_granule, lds_bytes, simds = limits
+
+    def round_up(value, granule):
+        return -(-value // granule) * granule
+
+    occupancy = max_waves
+    unified_vgprs = dispatch.get("unified_vgprs", dispatch["vgprs"])
+    if unified_vgprs:
+        occupancy = min(occupancy, vgprs // round_up(unified_vgprs, vgpr_granule))
+    if dispatch["sgprs"]:
+        occupancy = min(occupancy, sgprs // round_up(dispatch["sgprs"], sgpr_granule))
+    if dispatch["lds_bytes"] and dispatch["workgroup_size"]:
+        # LDS limits the workgroups that fit on a CU, whose waves are spread
+        # over its SIMDs; the busiest SIMD gets the rounded up share, so a
+        # workgroup that fits always runs at least one wave per SIMD.
+        workgroups = lds_bytes // dispatch["lds_bytes"]
+        waves_per_workgroup = -(-dispatch["workgroup_size"] // dispatch["wavefront_size"])
+        occupancy = min(occupancy, -(-workgroups * waves_per_workgroup // simds))
+    return occupancy
+
+
+def get_code_size(binary: bytes) -> Optional[int]:
+    """Size of the executable sections of a 64-bit little endian ELF binary, e.g. a `.hsaco` or `.so`."""
+    if binary[:4] != b"\x7fELF" or binary[4] != 2 or binary[5] != 1:
+        return None
+    section_offset, = struct.unpack_from("<Q", binary, 0x28)
+    section_size, section_count = struct.unpack_from("<HH", binary, 0x3A)
+    code_size = 0
+    for i in range(section_count):
+        flags, = struct.unpack_from("<Q", binary, section_offset + i * section_size + 8)
+        size, = struct.unpack_from("<Q", binary, section_offset + i * section_size + 32)
+        if flags & _SHF_EXECINSTR:
+            code_size += size
+    return code_size
+
+
+def analyze_executables(dump_dir: Path, vmfb: Path | bytes) -> dict:
+    """Summarize the executables dumped below `dump_dir` by `get_dump_flags` for a compiled module.
+
+    Returns the values of `STATIC_FIELDNAMES` and the usage of every dispatch
+    under `dispatch_stats`. Register, LDS and occupancy values are the worst
+    over the dispatches of the module and stay None for targets without an
+    AMDGPU ISA dump, e.g. llvm-cpu.
+    """
+    dispatches = []
+    for isa_file in sorted((dump_dir / "intermediates").glob("*.rocmasm")):
+        dispatches += parse_amdgpu_metadata(isa_file.read_text(errors="replace"))
+
+    binaries = sorted(path for path in (dump_dir / "binaries").glob("*") if path.is_file())
+    code_sizes = [get_code_size(path.read_bytes()) for path in binaries]
+
+    def worst(key, fn=max):
+        values = [dispatch[key] for dispatch in dispatches if dispatch[key] is not None]
+        return fn(values) if values else None
+
+    stats = {
+        # Without an ISA dump, every dumped binary holds one executable.
+        "dispatches": len(dispatches) if dispatches else len(binaries),
+        "vmfb_bytes": len(vmfb) if isinstance(vmfb, bytes) else vmfb.stat().st_size,
+        "code_bytes": sum(code_sizes) if code_sizes and None not in code_sizes else None,
+        "vgprs": worst("vgprs"),
+        "agprs": worst("agprs"),
+        "sgprs": worst("sgprs"),
+        "lds_bytes": worst("lds_bytes"),
+        "scratch_bytes": worst("scratch_bytes"),
+        "vgpr_spills": worst("vgpr_spills", sum),
+        "sgpr_spills": worst("sgpr_spills", sum),
+        "occupancy": worst("occupancy", min),
+        "dispatch_stats": dispatches,
+    }
+    if stats["vgpr_spills"] or stats["sgpr_spills"]:
+        logging.getLogger().warning(
+            f"{dump_dir.name}: {stats['vgpr_spills']} VGPR and {stats['sgpr_spills']} SGPR spills"
+        )
+    return stats
+
+
+def get_static_stats_file(vmfb_dir: Path, name: str) -> Path:
+    return vmfb_dir / (name + "_static.json")
+
+
+def write_static_stats(stats_file: Path, stats: dict):
+    with open(stats_file, "w") as f:
+        json.dump(stats, f, indent=2)
+
+
+def get_static_row(tag: str, name: str, stats_file: Path) -> tuple:
+    """Result row of `STATIC_FIELDNAMES` for a kernel, failed if it has no stats."""
+    if not stats_file.exists():
+        return (tag, name, *([None] * (len(STATIC_FIELDNAMES) - 1)), False)
+    with open(stats_file) as f:
+        stats = json.load(f)
+    return (tag, name, *(stats[key] for key in STATIC_FIELDNAMES[:-1]), True)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the option of the compile-only analysis to `parser`."""
+    group = parser.add_argument_group("static analysis")
+    group.add_argument(
+        "--compile-only",
+        action="store_true",
+        default=False,
+        help="Do not benchmark; dump the executables of every kernel and record their registers, LDS, spills, "
+        "estimated occupancy, dispatch count and code and vmfb size (default output: results/iree_<suite>_static.csv)",
+    )
@@ -0,0 +1,568 @@
+import os
+import sys
+import logging
+import argparse
+import statistics
+from pathlib import Path
+from collections import Counter
+from functools import partial
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+from tqdm import tqdm
+from . import (
+    adaptive,
+    batching,
+    bench_utils,
+    compile_cache,
+    compiler,
+    distributed,
+    problem_sets,
+    result_cache,
+    rounds,
+    runtime,
+    sampling,
+    scheduler,
+    sharding,
+    static_analysis,
+    targets,
+    tools,
+)
+from .bench_utils import ResultWriter, get_latency_flags, iter_results, roofline
+from .compile_cache import get_compile_cache
+from .compiler import DEFAULT_COMPILE_BACKEND, check_compile_backend, get_compiler_version
+from .result_cache import get_result_cache
+from .runtime import check_benchmark_backend
+from .dedupe import DUPLICATE_FIELDNAME, KernelDeduplicator
+from .batching import KernelBatch, benchmark_batch, compile_batch
+from .static_analysis import STATIC_FIELDNAMES, get_static_row, get_static_stats_file
+from .scheduler import BenchmarkScheduler, CompileScheduler, get_default_num_workers
+from .distributed import get_work_queue, run_workers
+from .tools import configure_tools
+from .adaptive import AdaptiveRepetitions
+from .sampling import (
+    DEFAULT_CPU_FLOPS,
+    DEFAULT_DEVICE_FLOPS,
+    KernelCostModel,
+    read_benchmark_history,
+    select_budgeted_configs,
+)
+from .sharding import assign_shards, get_shard_output, merge_suite_shards
+from .problem_sets import ProblemSelection, find_problem_set, load_problem_set
+from .rounds import run_rounds
+from .targets import TARGET_PROFILES, get_thread_sweep_fieldnames, get_thread_sweep_job
+
+# Modules adding their options to the command line, in the order of `--help`.
+_OPTION_MODULES = [
+    compile_cache,
+    result_cache,
+    compiler,
+    static_analysis,
+    batching,
+    runtime,
+    adaptive,
+    tools,
+    scheduler,
+    targets,
+    distributed,
+    problem_sets,
+    sampling,
+    sharding,
+    rounds,
+    bench_utils,
+]
+
+
+class BenchmarkSuite:
+    """A family of kernels that runs through the shared benchmark pipeline.
+
+    Subclasses describe how to enumerate, compile and benchmark their kernels;
+    `run_suites` takes care of scheduling, caching, deduplication and writing
+    results. The functions returned by `get_compile_job` and
+    `get_benchmark_job` are sent to pool processes and remote workers, so they
+    must be module level functions with picklable arguments. A compile function
+    returns `(tag, config, mlir_file, vmfb_file)`, with a `None` vmfb_file on
+    failure and the vmfb contents with `--in-memory`, and a benchmark function
+    returns a result row without `index`.
+    """
+
+    # Short name used on the command line and for the `<name>/mlir` and
+    # `<name>/vmfb` artifact directories below the repository root.
+    name: str = None
+    fieldnames: list[str] = []
+    default_output: str = None
+    repo_root: Path = None
+    # Directory of the problem files of the suite, and the problem sets run
+    # unless `--problems` is given.
+    problem_set_dir: Path = None
+    default_problem_sets: list[str] = []
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+
+    @classmethod
+    def add_arguments(cls, parser: argparse.ArgumentParser):
+        """Add the suite specific command line flags."""
+
+    def preload(self):
+        """Import what the compile jobs need before the compile pool starts.
+
+        Pool workers are forked from this process for every job, so modules
+        imported here are loaded once rather than once per kernel.
+        """
+
+    def get_output(self) -> str:
+        return self.default_output
+
+    def get_static_output(self) -> str:
+        """Result file of `--compile-only`, e.g. `results/iree_gemm_static.csv`."""
+        root, ext = os.path.splitext(self.get_output())
+        return f"{root}_static{ext}"
+
+    def get_artifact_dirs(self) -> tuple[Path, Path]:
+        kernel_dir = self.repo_root / self.name / "mlir"
+        vmfb_dir = self.repo_root / self.name / "vmfb"
+        # In memory, `compile_mlir` creates them once a kernel fails or is analyzed.
+        if not self.args.in_memory:
+            kernel_dir.mkdir(parents=True, exist_ok=True)
+            vmfb_dir.mkdir(parents=True, exist_ok=True)
+        return kernel_dir, vmfb_dir
+
+    def iter_configs(self) -> Iterator[tuple[str, Any]]:
+        """Yield the `(tag, config)` pairs of `get_problem_sets` that match `get_problem_selection`."""
+        raise NotImplementedError
+
+    def get_problem_sets(self) -> list[str]:
+        """Names (in `problem_set_dir`) or files of the problem sets to run."""
+        if self.args.problems:
+            return self.args.problems.split(",")
+        return self.default_problem_sets
+
+    def get_problem_selection(self) -> ProblemSelection:
+        args = self.args
+        return ProblemSelection(
+            args.tag.split(",") if args.tag else None,
+            args.dtype.split(",") if args.dtype else None,
+            args.shape_regex,
+            args.limit,
+        )
+
+    def get_adaptive_repetitions(self) -> Optional[AdaptiveRepetitions]:
+        """Settings of `--target-ci` for the benchmark jobs, or None for a fixed number of repetitions."""
+        if self.args.target_ci is None:
+            return None
+        return AdaptiveRepetitions(self.args.target_ci / 100, self.args.max_kernel_seconds)
+
+    def get_job_name(self, config) -> str:
+        """Name of the compile job in the compile history."""
+        return config.get_name()
+
+    def get_compile_job(self, tag, config, kernel_dir, vmfb_dir, cache, timeout) -> tuple[Callable, tuple]:
+        raise NotImplementedError
+
+    def get_benchmark_job(
+        self, tag, config, vmfb_filename, result_cache, timeout, benchmark_flags: Sequence[str] = ()
+    ) -> tuple[Callable, tuple]:
+        """`benchmark_flags` are appended to the iree-benchmark-module command line."""
+        raise NotImplementedError
+
+    def get_stratum(self, tag, config) -> tuple[str, ...]:
+        """Values of `config` that a `--budget` run covers every combination of, e.g. its tag and dtype."""
+        return (tag,)
+
+    def get_target_profiles(self) -> list[str]:
+        """The `--target-profile` values the kernels of this suite can be compiled for."""
+        return TARGET_PROFILES
+
+    def supports_batching(self) -> bool:
+        """Whether several kernels can share one module; see `--kernels-per-module`."""
+        return False
+
+    def get_kernel_source(self, config) -> tuple[str, list[str]]:
+        """MLIR of `config` with a `@main` function, and its `--input` shapes."""
+        raise NotImplementedError
+
+    def get_compile_flags(self) -> list[str]:
+        raise NotImplementedError
+
+    def get_row_function(self) -> Callable:
+        """Module level function `(device, tag, config, ok, stats, reused) -> row`, with `BenchmarkStats`."""
+        raise NotImplementedError
+
+    def get_batch_compile_job(self, batch: KernelBatch, kernel_dir, vmfb_dir, cache, timeout) -> tuple[Callable, tuple]:
+        sources = [self.get_kernel_source(config) for _, config in batch.kernels]
+        return compile_batch, (
+            batch, sources, kernel_dir, vmfb_dir, self.get_compile_flags(), cache, timeout, self.args.compile_backend,
+            self.args.in_memory,
+        )
+
+    def get_batch_benchmark_job(
+        self, batch: KernelBatch, vmfb_filename, result_cache, timeout, benchmark_flags: Sequence[str] = ()
+    ) -> tuple[Callable, tuple]:
+        return benchmark_batch, (
+            batch, vmfb_filename, self.get_row_function(), result_cache, timeout, self.args.benchmark_backend,
+            list(benchmark_flags), self.get_adaptive_repetitions(),
+        )
+
+
+# Jobs carry the tag and config of their kernel (or batch) so that a job
+# that fails on a remote worker can be recorded as a failed result.
+
+
+def _run_suite_job(suite_name: str, tag, config, fn: Callable, *args):
+    return suite_name, fn(*args)
+
+
+def _get_failed_compile(suite_name: str, tag, config, fn: Callable, *args):
+    return suite_name, (tag, config, None, None)
+
+
+def _run_suite_benchmark(device: str, suite_name: str, tag, config, fn: Callable, *args):
+    return suite_name, fn(device, *args)
+
+
+def _batch(items: Iterable, size: int) -> Iterator[list]:
+    """Group `items` into lists of `size`; the last one may be shorter."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _interleave(iterables: Sequence[Iterable]) -> Iterator:
+    """Round robin over `iterables` until all of them are exhausted."""
+    iterators = [iter(iterable) for iterable in iterables]
+    while iterators:
+        for iterator in list(iterators):
+            try:
+                yield next(iterator)
+            except StopIteration:
+                iterators.remove(iterator)
+
+
+def get_suite_parser(suite_classes: Sequence[type[BenchmarkSuite]], prog: Optional[str] = None) -> argparse.ArgumentParser:
+    names = ", ".join(suite_class.name for suite_class in suite_classes)
+    parser = argparse.ArgumentParser(prog=prog, description=f"Benchmark IREE {names} kernels.")
+    parser.add_argument(
+        "--log-level",
+        default="ERROR",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        type=str.upper,
+        help="Set the logging level",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=False,
+        help="Keep the results already in the output file and only run the kernels missing from it",
+    )
+    parser.add_argument(
+        "--output",
+        help="Result file when running a single suite; a .jsonl suffix writes JSON lines instead of CSV "
+        "(default: results/iree_<suite>.csv)",
+        default=None,
+    )
+    for module in _OPTION_MODULES:
+        module.add_arguments(parser)
+    for suite_class in suite_classes:
+        suite_class.add_arguments(parser)
+    return parser
+
+
+def run_suites(suite_classes: Sequence[type[BenchmarkSuite]], argv: Optional[Sequence[str]] = None, prog: Optional[str] = None):
+    """Command line entry point shared by the suite drivers and `utils.run`."""
+    parser = get_suite_parser(suite_classes, prog)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+    configure_tools(args.iree_compile, args.iree_benchmark_module, args.fake_tools)
+    targets.check_arguments(parser, args)
+    distributed.check_arguments(parser, args)
+
+    if args.roofline:
+        roofline(args.roofline, args.plot, args.batch, args.dtype, args.model, args.roofline_percentile)
+        sys.exit()
+
+    if args.worker:
+        if args.worker == "compile":
+            worker_extra_args = [()] * (args.jobs or get_default_num_workers())
+        else:
+            worker_extra_args = [(device,) for device in args.devices.split(",")]
+        run_workers(Path(args.queue_dir) / args.worker, worker_extra_args, args.worker_idle_timeout)
+        sys.exit()
+
+    for module in [batching, adaptive, rounds, problem_sets, sharding, sampling]:
+        module.check_arguments(parser, args)
+    for option in ["output", "problems", "merge"]:
+        if getattr(args, option) and len(suite_classes) > 1:
+            parser.error(f"--{option} can only be used with a single suite")
+    suites = []
+    for suite in (suite_class(args) for suite_class in suite_classes):
+        try:
+            for name in suite.get_problem_sets():
+                load_problem_set(find_problem_set(name, suite.problem_set_dir), suite.name)
+        except ValueError as e:
+            parser.error(str(e))
+        if next(suite.iter_configs(), None) is None:
+            print(f"{suite.name}: No kernels match the selected problems")
+            continue
+        suites.append(suite)
+    if not suites:
+        parser.error("no kernels match the selected problems")
+    if args.merge:
+        suite = suites[0]
+        output_file = args.output or (suite.get_static_output() if args.compile_only else suite.get_output())
+        merge_suite_shards(suite, args.merge, output_file)
+        sys.exit()
+    for suite in suites:
+        if args.target_profile not in suite.get_target_profiles():
+            parser.error(f"{suite.name} kernels cannot be compiled with --target-profile {args.target_profile}")
+    _run_pipeline(suites, args)
+
+
+def _get_output_file(suite: BenchmarkSuite, args: argparse.Namespace) -> str:
+    if args.output:
+        return args.output
+    output_file = suite.get_static_output() if args.compile_only else suite.get_output()
+    if args.shard:
+        output_file = get_shard_output(output_file, *args.shard)
+    return output_file
+
+
+def _run_pipeline(suites: Sequence[BenchmarkSuite], args: argparse.Namespace):
+    writers = {}
+    dedupes = {}
+    stats = {}
+    benchmark_histories = {}
+    for suite in suites:
+        output_file = _get_output_file(suite, args)
+        if args.compile_only:
+            fieldnames = ["index", "tag", "name", *STATIC_FIELDNAMES]
+        else:
+            fieldnames = suite.fieldnames
+            if args.target_profile == "cpu":
+                fieldnames = fieldnames + get_thread_sweep_fieldnames(args.cpu_threads)
+        fieldnames = [*fieldnames, DUPLICATE_FIELDNAME]
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        if args.budget and os.path.exists(output_file) and not args.compile_only:
+            # Read before the results of this run replace them.
+            benchmark_histories[suite.name] = read_benchmark_history(output_file)
+        writers[suite.name] = ResultWriter(output_file, fieldnames, args.resume)
+        if writers[suite.name].completed:
+            print(f"Resuming {output_file}: skipping {len(writers[suite.name].completed)} completed kernels.")
+        dedupes[suite.name] = KernelDeduplicator(fieldnames)
+        if writers[suite.name].completed:
+            dedupes[suite.name].resume(iter_results(output_file))
+        stats[suite.name] = Counter()
+
+    for suite in suites:
+        suite.preload()
+    check_compile_backend(args.compile_backend)
+
+    scheduler = CompileScheduler(
+        args.jobs, args.compile_memory_limit, args.compile_history, backend=args.compile_backend
+    )
+    print(
+        f"Using {scheduler.max_workers} CPUs and {scheduler.memory_limit / (1 << 30):.1f} GiB of memory for parallel compilation."
+    )
+
+    cache = None
+    if args.compile_cache:
+        cache = get_compile_cache(args.compile_cache, args.compile_cache_size, get_compiler_version(args.compile_backend))
+    result_cache = get_result_cache(args.result_cache, args.result_max_age)
+    benchmark_scheduler = BenchmarkScheduler(args.devices.split(","), work_stealing=args.work_stealing)
+    compile_queue = get_work_queue(args.queue_dir, "compile", args.distribute)
+    benchmark_queue = None if args.compile_only else get_work_queue(args.queue_dir, "benchmark", args.distribute)
+    if benchmark_queue and result_cache:
+        print("Benchmark results are not reused when benchmarking on remote workers.")
+    if not benchmark_queue and not args.compile_only:
+        check_benchmark_backend(args.benchmark_backend)
+
+    device_flops = DEFAULT_CPU_FLOPS if args.target_profile == "cpu" else DEFAULT_DEVICE_FLOPS
+    runs_per_kernel = (len(args.cpu_threads) if args.target_profile == "cpu" else 1) * args.rounds
+    shard_assignment = None
+    if args.shard:
+        # Without the histories of this runner, so that every runner
+        # computes the same shards.
+        shard_assignment = assign_shards(suites, KernelCostModel(None, None, device_flops, runs_per_kernel), args.shard)
+
+    def get_configs(suite):
+        # Configs are generated lazily and streamed through compilation and
+        # benchmarking, so memory use does not grow with the number of kernels.
+        configs = suite.iter_configs()
+        if shard_assignment:
+            configs = (
+                (tag, config) for tag, config in configs
+                if shard_assignment[f"{suite.name}/{config.get_name()}"] == args.shard[0]
+            )
+        writer = writers[suite.name]
+        if writer.completed:
+            configs = ((tag, config) for tag, config in configs if not writer.is_completed(tag, config.get_name()))
+        return configs
+
+    budgeted = None
+    if args.budget:
+        # Sampling needs the costs of all configs up front.
+        cost_models = {
+            suite.name: KernelCostModel(scheduler, benchmark_histories.get(suite.name), device_flops, runs_per_kernel)
+            for suite in suites
+        }
+        budgeted = select_budgeted_configs(
+            suites,
+            {suite.name: get_configs(suite) for suite in suites},
+            cost_models,
+            args.budget,
+            scheduler.max_workers,
+            len(args.devices.split(",")),
+            {suite.name: os.path.splitext(_get_output_file(suite, args))[0] + "_skipped.csv" for suite in suites},
+            not args.compile_only,
+        )
+
+    def get_compile_jobs(suite):
+        configs = get_configs(suite) if budgeted is None else budgeted[suite.name]
+        kernel_dir, vmfb_dir = suite.get_artifact_dirs()
+
+        def get_unique_configs():
+            for tag, config in configs:
+                stats[suite.name]["configs"] += 1
+                # Kernels listed under several tags run once; see KernelDeduplicator.
+                if not dedupes[suite.name].is_duplicate(tag, config.get_name()):
+                    yield tag, config
+
+        if args.kernels_per_module > 1 and suite.supports_batching():
+            for kernels in _batch(get_unique_configs(), args.kernels_per_module):
+                batch = KernelBatch(kernels)
+                fn, fn_args = suite.get_batch_compile_job(batch, kernel_dir, vmfb_dir, cache, args.compile_timeout)
+                yield suite.get_job_name(batch), batch.get_flops(), (suite.name, None, batch, fn, *fn_args)
+            return
+        for tag, config in get_unique_configs():
+            fn, fn_args = suite.get_compile_job(tag, config, kernel_dir, vmfb_dir, cache, args.compile_timeout)
+            yield suite.get_job_name(config), config.get_flops(), (suite.name, tag, config, fn, *fn_args)
+
+    def get_compiled():
+        # Suites are interleaved so that every suite keeps both the CPUs and
+        # the devices busy, rather than running one suite after the other.
+        compile_jobs = _interleave([get_compile_jobs(suite) for suite in suites])
+        if compile_queue:
+            ordered_jobs = scheduler.order_jobs(compile_jobs)
+            return compile_queue.run(
+                _run_suite_job,
+                ((job_name, job_args) for job_name, _, job_args in ordered_jobs),
+                lambda job_args: _get_failed_compile(*job_args),
+            )
+        return scheduler.run(
+            _run_suite_job, compile_jobs, lambda job_args: _get_failed_compile(*job_args), args.compile_timeout
+        )
+
+    def get_static_results():
+        # The analysis was written next to the vmfb by the compile job.
+        vmfb_dirs = {suite.name: suite.get_artifact_dirs()[1] for suite in suites}
+        for suite_name, (tag, config, mlir_file, vmfb_filename) in get_compiled():
+            if not vmfb_filename:
+                stats[suite_name]["compile_failed"] += 1
+            stats_file = get_static_stats_file(vmfb_dirs[suite_name], config.get_name())
+            yield suite_name, get_static_row(tag, config.get_name(), stats_file)
+
+    def get_benchmark_job(suite, tag, config, vmfb_filename, job_result_cache, benchmark_flags=()):
+        if isinstance(config, KernelBatch):
+            return suite.get_batch_benchmark_job(
+                config, vmfb_filename, job_result_cache, args.benchmark_timeout, benchmark_flags
+            )
+        return suite.get_benchmark_job(
+            tag, config, vmfb_filename, job_result_cache, args.benchmark_timeout, benchmark_flags
+        )
+
+    suites_by_name = {suite.name: suite for suite in suites}
+
+    def get_kernel_jobs():
+        # Yields `(suite_name, tag, config, fn, fn_args)` with the benchmark job of every compiled kernel or batch.
+        latency_flags = get_latency_flags(args.latency_samples) if args.latency_samples else []
+        for suite_name, (tag, config, mlir_file, vmfb_filename) in get_compiled():
+            suite = suites_by_name[suite_name]
+            job_result_cache = None if benchmark_queue else result_cache
+            if not vmfb_filename:
+                stats[suite_name]["compile_failed"] += (
+                    len(config.kernels) if isinstance(config, KernelBatch) else 1
+                )
+            get_job = partial(get_benchmark_job, suite, tag, config, vmfb_filename, job_result_cache)
+            if args.target_profile == "cpu":
+                # Every thread count runs on the same device, combined into one row per kernel.
+                fn, fn_args = get_thread_sweep_job(
+                    get_job, args.cpu_threads, args.numa_nodes, suite.fieldnames, latency_flags
+                )
+            else:
+                fn, fn_args = get_job(latency_flags)
+            yield suite_name, tag, config, fn, fn_args
+
+    def get_benchmark_jobs():
+        for suite_name, tag, config, fn, fn_args in get_kernel_jobs():
+            yield config.get_name(), (suite_name, tag, config, fn, *fn_args)
+
+    def get_failed_benchmark(suite_name, tag, config, fn, *fn_args):
+        # Rows of a benchmark job that failed on a remote worker.
+        row_fn = suites_by_name[suite_name].get_row_function()
+        sweep_columns = get_thread_sweep_fieldnames(args.cpu_threads) if args.target_profile == "cpu" else []
+        kernels = config.kernels if isinstance(config, KernelBatch) else [(tag, config)]
+        rows = [
+            (*row_fn(None, kernel_tag, kernel_config, False, None, False), *[None] * len(sweep_columns))
+            for kernel_tag, kernel_config in kernels
+        ]
+        return suite_name, rows if isinstance(config, KernelBatch) else rows[0]
+
+    def run_benchmarks(fn, jobs, get_failed_result):
+        if benchmark_queue:
+            return benchmark_queue.run(fn, jobs, get_failed_result)
+        return benchmark_scheduler.run(fn, jobs)
+
+    if args.compile_only:
+        benchmarked = get_static_results()
+    elif args.rounds > 1:
+        output_files = {suite.name: writers[suite.name].output_filename for suite in suites}
+        benchmarked = run_rounds(
+            get_kernel_jobs(), suites_by_name, output_files, run_benchmarks, get_failed_benchmark, args.rounds, args.seed
+        )
+    else:
+        benchmarked = run_benchmarks(
+            _run_suite_benchmark, get_benchmark_jobs(), lambda job_args: get_failed_benchmark(*job_args)
+        )
+    progress = tqdm(unit="kernel")
+    for suite_name, result in benchmarked:
+        writer = writers[suite_name]
+        # Batched kernels come back as a list of rows.
+        kernel_results = result if isinstance(result, list) else [result]
+        for kernel_result in kernel_results:
+            if not kernel_result[writer.fieldnames.index("ok") - 1]:
+                stats[suite_name]["failed"] += 1
+            for row in dedupes[suite_name].fan_out(kernel_result):
+                writer.write(row)
+        progress.update(len(kernel_results))
+    progress.close()
+
+    if scheduler.speedups:
+        print(
+            f"{args.compile_backend} compilation was {statistics.median(scheduler.speedups):.2f}x faster than "
+            f"{DEFAULT_COMPILE_BACKEND} compilation (median over {len(scheduler.speedups)} kernels of the compile history)"
+        )
+
+    for suite in suites:
+        writer, dedupe, suite_stats = writers[suite.name], dedupes[suite.name], stats[suite.name]
+        # Collected first, since they are copied from the file being written.
+        for row in list(dedupe.drain(iter_results(writer.output_filename))):
+            writer.write(row)
+        writer.close()
+
+        unique_count = suite_stats["configs"] - dedupe.duplicate_count
+        compile_error_count = suite_stats["compile_failed"]
+        print(
+            f"{suite.name}: {unique_count - compile_error_count} Success, {compile_error_count} Failed out of {unique_count} unique kernels"
+        )
+        if not args.compile_only:
+            print(f"{suite.name}: {suite_stats['failed'] - compile_error_count} benchmarks failed or timed out")
+        print(
+            f"{suite.name}: Deduplicated {dedupe.duplicate_count} of {suite_stats['configs']} configs, "
+            f"saving {dedupe.duplicate_count} compilations and benchmarks"
+        )
+        print(f"{suite.name}: Results written to {writer.output_filename}")
@@ -0,0 +1,174 @@
+import argparse
+import os
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+TARGET_PROFILES = ["rocm", "cpu"]
+DEFAULT_TARGET_PROFILE = "rocm"
+DEFAULT_DEVICES = "hip"
+DEFAULT_CPU_DEVICE = "local-task"
+DEFAULT_NUMA_NODES = "current"
+
+
+def get_cpu_compile_flags() -> list[str]:
+    """Flags compiling for llvm-cpu with the features of the host CPU."""
+    return [
+        "--iree-hal-target-device=local",
+        "--iree-hal-local-target-device-backends=llvm-cpu",
+        "--iree-llvmcpu-target-cpu=host",
+    ]
+
+
+def get_physical_core_count() -> int:
+    """Number of physical cores of the host, counting hyperthreads of a core once."""
+    cores = set()
+    for topology in Path("/sys/devices/system/cpu").glob("cpu[0-9]*/topology"):
+        try:
+            cores.add(((topology / "physical_package_id").read_text(), (topology / "core_id").read_text()))
+        except OSError:
+            continue
+    return len(cores) or os.cpu_count() or 1
+
+
+def get_default_thread_counts(core_count: Optional[int] = None) -> list[int]:
+    """Powers of two up to the physical core count, and the core count itself."""
+    core_count = core_count or get_physical_core_count()
+    counts = []
+    count = 1
+    while count < core_count:
+        counts.append(count)
+        count *= 2
+    return counts + [core_count]
+
+
+def get_thread_sweep_flags(threads: int, numa_nodes: str = DEFAULT_NUMA_NODES) -> list[str]:
+    """iree-benchmark-module flags running local-task on `threads` workers pinned to `numa_nodes`.
+
+    Workers are created per physical core of the NUMA nodes and pinned to
+    it, so counts beyond the cores of the nodes are capped at their cores.
+    """
+    return [
+        "--task_topology_mode=physical_cores",
+        f"--task_topology_nodes={numa_nodes}",
+        f"--task_topology_max_group_count={threads}",
+    ]
+
+
+def get_thread_sweep_fieldnames(thread_counts: Sequence[int]) -> list[str]:
+    """Columns added to the results of a suite by a thread sweep."""
+    fieldnames = []
+    for threads in thread_counts:
+        fieldnames += [f"mean_microseconds_{threads}_threads", f"scaling_efficiency_{threads}_threads"]
+    return fieldnames
+
+
+def _combine_sweep_rows(rows: Sequence[tuple], thread_counts: Sequence[int], time_pos: int, ok_pos: int) -> tuple:
+    # The kernel is reported at the largest thread count, followed by its
+    # time and efficiency at every thread count.
+    times = [row[time_pos] if row[ok_pos] else None for row in rows]
+    base = None
+    if times[0] is not None:
+        base = times[0] * thread_counts[0]
+    columns = []
+    for threads, time_us in zip(thread_counts, times):
+        efficiency = None
+        if base is not None and time_us:
+            efficiency = round(base / (time_us * threads), 4)
+        columns += [time_us, efficiency]
+    return (*rows[-1], *columns)
+
+
+def run_thread_sweep(
+    device: str,
+    jobs: Sequence[tuple[Callable, tuple]],
+    thread_counts: Sequence[int],
+    time_pos: int,
+    ok_pos: int,
+):
+    """Run the benchmark `jobs` of one kernel (or batch), one per thread count, on `device`.
+
+    Every job is a suite's benchmark `(fn, args)` for the thread count at the
+    same position of `thread_counts`, in increasing order. Returns the row of
+    the largest thread count extended by the columns of
+    `get_thread_sweep_fieldnames`. The scaling efficiency of a thread count is
+    the speedup over the smallest thread count divided by the increase in
+    threads. `time_pos` and `ok_pos` locate the mean time in microseconds
+    and the `ok` flag in the rows.
+    """
+    results = [fn(device, *fn_args) for fn, fn_args in jobs]
+    if isinstance(results[0], list):
+        # Batched kernels come back as a list of rows.
+        return [
+            _combine_sweep_rows(rows, thread_counts, time_pos, ok_pos) for rows in zip(*results)
+        ]
+    return _combine_sweep_rows(results, thread_counts, time_pos, ok_pos)
+
+
+def get_thread_sweep_job(
+    get_job: Callable[[list[str]], tuple[Callable, tuple]],
+    thread_counts: Sequence[int],
+    numa_nodes: str,
+    fieldnames: Sequence[str],
+    benchmark_flags: Sequence[str] = (),
+) -> tuple[Callable, tuple]:
+    """The `run_thread_sweep` job of one kernel (or batch), with a run of its own for every thread count.
+
+    `get_job(benchmark_flags)` returns the suite's benchmark `(fn, args)`
+    with extra flags, and `fieldnames` are the result columns of the suite.
+    """
+    jobs = [
+        get_job([*benchmark_flags, *get_thread_sweep_flags(threads, numa_nodes)]) for threads in thread_counts
+    ]
+    # Rows are written with the index prepended.
+    return run_thread_sweep, (
+        jobs, thread_counts, fieldnames.index("mean_microseconds") - 1, fieldnames.index("ok") - 1
+    )
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the options of the target profile and its devices to `parser`."""
+    group = parser.add_argument_group("targets")
+    group.add_argument(
+        "--devices",
+        help="Comma separated list of devices to benchmark on, one worker per device (e.g. hip://0,hip://1; "
+        f"default: {DEFAULT_DEVICES}, or {DEFAULT_CPU_DEVICE} with --target-profile cpu)",
+        default=None,
+    )
+    group.add_argument(
+        "--target-profile",
+        help="Compile for ROCm GPUs, or for llvm-cpu with the features of the host CPU and benchmark on "
+        f"{DEFAULT_CPU_DEVICE} over the thread counts of --cpu-threads",
+        choices=TARGET_PROFILES,
+        default=DEFAULT_TARGET_PROFILE,
+    )
+    group.add_argument(
+        "--cpu-threads",
+        help="Comma separated numbers of worker threads to benchmark every kernel with for --target-profile cpu; "
+        "the results get the time and scaling efficiency per thread count "
+        "(default: powers of two up to the number of physical cores)",
+        default=None,
+    )
+    group.add_argument(
+        "--numa-nodes",
+        help="NUMA nodes whose physical cores the worker threads are pinned to for --target-profile cpu: "
+        "current, all, numa or a comma separated list of node ids",
+        default=DEFAULT_NUMA_NODES,
+    )
+
+
+def check_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Fill in the default `--devices` and parse `--cpu-threads` into sorted thread counts."""
+    if args.devices is None:
+        args.devices = DEFAULT_CPU_DEVICE if args.target_profile == "cpu" else DEFAULT_DEVICES
+    if args.cpu_threads:
+        args.cpu_threads = sorted({int(threads) for threads in args.cpu_threads.split(",")})
+    elif args.benchmark_backend == "inprocess":
+        # The in-process device has one thread count; see below.
+        args.cpu_threads = get_default_thread_counts()[-1:]
+    else:
+        args.cpu_threads = get_default_thread_counts()
+    if args.target_profile == "cpu" and args.benchmark_backend == "inprocess" and len(args.cpu_threads) > 1:
+        parser.error(
+            "--benchmark-backend inprocess sets the threads of its local-task device once per process; "
+            "pass a single --cpu-threads value or use --benchmark-backend subprocess"
+        )
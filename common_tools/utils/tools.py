@@ -0,0 +1,78 @@
+import argparse
+import os
+import sys
+import shlex
+from pathlib import Path
+from typing import Optional, Sequence
+
+TOOL_NAMES = ["iree-compile", "iree-benchmark-module"]
+
+# Commands replacing a tool are kept in the environment, so pool workers and
+# the processes they start see them as well.
+_TOOL_ENV_VARS = {
+    "iree-compile": "IREE_COMPILE",
+    "iree-benchmark-module": "IREE_BENCHMARK_MODULE",
+}
+
+
+def set_tool_command(tool: str, command: str | Sequence[str]):
+    """Run `command` (a path, or a command line with arguments) wherever `tool` is run."""
+    if not isinstance(command, str):
+        command = shlex.join(command)
+    os.environ[_TOOL_ENV_VARS[tool]] = command
+
+
+def get_tool_command(tool: str) -> list[str]:
+    """The command line that runs `tool`; `tool` itself, found on PATH, unless replaced."""
+    command = os.environ.get(_TOOL_ENV_VARS[tool])
+    if not command:
+        return [tool]
+    return shlex.split(command)
+
+
+def resolve_tool_command(args: Sequence[str]) -> list[str]:
+    """Replace a leading tool name of `args` with the command that runs it."""
+    if args and args[0] in _TOOL_ENV_VARS:
+        return get_tool_command(args[0]) + list(args[1:])
+    return list(args)
+
+
+def get_fake_tool_command(tool: str) -> list[str]:
+    """Command line of the stand-in for `tool` from `utils/fake_tools.py`."""
+    # Run as a script rather than with -m, so the fakes only import the
+    # standard library and start quickly.
+    return [sys.executable, str(Path(__file__).with_name("fake_tools.py")), tool]
+
+
+def configure_tools(
+    iree_compile: Optional[str] = None, iree_benchmark_module: Optional[str] = None, fake: bool = False
+):
+    """Apply the tool flags of the suites: explicit commands win over the fakes."""
+    for tool, command in [("iree-compile", iree_compile), ("iree-benchmark-module", iree_benchmark_module)]:
+        if command:
+            set_tool_command(tool, command)
+        elif fake:
+            set_tool_command(tool, get_fake_tool_command(tool))
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the options choosing the IREE tools to `parser`."""
+    group = parser.add_argument_group("tools")
+    group.add_argument(
+        "--iree-compile",
+        help="Path or command line of the iree-compile to run (default: $IREE_COMPILE, or iree-compile from PATH)",
+        default=None,
+    )
+    group.add_argument(
+        "--iree-benchmark-module",
+        help="Path or command line of the iree-benchmark-module to run "
+        "(default: $IREE_BENCHMARK_MODULE, or iree-benchmark-module from PATH)",
+        default=None,
+    )
+    group.add_argument(
+        "--fake-tools",
+        action="store_true",
+        default=False,
+        help="Run the stand-ins of iree-compile and iree-benchmark-module from utils/fake_tools.py, which need "
+        "neither IREE nor a GPU, e.g. to test the harness (see the FAKE_IREE_* variables in that file)",
+    )
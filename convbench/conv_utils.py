@@ -161,44 +161,29 @@ def generate_mlir(config: ConvConfig):
     return mlir
 
 
-def compile_conv_config(
-    config: ConvConfig, kernel_dir: Path, vmfb_dir: Path
-) -> tuple[Path, Optional[Path]]:
-    mlir_file = kernel_dir / (config.get_name() + ".mlir")
-    vmfb_file = vmfb_dir / (config.get_name() + ".vmfb")
-
-    # Generate mlir content
-    mlir_content = generate_mlir(config)
-
-    # Write MLIR content to file
-    with open(mlir_file, "w") as f:
-        f.write(mlir_content)
-
+def get_conv_compile_flags(target_profile: str = DEFAULT_TARGET_PROFILE) -> list[str]:
+    if target_profile == "cpu":
+        return get_cpu_compile_flags()
     # TODO: Do not hardcode device information, instead pass it as a class
-    # Compile MLIR to vmfb
-    exec_args = [
-        "iree-compile",
-        # Input file
-        f"{mlir_file}",
-        # Output file
-        "-o",
-        f"{vmfb_file}",
+    return [
         # Target Device: hip
         "--iree-hal-target-device=hip",
         # Device: MI300x
         "--iree-hip-target=gfx942",
     ]
 
-    print(" ".join(exec_args))
 
-    ret_value, stderr = run_iree_command(exec_args)
-    if ret_value == 0:
-        print(f"Successfully compiled {mlir_file} to {vmfb_file}")
-    else:
-        error_file = vmfb_dir / (config.get_name() + "_error.txt")
-        print(f"Failed to compile {mlir_file}. Error dumped in {error_file}")
-        with open(error_file, "w") as f:
-            f.write(stderr.decode("utf-8"))
-        return mlir_file, None
+def compile_conv_config(
+    config: ConvConfig, kernel_dir: Path, vmfb_dir: Path, cache: Optional[CompileCache] = None, timeout: Optional[float] = None,
+    backend: str = DEFAULT_COMPILE_BACKEND, in_memory: bool = False, analyze: bool = False,
+    target_profile: str = DEFAULT_TARGET_PROFILE,
+) -> tuple[Path, Optional[Path | bytes]]:
+    # Generate mlir content
+    mlir_content = generate_mlir(config)
 
-    return mlir_file, vmfb_file
+    compile_flags = get_conv_compile_flags(target_profile)
+
+    return compile_mlir(
+        config.get_name(), mlir_content, kernel_dir, vmfb_dir, compile_flags, cache, timeout, backend, in_memory,
+        analyze,
+    )
@@ -1,27 +1,25 @@
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+from utils import ProblemSelection, iter_problem_configs
 from conv_utils import ConvConfig
 
+# Problem files of the convolution suite; see `utils/problem_sets.py` for their format.
+PROBLEM_SET_DIR = Path(__file__).parent / "problem_sets"
+# Problem sets benchmarked unless --problems is given.
+DEFAULT_PROBLEM_SETS = ["conv"]
 
-def resnet_sweep(op: str, input_dtype: str, output_dtype: str) -> list[ConvConfig]:
-    configs = []
-    for B in [1, 2, 4, 8, 16, 32, 48]:
-        configs.append(ConvConfig(B, 112, 112, 64, 7, 7, 3, 2, op, input_dtype, output_dtype))
-        configs.append(ConvConfig(B, 56, 56, 64, 3, 3, 64, 1, op, input_dtype, output_dtype))
-        configs.append(ConvConfig(B, 28, 28, 128, 3, 3, 128, 2, op, input_dtype, output_dtype))
-        configs.append(ConvConfig(B, 28, 28, 512, 1, 1, 256, 2, op, input_dtype, output_dtype))
-        configs.append(ConvConfig(B, 28, 28, 128, 3, 3, 128, 1, op, input_dtype, output_dtype))
-        configs.append(ConvConfig(B, 14, 14, 256, 3, 3, 256, 2, op, input_dtype, output_dtype))
-        configs.append(ConvConfig(B, 14, 14, 1024, 1, 1, 512, 2, op, input_dtype, output_dtype))
-        configs.append(ConvConfig(B, 14, 14, 256, 3, 3, 256, 1, op, input_dtype, output_dtype))
-        configs.append(ConvConfig(B, 7, 7, 512, 3, 3, 512, 2, op, input_dtype, output_dtype))
-        configs.append(ConvConfig(B, 7, 7, 2048, 1, 1, 1024, 2, op, input_dtype, output_dtype))
-        configs.append(ConvConfig(B, 7, 7, 512, 3, 3, 512, 1, op, input_dtype, output_dtype))   
-    return configs
 
-def get_conv_configs() -> list[tuple[str, ConvConfig]]:
-    configs: list[tuple[str, ConvConfig]] = []
-    resnet_configs = resnet_sweep("conv_2d_nchw_fchw", "f32", "f32")
-    resnet_configs += resnet_sweep("conv_2d_nhwc_hwcf_q", "i8", "i32")
+def make_conv_config(fields: dict) -> ConvConfig:
+    return ConvConfig(
+        fields["N"], fields["H"], fields["W"], fields["C"], fields["P"], fields["Q"], fields["F"], fields["S"],
+        fields["op"], fields["input_dtype"], fields["output_dtype"],
+    )
 
-    configs += [("resnet_sweep", x) for x in resnet_configs]
+def iter_conv_configs(
+    problem_sets: Sequence[str] = DEFAULT_PROBLEM_SETS, selection: Optional[ProblemSelection] = None
+) -> Iterator[tuple[str, ConvConfig]]:
+    """Lazily yield (tag, config) pairs of the problem sets, one problem at a time."""
+    return iter_problem_configs(PROBLEM_SET_DIR, problem_sets, "conv", make_conv_config, selection)
 
-    return configs
+def get_conv_configs() -> list[tuple[str, ConvConfig]]:
+    return list(iter_conv_configs())
@@ -1,141 +1,88 @@
-import os
-from tqdm import tqdm
-from multiprocessing import Pool, cpu_count, Manager
 import logging
-import itertools
 from pathlib import Path
-import csv
-import argparse
-import sys
 from utils import *
 from conv_utils import *
-from problems import get_conv_configs
+from problems import DEFAULT_PROBLEM_SETS, PROBLEM_SET_DIR, iter_conv_configs
 
 
-def compile_conv(tag, config, kernel_dir, vmfb_dir):
-    mlir_file, vmfb_file = compile_conv_config(config, kernel_dir, vmfb_dir)
+def compile_conv(tag, config, kernel_dir, vmfb_dir, cache, timeout, backend, in_memory, analyze, target_profile):
+    try:
+        mlir_file, vmfb_file = compile_conv_config(
+            config, kernel_dir, vmfb_dir, cache, timeout, backend, in_memory, analyze, target_profile
+        )
+    except Exception:
+        # Isolate the failure to this kernel; it is recorded as a failed row.
+        logging.getLogger().exception(f"Failed to compile {config.get_name()}")
+        mlir_file, vmfb_file = None, None
     return (tag, config, mlir_file, vmfb_file)
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Config file updater.")
-    parser.add_argument(
-        "--log-level",
-        default="ERROR",
-        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
-        type=str.upper,
-        help="Set the logging level",
-    )
-    parser.add_argument(
-        "--roofline",
-        help="Comma seperated csv file list to generate roofline plot with",
-        default=None,
-    )
-    parser.add_argument("--plot", help="location to save plot", default=None)
-    parser.add_argument("--batch", help="roofline on certain batch", type=int, default=None)
-    parser.add_argument("--dtype", help="roofline on certain dtype", default=None)
-    parser.add_argument("--model", help="roofline on certain model", default=None)
-
-    args = parser.parse_args()
-    logging.basicConfig(level=args.log_level)
-
-    if args.roofline:
-        roofline(args.roofline, args.plot, args.batch, args.dtype, args.model)
-        sys.exit()
-
-    configs = get_conv_configs()
-    print(f"Generated {len(configs)} conv configs.")
-
-    num_cpus = max(1, cpu_count() - 20)
-    print(f"Using {num_cpus} CPUs for parallel processing.")
-
-    manager = Manager()
-    vmfb_dict = manager.dict()
-
-    repo_root = Path(__file__).parent.parent
-    kernel_dir = repo_root / "conv" / "mlir"
-    vmfb_dir = repo_root / "conv" / "vmfb"
-    kernel_dir.mkdir(parents=True, exist_ok=True)
-    vmfb_dir.mkdir(parents=True, exist_ok=True)
-
-    args = itertools.starmap(
-        lambda tag, config: (tag, config, kernel_dir, vmfb_dir), configs
-    )
-    with Pool(num_cpus) as pool:
-        compilation_results = list(tqdm(pool.starmap(compile_conv, list(args))))
-
-    error_count = 0
-    for tag, config, mlir_file, vmfb_file in compilation_results:
-        if vmfb_file:
-            vmfb_dict[vmfb_file] = (tag, config)
-        else:
-            error_count += 1
-    print(
-        f"{len(configs) - error_count} Success, {error_count} Failed out of {len(configs)} configs"
-    )
-
-    print("Compilation process completed.")
-
-    results = []
-    index = 0
-    output_csv = "results/iree_conv.csv"
-    csv_dir = os.path.dirname(output_csv)
-    if not os.path.exists(csv_dir):
-        os.makedirs(csv_dir)
-
-    for vmfb_filename, value in vmfb_dict.items():
-        tag, config = value
-        name = config.get_name()
-
+def benchmark_conv(device, tag, config, vmfb_filename, result_cache, timeout, backend, benchmark_flags, adaptive):
+    ok, benchmark_stats, reused = False, None, False
+    # Kernels that failed to compile are recorded as failed rows.
+    if vmfb_filename:
         image_shape = config.get_img_shape()
         filter_shape = config.get_kernel_shape()
 
         exec_args = [
             "iree-benchmark-module",
-            f"--device=hip",
+            f"--device={device}",
             "--device_allocator=caching",
-            f"--module={vmfb_filename}",
+            get_module_flag(vmfb_filename),
             "--function=main",
             f"--input={image_shape}",
             f"--input={filter_shape}",
             "--benchmark_repetitions=3",
+            *benchmark_flags,
         ]
 
         # iree benchmark kernels
-        ret_value, cmd_out = run_iree_command(exec_args)
-        ok = ret_value == 0
-        benchmark_gemm_mean_time_ms = bench_summary_process(ret_value, cmd_out)
-        benchmark_gemm_mean_time_us = benchmark_gemm_mean_time_ms * 1000
-
-        flops = config.get_flops()
-        byte_count = config.get_byte_count()
-
-        arithmetic_intensity = flops / byte_count
-        tflops_per_second = (flops / 1e12) / (benchmark_gemm_mean_time_us / 1e6)
-
-        results.append(
-            (
-                index,
-                tag,
-                name,
-                config.N,
-                config.H,
-                config.W,
-                config.C,
-                config.P,
-                config.Q,
-                config.F,
-                config.S,
-                config.input_dtype,
-                config.output_dtype,
-                round(benchmark_gemm_mean_time_us, 4),
-                round(arithmetic_intensity, 4),
-                round(tflops_per_second, 4),
-                ok,
-            )
+        ok, benchmark_stats, reused = run_iree_benchmark(
+            exec_args, vmfb_filename, result_cache, timeout, backend, adaptive
         )
-        index += 1
 
+    return get_conv_row(device, tag, config, ok, benchmark_stats, reused)
+
+
+def get_conv_row(device, tag, config, ok, benchmark_stats, reused):
+    name = config.get_name()
+
+    flops = config.get_flops()
+    byte_count = config.get_byte_count()
+
+    arithmetic_intensity = flops / byte_count
+    benchmark_gemm_mean_time_us = None
+    tflops_per_second = None
+    if ok:
+        benchmark_gemm_mean_time_us = benchmark_stats.mean_ms * 1000
+        tflops_per_second = round((flops / 1e12) / (benchmark_gemm_mean_time_us / 1e6), 4)
+        benchmark_gemm_mean_time_us = round(benchmark_gemm_mean_time_us, 4)
+
+    return (
+        tag,
+        name,
+        config.N,
+        config.H,
+        config.W,
+        config.C,
+        config.P,
+        config.Q,
+        config.F,
+        config.S,
+        config.input_dtype,
+        config.output_dtype,
+        benchmark_gemm_mean_time_us,
+        *get_stats_columns(benchmark_stats if ok else None),
+        round(arithmetic_intensity, 4),
+        tflops_per_second,
+        ok,
+        reused,
+        device,
+    )
+
+
+class ConvSuite(BenchmarkSuite):
+    name = "conv"
     fieldnames = [
         "index",
         "tag",
@@ -151,10 +98,48 @@ if __name__ == "__main__":
         "input_dtype",
         "output_dtype",
         "mean_microseconds",
+        *STATS_FIELDNAMES,
         "arithmetic_intensity",
         "tflops",
         "ok",
+        "reused",
+        "device",
     ]
+    default_output = "results/iree_conv.csv"
+    repo_root = Path(__file__).parent.parent
+    problem_set_dir = PROBLEM_SET_DIR
+    default_problem_sets = DEFAULT_PROBLEM_SETS
 
-    write_results_to_csv(results, output_csv, fieldnames)
-    print(f"Results written to {output_csv}")
+    def iter_configs(self):
+        return iter_conv_configs(self.get_problem_sets(), self.get_problem_selection())
+
+    def get_compile_job(self, tag, config, kernel_dir, vmfb_dir, cache, timeout):
+        return compile_conv, (
+            tag, config, kernel_dir, vmfb_dir, cache, timeout, self.args.compile_backend, self.args.in_memory,
+            self.args.compile_only, self.args.target_profile,
+        )
+
+    def get_benchmark_job(self, tag, config, vmfb_filename, result_cache, timeout, benchmark_flags=()):
+        return benchmark_conv, (
+            tag, config, vmfb_filename, result_cache, timeout, self.args.benchmark_backend, list(benchmark_flags),
+            self.get_adaptive_repetitions(),
+        )
+
+    def get_stratum(self, tag, config):
+        return (tag, config.OP, config.input_dtype)
+
+    def supports_batching(self):
+        return True
+
+    def get_kernel_source(self, config):
+        return generate_mlir(config), [config.get_img_shape(), config.get_kernel_shape()]
+
+    def get_compile_flags(self):
+        return get_conv_compile_flags(self.args.target_profile)
+
+    def get_row_function(self):
+        return get_conv_row
+
+
+if __name__ == "__main__":
+    run_suites([ConvSuite])
@@ -4,152 +4,88 @@
 # See https://llvm.org/LICENSE.txt for license information.
 # SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
 
-import os
-from tqdm import tqdm
-from multiprocessing import Pool, cpu_count, Manager
 import logging
-import itertools
 from pathlib import Path
-import csv
-import argparse
-import sys
 from utils import *
 from gemm_utils import *
-from problems import get_gemm_configs, get_tk_gemm_configs
-
-
-def compile_gemm(tag, config, kernel_dir, vmfb_dir, target, extra_compiler_args, tk):
-    mlir_file, vmfb_file = compile_gemm_config(config, kernel_dir, vmfb_dir, target, extra_compiler_args, tk)
+from problems import DEFAULT_PROBLEM_SETS, PROBLEM_SET_DIR, TK_PROBLEM_SETS, iter_gemm_configs
+
+
+def compile_gemm(
+    tag, config, kernel_dir, vmfb_dir, target, extra_compiler_args, tk, cache, timeout, backend, in_memory, analyze,
+    target_profile,
+):
+    try:
+        mlir_file, vmfb_file = compile_gemm_config(
+            config, kernel_dir, vmfb_dir, target, extra_compiler_args, tk, cache, timeout, backend, in_memory,
+            analyze, target_profile,
+        )
+    except Exception:
+        # Isolate the failure to this kernel; it is recorded as a failed row.
+        logging.getLogger().exception(f"Failed to compile {config.get_name()}")
+        mlir_file, vmfb_file = None, None
     return (tag, config, mlir_file, vmfb_file)
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Config file updater.")
-    parser.add_argument(
-        "--log-level",
-        default="ERROR",
-        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
-        type=str.upper,
-        help="Set the logging level",
-    )
-
-    parser.add_argument("--target", help="The IREE hip target to compile for", type=str, default="gfx942")
-    parser.add_argument(
-        "--Xiree_compile",
-        action='append',
-        default=[],
-        help="Extra command line arguments passed to the IREE compiler. This can be specified multiple times to pass multiple arguments."
-    )
-    parser.add_argument("--roofline", help="Comma separated csv file list to generate roofline plot with", default=None)
-    parser.add_argument("--plot", help="location to save plot", default=None)
-    parser.add_argument("--batch", help="roofline on certain batch", type=int, default=None)
-    parser.add_argument("--dtype", help="roofline on certain dtype", default=None)
-    parser.add_argument("--model", help="roofline on certain model", default=None)
-    parser.add_argument(
-        "--tk",
-        action="store_true",
-        default=False,
-        help="Option to run gemm kernels using Turbine Kernels",
-    )
-
-    args = parser.parse_args()
-    logging.basicConfig(level=args.log_level)
-
-    if args.roofline:
-        roofline(args.roofline, args.plot, args.batch, args.dtype, args.model)
-        sys.exit()
-    
-    tk = args.tk
-    if tk:
-        configs = get_tk_gemm_configs()
-    else:
-        configs = get_gemm_configs()
-    print(f"Generated {len(configs)} gemm configs.")
-
-    num_cpus = max(1, cpu_count() - 20)
-    print(f"Using {num_cpus} CPUs for parallel processing.")
-
-    manager = Manager()
-    vmfb_dict = manager.dict()
-
-    repo_root = Path(__file__).parent.parent
-    kernel_dir = repo_root / "gemm" / "mlir"
-    vmfb_dir = repo_root / "gemm" / "vmfb"
-    kernel_dir.mkdir(parents=True, exist_ok=True)
-    vmfb_dir.mkdir(parents=True, exist_ok=True)
-    target = args.target
-    extra_compiler_args = list(args.Xiree_compile)
-
-    args = itertools.starmap(
-        lambda tag, config: (tag, config, kernel_dir, vmfb_dir, target, extra_compiler_args, tk), configs
-    )
-    with Pool(num_cpus) as pool:
-        compilation_results = list(tqdm(pool.starmap(compile_gemm, list(args))))
-
-    error_count = 0
-    for tag, config, mlir_file, vmfb_file in compilation_results:
-        if vmfb_file:
-            vmfb_dict[vmfb_file] = (tag, config)
-        else:
-            error_count += 1
-    print(
-        f"{len(configs) - error_count} Success, {error_count} Failed out of {len(configs)} configs"
-    )
-
-    print("Compilation process completed.")
-
-    results = []
-    index = 0
-    output_csv = "results/iree_gemm.csv"
-    if tk:
-        output_csv = "results/iree_gemm_tk.csv"
-    csv_dir = os.path.dirname(output_csv)
-    if not os.path.exists(csv_dir):
-        os.makedirs(csv_dir)
-
-    for vmfb_filename, value in vmfb_dict.items():
-        tag, config = value
-        name = config.get_name()
-
+def benchmark_gemm(device, tag, config, vmfb_filename, tk, result_cache, timeout, backend, benchmark_flags, adaptive):
+    ok, benchmark_stats, reused = False, None, False
+    # Kernels that failed to compile are recorded as failed rows.
+    if vmfb_filename:
         inp1 = config.get_inp1()
         inp2 = config.get_inp2()
 
         exec_args = [
             "iree-benchmark-module",
-            f"--device=hip",
+            f"--device={device}",
             "--device_allocator=caching",
-            f"--module={vmfb_filename}",
+            get_module_flag(vmfb_filename),
             f"--input={inp1}",
             f"--input={inp2}",
             "--benchmark_repetitions=3",
+            *benchmark_flags,
         ]
 
         if tk:
-            exec_args += ["--function=isolated_benchmark"] 
+            exec_args += ["--function=isolated_benchmark"]
         else:
             exec_args += ["--function=main"]
 
         # iree benchmark kernels
-        ret_value, cmd_out = run_iree_command(exec_args)
-        ok = ret_value == 0
-        benchmark_gemm_mean_time_ms = bench_summary_process(ret_value, cmd_out)
-        benchmark_gemm_mean_time_us = benchmark_gemm_mean_time_ms * 1000
-
-        flops = config.get_flops()
-        byte_count = config.get_byte_count()
-
-        arithmetic_intensity = flops / byte_count
-        tflops_per_second = (flops / 1e12) / (benchmark_gemm_mean_time_us / 1e6)
-
-        results.append((
-            index, tag, name, config.M, config.N, config.K, config.dtype, config.tA, config.tB,
-            round(benchmark_gemm_mean_time_us, 4),
-            round(arithmetic_intensity, 4),
-            round(tflops_per_second, 4),
-            ok
-        ))
-        index += 1
+        ok, benchmark_stats, reused = run_iree_benchmark(
+            exec_args, vmfb_filename, result_cache, timeout, backend, adaptive
+        )
+
+    return get_gemm_row(device, tag, config, ok, benchmark_stats, reused)
+
+
+def get_gemm_row(device, tag, config, ok, benchmark_stats, reused):
+    name = config.get_name()
+
+    flops = config.get_flops()
+    byte_count = config.get_byte_count()
+
+    arithmetic_intensity = flops / byte_count
+    benchmark_gemm_mean_time_us = None
+    tflops_per_second = None
+    if ok:
+        benchmark_gemm_mean_time_us = benchmark_stats.mean_ms * 1000
+        tflops_per_second = round((flops / 1e12) / (benchmark_gemm_mean_time_us / 1e6), 4)
+        benchmark_gemm_mean_time_us = round(benchmark_gemm_mean_time_us, 4)
+
+    return (
+        tag, name, config.M, config.N, config.K, config.dtype, config.tA, config.tB,
+        benchmark_gemm_mean_time_us,
+        *get_stats_columns(benchmark_stats if ok else None),
+        round(arithmetic_intensity, 4),
+        tflops_per_second,
+        ok,
+        reused,
+        device,
+    )
+
 
+class GemmSuite(BenchmarkSuite):
+    name = "gemm"
     fieldnames = [
         'index',
         'tag',
@@ -161,10 +97,90 @@ if __name__ == "__main__":
         'tA',
         'tB',
         'mean_microseconds',
+        *STATS_FIELDNAMES,
         'arithmetic_intensity',
         'tflops',
-        'ok'
+        'ok',
+        'reused',
+        'device',
     ]
+    default_output = "results/iree_gemm.csv"
+    repo_root = Path(__file__).parent.parent
+    problem_set_dir = PROBLEM_SET_DIR
+    default_problem_sets = DEFAULT_PROBLEM_SETS
+
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument("--target", help="The IREE hip target to compile for", type=str, default="gfx942")
+        parser.add_argument(
+            "--Xiree_compile",
+            action='append',
+            default=[],
+            help="Extra command line arguments passed to the IREE compiler. This can be specified multiple times to pass multiple arguments."
+        )
+        parser.add_argument(
+            "--tk",
+            action="store_true",
+            default=False,
+            help="Option to run gemm kernels using Turbine Kernels",
+        )
+
+    def get_output(self):
+        if self.args.tk:
+            return "results/iree_gemm_tk.csv"
+        return self.default_output
+
+    def preload(self):
+        if self.args.tk:
+            import tk_gemm_utils
+
+    def iter_configs(self):
+        return iter_gemm_configs(self.get_problem_sets(), self.get_problem_selection())
+
+    def get_problem_sets(self):
+        if self.args.tk and not self.args.problems:
+            return TK_PROBLEM_SETS
+        return super().get_problem_sets()
+
+    def get_job_name(self, config):
+        return ("tk_" if self.args.tk else "") + config.get_name()
+
+    def get_compile_job(self, tag, config, kernel_dir, vmfb_dir, cache, timeout):
+        extra_compiler_args = list(self.args.Xiree_compile)
+        return compile_gemm, (
+            tag, config, kernel_dir, vmfb_dir, self.args.target, extra_compiler_args, self.args.tk, cache, timeout,
+            self.args.compile_backend, self.args.in_memory, self.args.compile_only, self.args.target_profile,
+        )
+
+    def get_benchmark_job(self, tag, config, vmfb_filename, result_cache, timeout, benchmark_flags=()):
+        return benchmark_gemm, (
+            tag, config, vmfb_filename, self.args.tk, result_cache, timeout, self.args.benchmark_backend,
+            list(benchmark_flags),
+            self.get_adaptive_repetitions(),
+        )
+
+    def get_stratum(self, tag, config):
+        return (tag, config.dtype, config.tA + config.tB)
+
+    def get_target_profiles(self):
+        # TK kernels are generated for ROCm only.
+        if self.args.tk:
+            return ["rocm"]
+        return super().get_target_profiles()
+
+    def supports_batching(self):
+        # TK kernels are benchmarked through their own isolated_benchmark function.
+        return not self.args.tk
+
+    def get_kernel_source(self, config):
+        return generate_mlir(config), [config.get_inp1(), config.get_inp2()]
+
+    def get_compile_flags(self):
+        return get_gemm_compile_flags(self.args.target, list(self.args.Xiree_compile), self.args.target_profile)
+
+    def get_row_function(self):
+        return get_gemm_row
+
 
-    write_results_to_csv(results, output_csv, fieldnames)
-    print(f"Results written to {output_csv}")
+if __name__ == "__main__":
+    run_suites([GemmSuite])